@@ -2,12 +2,38 @@ import os
 from flask import Flask
 from flask_cors import CORS
 
+
 def create_app():
+    # JSON logs through a background writer thread, before Flask sets up its own handler
+    from .logs import init_logging
+    init_logging()
+
     app = Flask(__name__)
     CORS(app)
 
     app.secret_key = os.getenv('SECRET_KEY', 'dev_secret_key')
 
+    # session data lives server-side; the cookie only holds its id
+    from . import sessions
+    sessions.init_app(app)
+
+    # per-route latency / in-flight / exception metrics (exposed at /metrics)
+    from . import metrics
+    metrics.init_app(app)
+
+    # a trace per request, through the agent and MCP calls (admin-only view at /debug/traces)
+    from . import tracing
+    tracing.init_app(app)
+
+    # admin-only profiling of single requests (X-Profile: 1); not installed without ADMIN_TOKEN
+    from . import profiling
+    profiling.init_app(app)
+
+    # fingerprinted static assets, and brotli/gzip for text responses
+    from . import assets, compression
+    assets.init_app(app)
+    compression.init_app(app)
+
     # web UI
     from .routes import main_bp
     app.register_blueprint(main_bp)
@@ -16,5 +42,15 @@ def create_app():
     from .proxy import proxy_bp
     app.register_blueprint(proxy_bp)
 
+    # operational endpoints (stats, /metrics)
+    from .ops import ops_bp
+    app.register_blueprint(ops_bp)
+
+    # admin-only debugging pages (need ADMIN_TOKEN)
+    from .debug import debug_bp
+    app.register_blueprint(debug_bp)
+
+    # upstream warm-up is gunicorn's post_worker_init hook, so building the app
+    # never imports the agent stack or waits on the MCP server
     return app
 
@@ -0,0 +1,81 @@
+import os
+import hmac
+import functools
+from typing import Optional
+from urllib.parse import urlencode
+
+from flask import abort, redirect, request
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Access to the /debug pages and request profiling (read from the environment)
+_ADMIN_TOKEN_ENV = "ADMIN_TOKEN"     # unset: the /debug pages don't exist (404)
+_OPS_TOKEN_ENV   = "OPS_TOKEN"       # read-only alternative for /metrics and /ops/* (e.g. a Prometheus scraper)
+_COOKIE_NAME     = "admin_token"
+_COOKIE_PATH     = "/"               # site-wide, so ?profile=1 works on the normal pages too
+_COOKIE_MAX_AGE  = 8 * 3600
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+def admin_enabled() -> bool:
+    return bool(os.getenv(_ADMIN_TOKEN_ENV))
+
+
+def _given_token() -> str:
+    header = request.headers.get("Authorization", "")
+    if header.lower().startswith("bearer "):
+        return header[7:].strip()
+    return request.headers.get("X-Admin-Token") or request.cookies.get(_COOKIE_NAME) or ""
+
+
+def _matches(given: str, env: str) -> bool:
+    expected = os.getenv(env)
+    return bool(expected and given) and hmac.compare_digest(given.encode("utf-8"), expected.encode("utf-8"))
+
+
+def is_admin(token: Optional[str] = None) -> bool:
+    """
+    Whether the current request (or `token`) carries the ADMIN_TOKEN.
+    """
+    return _matches(_given_token() if token is None else token, _ADMIN_TOKEN_ENV)
+
+
+def require_ops() -> None:
+    """
+    before_request guard for the stats endpoints: the ADMIN_TOKEN (any way
+    admin_required takes it) or the OPS_TOKEN as a bearer token. 404 while
+    neither is configured, 403 for a missing or wrong token.
+    """
+    if not (admin_enabled() or os.getenv(_OPS_TOKEN_ENV)):
+        abort(404)
+    given = _given_token()
+    if not (_matches(given, _ADMIN_TOKEN_ENV) or _matches(given, _OPS_TOKEN_ENV)):
+        abort(403)
+
+
+def admin_required(view):
+    """
+    Let a view through only with the ADMIN_TOKEN, sent as a bearer token, an
+    X-Admin-Token header or the cookie set by opening any /debug page once
+    with ?token=... (then redirected away, so the token doesn't stay in the
+    address bar or the access log of later pages). Answers 404 while no token
+    is configured, so the pages aren't discoverable.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not admin_enabled():
+            abort(404)
+
+        token = request.args.get("token")
+        if token is not None:
+            if not is_admin(token):
+                abort(403)
+            query = urlencode([(k, v) for k, v in request.args.items(multi=True) if k != "token"])
+            response = redirect(request.path + ("?" + query if query else ""))
+            response.set_cookie(_COOKIE_NAME, token, max_age=_COOKIE_MAX_AGE, path=_COOKIE_PATH,
+                                httponly=True, secure=request.is_secure, samesite="Strict")
+            return response
+
+        if not is_admin():
+            abort(403)
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,339 @@
+import os
+import time
+import asyncio
+import sqlite3
+import tempfile
+import threading
+from collections import deque
+from typing import Optional, Tuple
+
+from flask import jsonify
+
+from . import metrics, storage
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Admission control tuning (all optional, read from the environment)
+_MAX_CONCURRENCY_ENV  = "UPSTREAM_MAX_CONCURRENCY"   # upstream calls running at once per worker
+_MAX_QUEUE_ENV        = "UPSTREAM_MAX_QUEUE"         # calls allowed to wait for a slot before new ones are refused
+_QUEUE_TIMEOUT_ENV    = "UPSTREAM_QUEUE_TIMEOUT"     # seconds a call may wait for a slot
+
+_RATE_PER_MINUTE_ENV  = "RATE_LIMIT_PER_MINUTE"      # sustained requests per client ("0" disables rate limiting)
+_RATE_BURST_ENV       = "RATE_LIMIT_BURST"           # requests a client may make back to back
+_BATCH_PER_MINUTE_ENV = "RATE_LIMIT_BATCH_ITEMS_PER_MINUTE" # sustained /optimize/batch items per client ("0" = no item budget)
+_BATCH_BURST_ENV      = "RATE_LIMIT_BATCH_BURST"     # batch items a client may send back to back (the largest batch)
+_RATE_IP_FACTOR_ENV   = "RATE_LIMIT_IP_FACTOR"       # an IP's budget, shared by the extension ids behind it, in client budgets
+_RATE_PATH_ENV        = "RATE_LIMIT_PATH"            # SQLite file shared by workers ("" keeps buckets per process)
+_TRUSTED_PROXIES_ENV  = "RATE_LIMIT_TRUSTED_PROXIES" # reverse proxies in front of the app (for X-Forwarded-For)
+
+_DEFAULT_CONCURRENCY  = 16
+_DEFAULT_QUEUE        = 64
+_DEFAULT_QUEUE_WAIT   = 10
+_DEFAULT_PER_MINUTE   = 30
+_DEFAULT_BURST        = 10
+_DEFAULT_BATCH_PER_MINUTE = 100
+_DEFAULT_BATCH_BURST  = 50      # BATCH_MAX_ITEMS' default, so any accepted batch can be paid
+_DEFAULT_IP_FACTOR    = 4
+_DEFAULT_RATE_PATH    = os.path.join(tempfile.gettempdir(), "prompt-optimizer-ratelimit.sqlite3")
+_OVERLOAD_RETRY_AFTER = 5
+_BUCKET_IDLE_SECONDS  = 3600    # buckets untouched this long are dropped
+_PURGE_EVERY_SECONDS  = 60
+
+CLIENT_ID_HEADER      = "X-Extension-Id"
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+class Overloaded(RuntimeError):
+    """
+    Raised when an upstream call can't get a slot: the wait queue is full or
+    the wait took too long.
+    """
+
+    def __init__(self, reason: str, retry_after: float = _OVERLOAD_RETRY_AFTER):
+        super().__init__("The server is busy right now, please try again in a few seconds.")
+        self.reason      = reason
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """
+    At most `limit` upstream calls at once; up to `max_queue` more wait in FIFO
+    order for at most `queue_timeout` seconds, and anything beyond that is
+    refused straight away. Lives on the background loop; not thread-safe.
+    """
+
+    def __init__(self, limit: int = _DEFAULT_CONCURRENCY, max_queue: int = _DEFAULT_QUEUE,
+                 queue_timeout: float = _DEFAULT_QUEUE_WAIT):
+        self.limit         = max(1, limit)
+        self.max_queue     = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._active       = 0
+        self._waiters      = deque()
+        self.counts        = {"admitted": 0, "queued": 0, "queue_full": 0, "queue_timeout": 0}
+
+    def _reject(self, reason: str) -> None:
+        self.counts[reason] += 1
+        metrics.admission_rejections.inc(reason=reason)
+        raise Overloaded(reason)
+
+    def _gauges(self) -> None:
+        metrics.admission_active.set(self._active)
+        metrics.admission_queue_depth.set(len(self._waiters))
+
+    async def acquire(self) -> None:
+        if self._active < self.limit and not self._waiters:
+            self._active += 1
+            self.counts["admitted"] += 1
+            self._gauges()
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._reject("queue_full")
+
+        slot = asyncio.get_running_loop().create_future()
+        self._waiters.append(slot)
+        self.counts["queued"] += 1
+        self._gauges()
+        started = time.perf_counter()
+        try:
+            # asyncio.wait, not wait_for: before 3.12 wait_for swallows a cancel
+            # that lands together with the slot, and the cancelled caller would
+            # go on to make the upstream call
+            await asyncio.wait([slot], timeout=self.queue_timeout)
+            if not slot.done():
+                slot.cancel()
+                self._reject("queue_timeout")
+        except BaseException:
+            if slot.done() and not slot.cancelled():
+                self.release()  # handed a slot just as we were cancelled: pass it on
+            raise
+        finally:
+            if slot in self._waiters:
+                self._waiters.remove(slot)
+            metrics.admission_wait_seconds.observe(time.perf_counter() - started)
+            self._gauges()
+        self.counts["admitted"] += 1
+
+    def release(self) -> None:
+        # hand the slot straight to the oldest waiter that is still waiting
+        while self._waiters:
+            slot = self._waiters.popleft()
+            if not slot.done():
+                slot.set_result(None)
+                self._gauges()
+                return
+        self._active -= 1
+        self._gauges()
+
+    def stats(self) -> dict:
+        return {**self.counts, "active": self._active, "queue_depth": len(self._waiters),
+                "limit": self.limit, "max_queue": self.max_queue, "queue_timeout_seconds": self.queue_timeout}
+
+
+class RateLimiter:
+    """
+    Per-client token buckets: each client gets `burst` requests back to back,
+    refilled at `per_minute`. A request may also be charged to a `shared`
+    bucket `shared_factor` times that size (the client's IP), and goes through
+    only if both can pay. Buckets live in a SQLite file so every gunicorn
+    worker enforces the same budget (or in a dict when `path` is empty).
+    """
+
+    def __init__(self, per_minute: float, burst: float, path: str, shared_factor: float = _DEFAULT_IP_FACTOR):
+        self.rate   = per_minute / 60.0
+        self.burst  = max(1.0, burst)
+        self.shared_factor = max(1.0, shared_factor)
+        self.path   = path
+        self._conn  = None
+        self._pid   = None
+        self._local = {}
+        self._lock  = threading.Lock()
+        self._last_purge = 0.0
+        self.counts = {"allowed": 0, "limited": 0, "errors": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            conn = storage.connect(self.path, timeout=2.0)
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (client TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _take(self, buckets, now: float, cost: float) -> Tuple[list, float]:
+        # buckets are (tokens, updated, scale); returns (tokens left after refilling,
+        # and paying if every bucket can, seconds until `cost` is affordable)
+        refilled, wait = [], 0.0
+        for tokens, updated, scale in buckets:
+            if updated is not None:
+                tokens = min(self.burst * scale, tokens + (now - updated) * self.rate * scale)
+            refilled.append(tokens)
+            if tokens < cost:
+                wait = max(wait, (cost - tokens) / (self.rate * scale) if self.rate > 0 else float(_BUCKET_IDLE_SECONDS))
+        if wait > 0:
+            return refilled, wait
+        return [tokens - cost for tokens in refilled], 0.0
+
+    def hit(self, client: str, cost: float = 1, shared: Optional[str] = None) -> Tuple[bool, float]:
+        """
+        Charge `cost` requests to `client`, and to `shared` when given; returns
+        (allowed, retry_after seconds). A cost above the burst can never be
+        paid; rate_limit_response() refuses it before getting here.
+        """
+        now = time.time()
+        keys = [(client, 1.0)] + ([(shared, self.shared_factor)] if shared else [])
+        with self._lock:
+            if not self.path:
+                left, wait = self._take([(*self._local.get(key, (self.burst * scale, None)), scale)
+                                         for key, scale in keys], now, cost)
+                for (key, _), tokens in zip(keys, left):
+                    self._local[key] = (tokens, now)
+            else:
+                try:
+                    conn = self._connection()
+                    conn.execute("BEGIN IMMEDIATE")
+                    try:
+                        rows = [conn.execute("SELECT tokens, updated FROM buckets WHERE client = ?", (key,)).fetchone()
+                                or (self.burst * scale, None) for key, scale in keys]
+                        left, wait = self._take([(*row, scale) for row, (_, scale) in zip(rows, keys)], now, cost)
+                        conn.executemany("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)",
+                                         [(key, tokens, now) for (key, _), tokens in zip(keys, left)])
+                        conn.execute("COMMIT")
+                    except BaseException:
+                        conn.execute("ROLLBACK")
+                        raise
+                except sqlite3.Error:
+                    # never turn a storage hiccup into an outage: let the request through
+                    self.counts["errors"] += 1
+                    return True, 0.0
+            self._maybe_purge(now)
+
+        if wait > 0:
+            self.counts["limited"] += 1
+            metrics.admission_rejections.inc(reason="rate_limited")
+            return False, wait
+        self.counts["allowed"] += 1
+        return True, 0.0
+
+    def _maybe_purge(self, now: float) -> None:
+        if now - self._last_purge < _PURGE_EVERY_SECONDS:
+            return
+        self._last_purge = now
+        cutoff = now - _BUCKET_IDLE_SECONDS
+        if not self.path:
+            for client in [c for c, (_, updated) in self._local.items() if updated < cutoff]:
+                del self._local[client]
+            return
+        try:
+            self._connection().execute("DELETE FROM buckets WHERE updated < ?", (cutoff,))
+        except sqlite3.Error:
+            self.counts["errors"] += 1
+
+    def stats(self) -> dict:
+        return {**self.counts, "per_minute": self.rate * 60, "burst": self.burst,
+                "ip_factor": self.shared_factor, "shared": bool(self.path)}
+
+
+def client_id(req) -> str:
+    """
+    Rate-limit key for a request: the extension id header when present,
+    otherwise the client IP. The header is the client's own choice, so
+    rate_limit_response() charges the IP's bucket as well.
+    """
+    extension = req.headers.get(CLIENT_ID_HEADER, "").strip()
+    if extension:
+        return "ext:" + extension[:128]
+    return client_ip(req)
+
+
+def client_ip(req) -> str:
+    """
+    The client IP as a rate-limit key, read from X-Forwarded-For behind trusted proxies.
+    """
+    hops = int(os.getenv(_TRUSTED_PROXIES_ENV, 0))
+    forwarded = [part.strip() for part in req.headers.get("X-Forwarded-For", "").split(",") if part.strip()]
+    if hops > 0 and len(forwarded) >= hops:
+        return "ip:" + forwarded[-hops]
+    return "ip:" + (req.remote_addr or "unknown")
+
+
+_limiter: Optional[ConcurrencyLimiter] = None
+_rate_limiter: Optional[RateLimiter] = None
+_batch_limiter: Optional[RateLimiter] = None
+
+
+def get_limiter() -> ConcurrencyLimiter:
+    """
+    Return this process's upstream concurrency limiter.
+    """
+    global _limiter
+    if _limiter is None:
+        _limiter = ConcurrencyLimiter(
+            limit=int(os.getenv(_MAX_CONCURRENCY_ENV, _DEFAULT_CONCURRENCY)),
+            max_queue=int(os.getenv(_MAX_QUEUE_ENV, _DEFAULT_QUEUE)),
+            queue_timeout=float(os.getenv(_QUEUE_TIMEOUT_ENV, _DEFAULT_QUEUE_WAIT)),
+        )
+    return _limiter
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    """
+    Return the process-wide rate limiter, or None when rate limiting is off.
+    """
+    global _rate_limiter
+    per_minute = float(os.getenv(_RATE_PER_MINUTE_ENV, _DEFAULT_PER_MINUTE))
+    if per_minute <= 0:
+        return None
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter(
+            per_minute=per_minute,
+            burst=float(os.getenv(_RATE_BURST_ENV, _DEFAULT_BURST)),
+            path=os.getenv(_RATE_PATH_ENV, _DEFAULT_RATE_PATH),
+            shared_factor=float(os.getenv(_RATE_IP_FACTOR_ENV, _DEFAULT_IP_FACTOR)),
+        )
+    return _rate_limiter
+
+
+def get_batch_rate_limiter() -> Optional[RateLimiter]:
+    """
+    Return the process-wide budget of /optimize/batch items, or None when rate
+    limiting (or the item budget) is off. It is separate from the request
+    budget, so one batch of dozens of prompts doesn't need dozens of requests' worth.
+    """
+    global _batch_limiter
+    per_minute = float(os.getenv(_BATCH_PER_MINUTE_ENV, _DEFAULT_BATCH_PER_MINUTE))
+    if per_minute <= 0 or get_rate_limiter() is None:
+        return None
+    if _batch_limiter is None:
+        _batch_limiter = RateLimiter(
+            per_minute=per_minute,
+            burst=float(os.getenv(_BATCH_BURST_ENV, _DEFAULT_BATCH_BURST)),
+            path=os.getenv(_RATE_PATH_ENV, _DEFAULT_RATE_PATH),
+            shared_factor=float(os.getenv(_RATE_IP_FACTOR_ENV, _DEFAULT_IP_FACTOR)),
+        )
+    return _batch_limiter
+
+
+def rate_limit_response(req, items: int = 0):
+    """
+    None if the client may proceed, otherwise a 429 JSON reply with Retry-After.
+    A request costs one request; a batch of `items` prompts costs that many
+    batch items instead (a 413 when it is bigger than the item burst).
+    """
+    limiter = get_batch_rate_limiter() if items else get_rate_limiter()
+    if limiter is None:
+        return None
+    cost, prefix = (items, "batch:") if items else (1, "")
+    if cost > limiter.burst:
+        # more than a full bucket: waiting would never help, so no Retry-After
+        metrics.admission_rejections.inc(reason="over_burst")
+        return jsonify({"error": f"At most {int(limiter.burst)} items per batch under the rate limit."}), 413
+    # a fresh extension id per request would otherwise mean a fresh bucket each time
+    client, ip = client_id(req), client_ip(req)
+    allowed, retry_after = limiter.hit(prefix + client, cost, shared=prefix + ip if client != ip else None)
+    if allowed:
+        return None
+    retry_after = max(1, int(retry_after + 0.999))
+    return jsonify({"error": "Too many requests, please slow down."}), 429, {"Retry-After": str(retry_after)}
+
+
+def stats() -> dict:
+    limiter, batch = get_rate_limiter(), get_batch_rate_limiter()
+    return {"upstream": get_limiter().stats(), "rate_limit": limiter.stats() if limiter else {"enabled": False},
+            "batch_items": batch.stats() if batch else {"enabled": False}}
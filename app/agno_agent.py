@@ -1,45 +1,312 @@
 import os
+import json
+import time
+import queue
 import asyncio
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Callable, Iterator, List, Optional, Tuple
 
-from agno.tools.thinking import ThinkingTools
 from dotenv import load_dotenv
-from builtins import BaseExceptionGroup
-from agno.agent import Agent
-from agno.models.groq import Groq
-from agno.tools.mcp import MCPTools, SSEClientParams
+
+from . import fallback, logs, metrics, tracing
+from .admission import get_limiter
+from .breaker import CircuitOpenError, fallback_enabled, get_breaker
+from .cache import get_cache, make_key
+from .endpoints import Endpoint, EndpointBalancer, get_balancer
+from .hedging import get_hedger
+from .mcp_pool import CANCEL_POLL_SECONDS, RequestCancelled, ToolCallError, get_loop, get_pool, run_sync
+from .neardup import NearDuplicateIndex, get_index
+from .singleflight import SingleFlight
+from .tool_schemas import get_tool_schemas
+
+# agno, groq and mcp take about a second to import, so they are imported where
+# first needed (or up front by preload() in the gunicorn master)
+if TYPE_CHECKING:
+    from agno.tools.mcp import MCPTools, SSEClientParams
 
 load_dotenv()
 
+log = logging.getLogger(__name__)
+
 _GROQ_API_KEY_ENV = "GROQ_API_KEY"
+_MODEL_ID = "qwen/qwen3-32b"
 # _SSE_URL = "https://augustosouza-mcp-sentiment-server.hf.space/gradio_api/mcp/sse"
-_SSE_URL = "https://augustosouza-prompt-optimizer-mcp-server.hf.space/gradio_api/mcp/sse"
+_SSE_URL = os.getenv("MCP_SSE_URL", "https://augustosouza-prompt-optimizer-mcp-server.hf.space/gradio_api/mcp/sse")
+
+# Transport limits of one pooled MCP connection; single calls are bounded by the
+# adaptive per-tool timeout in app/hedging.py instead
+_CONNECT_TIMEOUT = float(os.getenv("MCP_CONNECT_TIMEOUT", 30))
+_READ_TIMEOUT    = float(os.getenv("MCP_READ_TIMEOUT", 300))
+
+# "direct" calls the named MCP tool straight away; "agent" routes it through the Groq LLM first
+_DISPATCH_MODE_ENV = "AGENT_DISPATCH_MODE"
+
+# "1" hands the agent only the tool a route asked for, with tool_choice forced to it;
+# "0" gives it the whole toolkit and lets the instruction pick (for A/B comparisons)
+_TOOL_SCOPING_ENV = "AGENT_TOOL_SCOPING"
+
+# Upper bound on concurrent upstream calls made for one batch request
+_BATCH_CONCURRENCY_ENV     = "BATCH_CONCURRENCY"
+_DEFAULT_BATCH_CONCURRENCY = 8
+
+ONE_SHOT_TOOL        = "prompt_optimizer_mcp_server_one_shot_optimization"
+FIVE_QUESTIONS_TOOL  = "prompt_optimizer_mcp_server_five_questions_analysis_and_followup_generation"
+EIGHT_QUESTIONS_TOOL = "prompt_optimizer_mcp_server_eight_questions_analysis_and_prompt_generation"
+
+# What the agent is told when a tool is dispatched through the LLM
+_TOOL_INSTRUCTIONS = {
+    ONE_SHOT_TOOL:
+        f"Call the {ONE_SHOT_TOOL} tool to optimize the following initial prompt: ",
+    FIVE_QUESTIONS_TOOL:
+        f"Call the tool named {FIVE_QUESTIONS_TOOL} "
+        "to analyse the following 5 questions and answers and generate 3 follow-up questions:\n\n",
+    EIGHT_QUESTIONS_TOOL:
+        f"Call the tool named {EIGHT_QUESTIONS_TOOL} "
+        "to analyse the 8 given questions and generate a final prompt:\n\n",
+}
+
+# Local stand-ins used while a tool's circuit is open
+_FALLBACKS = {
+    ONE_SHOT_TOOL:        fallback.one_shot,
+    FIVE_QUESTIONS_TOOL:  fallback.followup_questions,
+    EIGHT_QUESTIONS_TOOL: fallback.final_prompt,
+}
+
+# Tools whose results may be reused for a near-identical input (app/neardup.py); the
+# interactive tools' answers are short enough that a changed word changes the meaning
+_NEAR_DUP_TOOLS = {ONE_SHOT_TOOL}
+
+# Identical in-flight tool calls share one upstream request (lives on the pool's loop)
+upstream_flights = SingleFlight()
+
+# Near-duplicate audits running in the background (kept so they aren't collected mid-flight)
+_audits = set()
+
+# Where progress events go while a streaming request is running (None otherwise)
+_event_sink: ContextVar[Optional[Callable[[dict], None]]] = ContextVar("event_sink", default=None)
+
+
+def _emit(event: dict) -> None:
+    sink = _event_sink.get()
+    if sink is not None:
+        sink(event)
+
+
+def preload() -> None:
+    """
+    Import the agent stack now instead of on the first upstream call.
+    """
+    import agno.agent, agno.models.groq, agno.tools.mcp, mcp.types  # noqa: F401
 
 
-def get_sse_params() -> SSEClientParams:
+def get_sse_params(url: str = _SSE_URL) -> "SSEClientParams":
+    from agno.tools.mcp import SSEClientParams
+
     return SSEClientParams(
-        url=_SSE_URL,
-        headers={},            # add auth headers if needed
-        timeout=30,            # seconds to establish connection
-        sse_read_timeout=300,  # seconds between SSE events
+        url=url,
+        headers={},                     # add auth headers if needed
+        timeout=_CONNECT_TIMEOUT,       # seconds to establish connection
+        sse_read_timeout=_READ_TIMEOUT, # seconds between SSE events
     )
 
 
-async def _query_agent_async(message: str) -> str:
+class _TracedSession:
+    """
+    Stand-in for the MCP ClientSession handed to agno's tool entrypoints, so
+    tool calls made by the agent show up in the request's trace.
+    """
+
+    def __init__(self, session):
+        self._session = session
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    async def call_tool(self, name: str, arguments: Optional[dict] = None, **kwargs):
+        with tracing.span("tool_call", kind="client"):
+            result = await self._session.call_tool(name, arguments, **kwargs)
+            _annotate_tool_call(name, arguments, result)
+            return result
+
+
+def _annotate_tool_call(tool_name: str, arguments: Optional[dict], result) -> None:
+    tracing.annotate(**{
+        "mcp.tool": tool_name,
+        "mcp.request_bytes": len(json.dumps(arguments or {}, ensure_ascii=False).encode("utf-8")),
+        "mcp.response_bytes": sum(len(getattr(item, "text", "").encode("utf-8")) for item in result.content),
+        "mcp.is_error": bool(result.isError),
+    })
+
+
+_mcp_tools_class = None
+
+
+def _instrumented_mcp_tools_class() -> type:
+    """
+    MCPTools subclass that registers the server's tools from the shared schema
+    snapshot instead of listing them on every new session, and reports how long
+    the handshake takes (built on first use so importing this module stays cheap).
+    """
+    global _mcp_tools_class
+    if _mcp_tools_class is None:
+        from agno.tools.function import Function
+        from agno.tools.mcp import MCPTools
+        from agno.utils.mcp import get_entrypoint_for_tool
+        from mcp.types import Tool
+
+        class _InstrumentedMCPTools(MCPTools):
+            async def initialize(self) -> None:
+                if self._initialized:
+                    return
+                if self.session is None:
+                    raise ValueError("Session is not available. Use as context manager or provide a session.")
+
+                with metrics.stage("mcp_initialize"):
+                    handshake = await self.session.initialize()
+                server_version = handshake.serverInfo.version
+
+                schemas = get_tool_schemas()
+                server = self.server_params.url
+                snapshot = schemas.current(server, server_version)
+                if snapshot is None:
+                    snapshot = await schemas.fetch(self.session, server, server_version)
+                elif schemas.is_stale(snapshot):
+                    schemas.refresh_in_background(self.session, server, server_version)
+
+                tools = [Tool.model_validate(t) for t in snapshot["tools"]]
+                self._check_tools_filters(
+                    available_tools=[tool.name for tool in tools],
+                    include_tools=self.include_tools,
+                    exclude_tools=self.exclude_tools,
+                )
+                for tool in tools:
+                    if self.exclude_tools and tool.name in self.exclude_tools:
+                        continue
+                    if self.include_tools is None or tool.name in self.include_tools:
+                        self.functions[tool.name] = Function(
+                            name=tool.name,
+                            description=tool.description,
+                            parameters=tool.inputSchema,
+                            entrypoint=get_entrypoint_for_tool(tool, _TracedSession(self.session)),
+                            skip_entrypoint_processing=True,
+                        )
+                self._initialized = True
+
+        _mcp_tools_class = _InstrumentedMCPTools
+    return _mcp_tools_class
+
+
+def _new_mcp_tools(url: str = _SSE_URL) -> "MCPTools":
+    return _instrumented_mcp_tools_class()(server_params=get_sse_params(url), transport="sse",
+                                           timeout_seconds=int(_CONNECT_TIMEOUT))
+
+
+def _endpoint_pool(endpoint: Endpoint):
+    return get_pool(lambda: _new_mcp_tools(endpoint.url), endpoint.url)
+
+
+async def _probe_endpoint(endpoint: Endpoint) -> None:
+    # outside the pool's slots: waiting behind real traffic isn't a failure
+    await _endpoint_pool(endpoint).probe()
+
+
+def _balancer() -> EndpointBalancer:
+    return get_balancer(_SSE_URL, _probe_endpoint)
+
+
+@asynccontextmanager
+async def _upstream_session():
+    """
+    Borrow a warm MCPTools session from the best MCP endpoint right now (see
+    app/endpoints.py), recording the call's latency and outcome against it.
+    If no session can be opened on that endpoint, nothing has been sent yet,
+    so the next endpoint is tried.
+    """
+    balancer = _balancer()
+    tried = []
+    while True:
+        endpoint = balancer.pick(exclude=tried)
+        borrowed = False
+        try:
+            with balancer.track(endpoint, ok_errors=(ToolCallError,)), \
+                    tracing.span("mcp_session", **{"mcp.endpoint": endpoint.name}):
+                async with _endpoint_pool(endpoint).session() as mcp:
+                    borrowed = True
+                    yield mcp
+            return
+        except Exception:
+            tried.append(endpoint)
+            if borrowed or len(tried) == len(balancer.endpoints):
+                raise
+
+
+def _record_agent_run(run_response, tool_name: str, run_log: dict) -> None:
+    run_metrics = run_response.metrics or {}
+    inference = sum(run_metrics.get("time", []))
+    input_tokens = sum(run_metrics.get("input_tokens", []))
+    output_tokens = sum(run_metrics.get("output_tokens", []))
+    metrics.observe_stage("groq_inference", inference)
+    metrics.agent_inference_seconds.observe(inference, tool=tool_name)
+    metrics.agent_tokens.inc(input_tokens, tool=tool_name, direction="input")
+    metrics.agent_tokens.inc(output_tokens, tool=tool_name, direction="output")
+    run_log.update(inference_seconds=round(inference, 3), input_tokens=input_tokens, output_tokens=output_tokens)
+
+
+def _scoped_tools(mcp: "MCPTools", tool_name: Optional[str]) -> Tuple[list, Optional[dict]]:
+    """
+    Tools and tool_choice for one agent run. Scoped to `tool_name`, the model
+    sees only that tool's schema, must call it, and the run ends with the tool
+    result instead of a second model turn that would just echo it.
+    """
+    if tool_name is None or os.getenv(_TOOL_SCOPING_ENV, "1") == "0":
+        return [mcp], None
+
+    function = mcp.functions.get(tool_name)
+    if function is None:
+        raise RuntimeError(f"MCP server does not expose a tool named '{tool_name}'.")
+    # a per-run copy: the agent attaches itself to the Function it is given
+    scoped = function.model_copy(update={"stop_after_tool_call": True})
+    return [scoped], {"type": "function", "function": {"name": tool_name}}
+
+
+_groq_http = None
+
+
+def _groq_http_client():
+    """
+    One HTTP client for every Groq call made on the background loop: keeps the
+    connection to the API warm between runs and records each request as a span.
+    """
+    global _groq_http
+    loop = asyncio.get_running_loop()
+    if _groq_http is None or _groq_http[0] is not loop:
+        _groq_http = (loop, tracing.http_client())
+    return _groq_http[1]
+
+
+async def _run_agent(mcp: "MCPTools", message: str, tool_name: Optional[str] = None) -> str:
     if not os.getenv(_GROQ_API_KEY_ENV):
         raise RuntimeError(f"Environment variable '{_GROQ_API_KEY_ENV}' is not set.")
 
-    # Manually enter the SSE-based MCPTools context
-    mcp = MCPTools(server_params=get_sse_params(), transport="sse", timeout_seconds=30)
-    await mcp.__aenter__()
+    from agno.agent import Agent
+    from agno.models.groq import Groq
 
-    try:
+    tools, tool_choice = _scoped_tools(mcp, tool_name)
+    # the trace decides up front whether this run is sampled, which the agent's debug switch follows
+    with logs.agent_trace(tool=tool_name or "free_form", model=_MODEL_ID) as run_log:
         # Build the agent and call its async run
         agent = Agent(
-            model=Groq(id="qwen/qwen3-32b"),
-            tools=[mcp],
-            show_tool_calls=True,
+            model=Groq(id=_MODEL_ID, http_client=_groq_http_client()),
+            tools=tools,
+            tool_choice=tool_choice,
+            tool_call_limit=1 if tool_choice else None,
+            telemetry=False,
+            show_tool_calls=False,
             markdown=False,
-            debug_mode=True,
+            # on while a sampled run is in flight; its debug output goes to a per-run buffer in app/logs.py
+            debug_mode=logs.agent_debug(),
             debug_level=2,
             system_message=
 
@@ -53,37 +320,350 @@ async def _query_agent_async(message: str) -> str:
                 # "if the tool returns 'Three questions: 1. Foo? 2. Foo? 3. Foo?' your response is just '1. Foo? 2. Foo? 3. Foo?' and nothing else, ",
         )
         # Use the async agent method so MCPTools can drive SSE under the hood
-        run_response = await agent.arun(message)
+        with metrics.stage("agent_run"):
+            run_response = await agent.arun(message)
+        _record_agent_run(run_response, tool_name or "free_form", run_log)
+
+
+    ##### AUGUSTO INTERNAL DEBUG #####
+    # print("Debug run_response await agent.arun(message).content, fetching the response by the Agno agent after receiving it from the MCP tool: ", run_response.content)
+    #
+    # print("Debug run_response.tools[0].result), fetching the response directly from the MCP tool: ", run_response.tools[0].result)
+    #
+    # if run_response.content.strip() == run_response.tools[0].result.strip():
+    #     print("SAME RESPONSE")
+    # else:
+    #     print("DIFFERENT RESPONSE")
+
+    # return run_response.content  # fetching the response by the Agno agent after receiving it from the MCP tool
+    return run_response.tools[0].result.strip()  # fetching the response directly from the MCP tool
+
+
+def _text_argument(mcp: "MCPTools", tool_name: str):
+    """
+    Name of the single string parameter of `tool_name`, or None when the tool's
+    schema needs more than one free-text value (those go through the agent).
+    """
+    function = mcp.functions.get(tool_name)
+    if function is None:
+        raise RuntimeError(f"MCP server does not expose a tool named '{tool_name}'.")
 
+    properties = (function.parameters or {}).get("properties", {})
+    text_params = [name for name, spec in properties.items() if spec.get("type", "string") == "string"]
+    if len(properties) == 1 and len(text_params) == 1:
+        return text_params[0]
+    return None
 
-        ##### AUGUSTO INTERNAL DEBUG #####
-        # print("Debug run_response await agent.arun(message).content, fetching the response by the Agno agent after receiving it from the MCP tool: ", run_response.content)
-        #
-        # print("Debug run_response.tools[0].result), fetching the response directly from the MCP tool: ", run_response.tools[0].result)
-        #
-        # if run_response.content.strip() == run_response.tools[0].result.strip():
-        #     print("SAME RESPONSE")
-        # else:
-        #     print("DIFFERENT RESPONSE")
 
+async def _forward_progress(progress: float, total: Optional[float], message: Optional[str]) -> None:
+    _emit({"event": "progress", "progress": progress, "total": total, "message": message})
+
+
+async def _call_tool_async(mcp: "MCPTools", tool_name: str, arguments: dict) -> str:
+    from mcp.types import TextContent
+
+    _emit({"event": "status", "stage": "calling_tool"})
+    with metrics.stage("tool_call"):
+        result = await mcp.session.call_tool(tool_name, arguments, progress_callback=_forward_progress)
+        _annotate_tool_call(tool_name, arguments, result)
+    if result.isError:
+        raise ToolCallError(f"Error from MCP tool '{tool_name}': {result.content}")
+    return "\n".join(item.text for item in result.content if isinstance(item, TextContent)).strip()
+
+
+def _direct_dispatch() -> bool:
+    return os.getenv(_DISPATCH_MODE_ENV, "direct").lower() == "direct"
+
+
+async def _dispatch_tool_async(tool_name: str, text: str) -> str:
+    _emit({"event": "status", "stage": "connecting"})
+    async with _upstream_session() as mcp:
+        param = _text_argument(mcp, tool_name) if _direct_dispatch() else None
+        if param is not None:
+            return await _call_tool_async(mcp, tool_name, {param: text})
+        return await _run_agent(
+            mcp, _TOOL_INSTRUCTIONS.get(tool_name, f"Call the tool named {tool_name} with: ") + text, tool_name
+        )
+
+
+def _circuit_open_result(tool_name: str, text: str, circuit) -> str:
+    """
+    Answer for a call refused by an open circuit: the local template fallback
+    (never cached) or, with CIRCUIT_FALLBACK=0, a fast CircuitOpenError.
+    """
+    local = _FALLBACKS.get(tool_name)
+    if local is None or not fallback_enabled():
+        metrics.upstream_calls.inc(tool=tool_name, outcome="circuit_open")
+        raise CircuitOpenError(tool_name, circuit.retry_after())
+    metrics.upstream_calls.inc(tool=tool_name, outcome="fallback")
+    _emit({"event": "status", "stage": "degraded"})
+    return local(text)
+
+
+async def query_tool_async(tool_name: str, text: str, use_cache: bool = True) -> str:
+    """
+    Coroutine behind query_tool(); must run on the background loop (get_loop()).
+    """
+    with tracing.span("query_tool", tool=tool_name, input_bytes=len(text.encode("utf-8"))) as current:
+        result = await _query_tool_async(tool_name, text, use_cache)
+        if current is not None:
+            current.set(output_bytes=len(result.encode("utf-8")), degraded=bool(getattr(result, "degraded", False)))
+        return result
+
+
+async def _query_tool_async(tool_name: str, text: str, use_cache: bool) -> str:
+    cache = get_cache()
+    key   = make_key(tool_name, text, "direct" if _direct_dispatch() else _MODEL_ID)
+
+    if cache is not None:
+        if use_cache:
+            with metrics.stage("cache_lookup"):
+                cached = await cache.get_async(key)
+            if cached is not None:
+                metrics.upstream_calls.inc(tool=tool_name, outcome="cache_hit")
+                tracing.annotate(source="cache")
+                _emit({"event": "status", "stage": "cache_hit"})
+                return cached
+        else:
+            cache.count("bypassed")
+
+    index = get_index() if tool_name in _NEAR_DUP_TOOLS else None
+    if index is not None:
+        prompt, tone = fallback.split_tone(text)
+        scope = (tool_name, "direct" if _direct_dispatch() else _MODEL_ID, tone.lower())
+
+    async def fetch() -> str:
+        circuit = get_breaker(tool_name)
+        permit = circuit.allow()
+        if permit is None:
+            return _circuit_open_result(tool_name, text, circuit)
+
+        limiter = get_limiter()
+        try:
+            await limiter.acquire()
+        except BaseException:
+            circuit.release(permit)  # refused before reaching the upstream: no verdict on it
+            raise
+
+        metrics.upstream_in_flight.inc(tool=tool_name)
+        started, summary = time.perf_counter(), {"tool": tool_name, "outcome": "ok"}
+        try:
+            # adaptive timeout, plus one hedged duplicate if this call runs slow
+            result = await get_hedger().run(tool_name, lambda: _dispatch_tool_async(tool_name, text))
+        except ToolCallError:
+            # the server answered; only the tool itself complained
+            circuit.record(permit, success=True)
+            metrics.upstream_calls.inc(tool=tool_name, outcome="error")
+            summary.update(outcome="tool_error")
+            raise
+        except Exception as e:
+            circuit.record(permit, success=False)
+            metrics.upstream_calls.inc(tool=tool_name, outcome="error")
+            summary.update(outcome="error", error=type(e).__name__)
+            raise
+        except BaseException:
+            circuit.release(permit)
+            metrics.upstream_calls.inc(tool=tool_name, outcome="cancelled")
+            summary.update(outcome="cancelled")
+            raise
+        finally:
+            metrics.upstream_in_flight.dec(tool=tool_name)
+            limiter.release()
+            log.info("upstream call", extra={**summary, "seconds": round(time.perf_counter() - started, 3)})
+        circuit.record(permit, success=True)
+        metrics.upstream_calls.inc(tool=tool_name, outcome="ok")
+        if cache is not None:
+            await cache.set_async(key, result)
+        if index is not None:
+            index.add(scope, prompt, result)
+        return result
+
+    if index is not None and use_cache:
+        with metrics.stage("near_dup_lookup"):
+            found = index.lookup(scope, prompt)
+        if found is None:
+            metrics.neardup_lookups.inc(tool=tool_name, outcome="miss")
+        else:
+            result, similarity = found
+            metrics.neardup_lookups.inc(tool=tool_name, outcome="exact" if similarity >= 1.0 else "near")
+            metrics.neardup_hit_similarity.observe(similarity, tool=tool_name)
+            metrics.upstream_calls.inc(tool=tool_name, outcome="near_duplicate")
+            tracing.annotate(source="near_duplicate", similarity=round(similarity, 3))
+            _emit({"event": "status", "stage": "near_duplicate", "similarity": round(similarity, 3)})
+            if index.should_audit():
+                audit = asyncio.ensure_future(_audit_near_dup(index, result, lambda: upstream_flights.do(key, fetch)))
+                _audits.add(audit)
+                audit.add_done_callback(_audits.discard)
+            return result
+
+    return await upstream_flights.do(key, fetch)
+
+
+async def _audit_near_dup(index: NearDuplicateIndex, served: str, fetch: Callable) -> None:
+    """
+    Fetch the real answer for a prompt that was served from the near-duplicate
+    index and record how close the two are.
+    """
+    _event_sink.set(None)  # the request that got the served answer has finished
+    root = tracing.start_trace("near_dup_audit", kind="internal")
+    try:
+        fresh = await fetch()
+    except Exception as e:
+        tracing.fail(e)
+        return
+    finally:
+        tracing.finish_trace(root)
+    if not getattr(fresh, "degraded", False):
+        index.record_audit(served, fresh)
+
+
+async def warm_up_async(sessions: int = 1) -> None:
+    """
+    Open up to `sessions` pooled MCP sessions per endpoint (which also loads
+    the tool schemas) so the first real request finds them warm. An endpoint
+    that can't be reached doesn't stop the others from warming up.
+    """
+    balancer = _balancer()
+    pools = [(endpoint, _endpoint_pool(endpoint)) for endpoint in balancer.endpoints]
+
+    async def one(endpoint: Endpoint, pool) -> None:
+        try:
+            async with pool.session():
+                pass
+        except Exception:
+            balancer.record(endpoint, None, success=False)
+            raise
+
+    opening = [one(endpoint, pool) for endpoint, pool in pools for _ in range(max(1, min(sessions, pool.size)))]
+    with metrics.stage("warm_up"):
+        results = await asyncio.gather(*opening, return_exceptions=True)
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if len(errors) == len(results):
+        raise errors[0]
+
+
+def warm_up(sessions: int = 1, timeout: Optional[float] = None) -> None:
+    """
+    Blocking warm_up_async(). On timeout the connections keep opening in the
+    background and the caller carries on.
+    """
+    run_sync(warm_up_async(sessions), timeout)
+
+
+def query_tool(tool_name: str, text: str, use_cache: bool = True,
+               cancel_if: Optional[Callable[[], bool]] = None) -> str:
+    """
+    Blocking entry point for routes that already know which MCP tool they want.
+    In "direct" dispatch mode the tool is called with `text` as its argument and
+    no LLM round-trip; set AGENT_DISPATCH_MODE=agent to go through the agent.
+    Results are served from the shared result cache unless `use_cache` is False,
+    in which case a fresh result is fetched and stored. While the tool's circuit
+    is open the result comes from app/fallback.py and has `.degraded` set (or
+    CircuitOpenError is raised when CIRCUIT_FALLBACK=0). Raises
+    admission.Overloaded when no upstream slot frees up in time, and
+    RequestCancelled once `cancel_if` (e.g. a disconnect.ClientWatch) fires.
+    """
+    return run_sync(query_tool_async(tool_name, text, use_cache), cancel_if=cancel_if)
+
+
+def _stream_from_loop(run: Callable, cancel_if: Optional[Callable[[], bool]] = None,
+                      parent: Optional[tracing.Span] = None) -> Iterator[dict]:
+    """
+    Run `run(put)` on the background loop and yield every event it puts, in
+    order, until it returns. Closing the generator early cancels the coroutine;
+    so does `cancel_if` returning True between events, which then raises
+    RequestCancelled. `parent` is the request's span, taken while the view ran
+    (this generator only starts once the response is being sent).
+    """
+    events = queue.Queue()
+
+    async def wrapper() -> None:
+        try:
+            await tracing.carry(run(events.put_nowait), parent)
+        finally:
+            events.put_nowait(None)
+
+    future = asyncio.run_coroutine_threadsafe(wrapper(), get_loop())
+    try:
+        while True:
+            try:
+                event = events.get(timeout=CANCEL_POLL_SECONDS if cancel_if else None)
+            except queue.Empty:
+                if cancel_if():
+                    raise RequestCancelled("The client went away before the result was ready.")
+                continue
+            if event is None:
+                return
+            yield event
     finally:
-        # Exit the context, suppressing only the Python 3.12 cancel-scope bug
+        future.cancel()
+
+
+def _degraded_flag(result: str) -> dict:
+    return {"degraded": True} if getattr(result, "degraded", False) else {}
+
+
+def stream_tool(tool_name: str, text: str, use_cache: bool = True,
+                cancel_if: Optional[Callable[[], bool]] = None) -> Iterator[dict]:
+    """
+    Streaming variant of query_tool(): yields status/progress events as the call
+    moves through the pipeline, then a final {"event": "result"} or
+    {"event": "error"} event. Closing the generator early, or `cancel_if`
+    firing, cancels the call.
+    """
+    async def run(put) -> None:
+        put({"event": "status", "stage": "queued"})
+        _event_sink.set(put)
         try:
-            await mcp.__aexit__(None, None, None)
-        except BaseExceptionGroup:
-            # swallow the known TaskGroup cleanup noise
-            pass
+            result = await query_tool_async(tool_name, text, use_cache)
+            put({"event": "result", "text": result, **_degraded_flag(result)})
         except Exception as e:
-            # any other error should bubble up
-            if "cancel scope" not in str(e):
-                raise
+            put({"event": "error", "error": str(e)})
 
-    # return run_response.content  # fetching the response by the Agno agent after receiving it from the MCP tool
-    return run_response.tools[0].result.strip()  # fetching the response directly from the MCP tool
+    return _stream_from_loop(run, cancel_if, tracing.current())
+
+
+async def _run_batch_async(calls: List[Tuple[str, str]], use_cache: bool, put: Callable) -> None:
+    limit = asyncio.Semaphore(max(1, int(os.getenv(_BATCH_CONCURRENCY_ENV, _DEFAULT_BATCH_CONCURRENCY))))
+
+    async def one(index: int, tool_name: str, text: str) -> None:
+        async with limit:
+            try:
+                result = await query_tool_async(tool_name, text, use_cache)
+                put({"event": "item", "index": index, "text": result, **_degraded_flag(result)})
+            except Exception as e:
+                put({"event": "item", "index": index, "error": str(e)})
+
+    await asyncio.gather(*(one(i, tool_name, text) for i, (tool_name, text) in enumerate(calls)))
+
+
+def stream_tools_batch(calls: List[Tuple[str, str]], use_cache: bool = True,
+                       cancel_if: Optional[Callable[[], bool]] = None) -> Iterator[dict]:
+    """
+    Run many (tool_name, text) calls concurrently, at most BATCH_CONCURRENCY at
+    a time, yielding {"event": "item", "index": i, "text"|"error": ...} as each
+    one finishes.
+    """
+    return _stream_from_loop(lambda put: _run_batch_async(calls, use_cache, put), cancel_if, tracing.current())
+
+
+def query_tools_batch(calls: List[Tuple[str, str]], use_cache: bool = True,
+                      cancel_if: Optional[Callable[[], bool]] = None) -> List[dict]:
+    """
+    Blocking variant of stream_tools_batch(): one {"text"|"error": ...} dict per
+    call, in the order the calls were given.
+    """
+    results = [None] * len(calls)
+    for event in stream_tools_batch(calls, use_cache, cancel_if):
+        index = event.pop("index")
+        results[index] = {k: v for k, v in event.items() if k != "event"}
+    return results
 
 
-def query_agent(message: str) -> str:
+def one_shot_input(prompt: str, styling: Optional[str] = None) -> str:
     """
-    Blocking entry point for Flask: runs the async helper via asyncio.run().
+    Input text for the one-shot tool, with the writing tone folded in when given.
     """
-    return asyncio.run(_query_agent_async(message))
+    if not styling:
+        return prompt
+    return f"{prompt} [Please consider a {styling} writing tone to optimize the given prompt]"
@@ -0,0 +1,115 @@
+import os
+import re
+import hashlib
+import functools
+import mimetypes
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from flask import Blueprint, Response, abort, current_app, request, url_for
+from werkzeug.security import safe_join
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Fingerprinted static files: /assets/<name>.<content hash>.<ext> never changes,
+# so browsers and CDNs may keep it for a year without asking again
+_ASSET_MAX_AGE  = 365 * 24 * 3600
+_STALE_MAX_AGE  = 60      # an old fingerprint (page rendered before a deploy) gets the current file, briefly
+_DIGEST_CHARS   = 12
+_FINGERPRINTED  = re.compile(r"^(?P<stem>.+)\.(?P<digest>[0-9a-f]{%d})(?P<ext>\.[^./]+)$" % _DIGEST_CHARS)
+# ────────────────────────────────────────────────────────────────────────────────
+
+assets_bp = Blueprint('assets', __name__)
+
+
+class _Asset(NamedTuple):
+    data: bytes
+    digest: str
+    mtime: float
+    mimetype: str
+
+
+_assets: Dict[str, _Asset] = {}
+_pages: Dict[str, Tuple[bytes, str]] = {}
+
+
+def _load(filename: str) -> Optional[_Asset]:
+    """
+    The static file `filename` with its content hash, re-read when it changes on disk.
+    """
+    path = safe_join(current_app.static_folder, filename)
+    try:
+        mtime = os.stat(path).st_mtime if path else None
+    except OSError:
+        mtime = None
+    if mtime is None:
+        return None
+
+    asset = _assets.get(filename)
+    if asset is None or asset.mtime != mtime:
+        with open(path, "rb") as f:
+            data = f.read()
+        asset = _Asset(data, hashlib.sha256(data).hexdigest()[:_DIGEST_CHARS], mtime,
+                       mimetypes.guess_type(filename)[0] or "application/octet-stream")
+        _assets[filename] = asset
+    return asset
+
+
+def asset_url(filename: str) -> str:
+    """
+    Fingerprinted URL of a file under static/ (template global); falls back
+    to the plain static URL for files that don't exist.
+    """
+    asset = _load(filename)
+    if asset is None:
+        return url_for('static', filename=filename)
+    stem, ext = os.path.splitext(filename)
+    return url_for('assets.asset', filename=f"{stem}.{asset.digest}{ext}")
+
+
+@assets_bp.route('/assets/<path:filename>')
+def asset(filename):
+    """
+    Serve a fingerprinted static file with immutable caching.
+    """
+    match = _FINGERPRINTED.match(filename)
+    found = _load(match.group("stem") + match.group("ext")) if match else None
+    if found is None:
+        abort(404)
+
+    response = Response(found.data, mimetype=found.mimetype)
+    response.set_etag(found.digest)
+    if match.group("digest") == found.digest:
+        response.headers["Cache-Control"] = f"public, max-age={_ASSET_MAX_AGE}, immutable"
+    else:
+        response.headers["Cache-Control"] = f"public, max-age={_STALE_MAX_AGE}"
+    return response.make_conditional(request)
+
+
+def cached_page(view):
+    """
+    For views whose HTML depends only on the templates: render once per
+    process, send it with an ETag, and answer 304 when the browser already has
+    it. Re-rendered on every request in debug mode.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.script_root + request.path
+        cached = None if current_app.debug else _pages.get(key)
+        if cached is None:
+            body = view(*args, **kwargs).encode("utf-8")
+            cached = (body, hashlib.sha256(body).hexdigest()[:16])
+            _pages[key] = cached
+
+        body, etag = cached
+        response = Response(body, mimetype="text/html")
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"  # always revalidate, so a deploy shows at once
+        return response.make_conditional(request)
+    return wrapper
+
+
+def init_app(app) -> None:
+    """
+    Serve fingerprinted assets and expose asset_url() to the templates.
+    """
+    app.register_blueprint(assets_bp)
+    app.add_template_global(asset_url)
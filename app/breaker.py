@@ -0,0 +1,168 @@
+import os
+import time
+from typing import Dict, Optional
+
+from . import metrics
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Circuit breaker tuning (all optional, read from the environment)
+_FAILURE_THRESHOLD_ENV = "CIRCUIT_FAILURE_THRESHOLD"  # consecutive upstream failures that open a tool's circuit
+_TOOL_THRESHOLDS_ENV   = "CIRCUIT_TOOL_THRESHOLDS"    # per-tool overrides: "tool_a=3,tool_b=8"
+_OPEN_SECONDS_ENV      = "CIRCUIT_OPEN_SECONDS"       # how long an open circuit waits before letting one probe through
+_FALLBACK_ENV          = "CIRCUIT_FALLBACK"           # "1" answers from the local fallback while open, "0" fails fast
+
+_DEFAULT_THRESHOLD     = 5
+_DEFAULT_OPEN_SECONDS  = 30
+# ────────────────────────────────────────────────────────────────────────────────
+
+# Circuit states (the numbers are what the circuit_state gauge reports)
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised instead of calling an upstream tool whose circuit is open.
+    """
+
+    def __init__(self, tool: str, retry_after: float):
+        super().__init__(f"The optimization service is temporarily unavailable; please retry in {retry_after:.0f}s.")
+        self.tool        = tool
+        self.retry_after = retry_after
+
+
+class Permit:
+    """
+    Handed out by CircuitBreaker.allow(); marks whether the call is the probe.
+    """
+
+    __slots__ = ("probe",)
+
+    def __init__(self, probe: bool):
+        self.probe = probe
+
+
+class CircuitBreaker:
+    """
+    Closed → open after `threshold` consecutive failures; open → half-open once
+    `open_seconds` have passed, when a single probe call is let through; the
+    probe's outcome closes the circuit again or re-opens it for another period.
+    Lives on the background loop; not thread-safe.
+    """
+
+    def __init__(self, tool: str, threshold: int = _DEFAULT_THRESHOLD, open_seconds: float = _DEFAULT_OPEN_SECONDS):
+        self.tool         = tool
+        self.threshold    = max(1, threshold)
+        self.open_seconds = open_seconds
+        self.state        = CLOSED
+        self.failures     = 0
+        self.opened_at    = 0.0
+        self._probing     = False
+        self.counts       = {"rejected": 0, "opened": 0, "closed": 0}
+        metrics.circuit_state.set(_STATE_VALUES[CLOSED], tool=tool)
+
+    def _move(self, state: str) -> None:
+        self.state = state
+        metrics.circuit_state.set(_STATE_VALUES[state], tool=self.tool)
+        metrics.circuit_transitions.inc(tool=self.tool, state=state)
+
+    def retry_after(self) -> float:
+        return max(1.0, self.opened_at + self.open_seconds - time.monotonic())
+
+    def allow(self) -> Optional["Permit"]:
+        """
+        A permit if a call may go upstream now, else None. In the half-open
+        state the permit is the probe's; every permit must end in record() or
+        release().
+        """
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+            self._move(HALF_OPEN)
+        if self.state == CLOSED:
+            return Permit(probe=False)
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return Permit(probe=True)
+        self.counts["rejected"] += 1
+        return None
+
+    def record(self, permit: "Permit", success: bool) -> None:
+        """
+        The upstream's verdict on a call. Only the probe moves a half-open
+        circuit; a call let through while closed that finishes after the circuit
+        opened says nothing about the upstream now, and is ignored.
+        """
+        if permit.probe:
+            self._probing = False
+            if success:
+                self.failures = 0
+                self.counts["closed"] += 1
+                self._move(CLOSED)
+            else:
+                self._open()
+            return
+
+        if self.state != CLOSED:
+            return
+        if success:
+            self.failures = 0
+            return
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self._open()
+
+    def _open(self) -> None:
+        self.opened_at = time.monotonic()
+        if self.state != OPEN:
+            self.counts["opened"] += 1
+            self._move(OPEN)
+
+    def release(self, permit: "Permit") -> None:
+        """
+        The call was abandoned (cancelled) before it said anything about the
+        upstream; a probe gives its slot back without changing state.
+        """
+        if permit.probe:
+            self._probing = False
+
+    def stats(self) -> dict:
+        return {**self.counts, "state": self.state, "consecutive_failures": self.failures,
+                "threshold": self.threshold,
+                "retry_after": round(self.retry_after(), 1) if self.state == OPEN else None}
+
+
+def _tool_thresholds() -> Dict[str, int]:
+    overrides = {}
+    for part in os.getenv(_TOOL_THRESHOLDS_ENV, "").split(","):
+        name, _, value = part.partition("=")
+        if name.strip() and value.strip().isdigit():
+            overrides[name.strip()] = int(value)
+    return overrides
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_overrides: Optional[Dict[str, int]] = None
+
+
+def get_breaker(tool: str) -> CircuitBreaker:
+    """
+    Return this process's circuit breaker for `tool`.
+    """
+    global _overrides
+    breaker = _breakers.get(tool)
+    if breaker is None:
+        if _overrides is None:
+            _overrides = _tool_thresholds()
+        breaker = _breakers[tool] = CircuitBreaker(
+            tool,
+            threshold=_overrides.get(tool, int(os.getenv(_FAILURE_THRESHOLD_ENV, _DEFAULT_THRESHOLD))),
+            open_seconds=float(os.getenv(_OPEN_SECONDS_ENV, _DEFAULT_OPEN_SECONDS)),
+        )
+    return breaker
+
+
+def fallback_enabled() -> bool:
+    return os.getenv(_FALLBACK_ENV, "1") != "0"
+
+
+def stats() -> dict:
+    return {"fallback": fallback_enabled(), "tools": {tool: b.stats() for tool, b in _breakers.items()}}
@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from . import storage
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Result cache tuning (all optional, read from the environment)
+_CACHE_ENABLED_ENV = "RESULT_CACHE_ENABLED"   # "0" turns both tiers off
+_CACHE_SIZE_ENV    = "RESULT_CACHE_SIZE"      # entries kept in the in-process LRU
+_CACHE_TTL_ENV     = "RESULT_CACHE_TTL"       # seconds a result stays valid
+_CACHE_PATH_ENV    = "RESULT_CACHE_PATH"      # SQLite file shared by all workers ("" disables it)
+
+_DEFAULT_SIZE      = 1024
+_DEFAULT_TTL       = 24 * 3600
+_DEFAULT_PATH      = os.path.join(tempfile.gettempdir(), "prompt-optimizer-cache.sqlite3")
+_PURGE_EVERY_SECONDS = 300
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+def normalize_text(text: str) -> str:
+    """
+    Collapse runs of whitespace so trivially reformatted prompts share a key.
+    """
+    return " ".join(text.split())
+
+
+def make_key(tool_name: str, text: str, model_id: str) -> str:
+    """
+    Cache key for one upstream call: the tool, the model that drives it and the
+    normalized input text (which already carries the tone or custom styling).
+    """
+    raw = json.dumps([tool_name, model_id, normalize_text(text)], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def bypass_requested(req) -> bool:
+    """
+    True when the caller asked for a fresh upstream result for this request,
+    via `Cache-Control: no-cache`, `X-Cache-Bypass: 1` or `?no_cache=1`.
+    """
+    if "no-cache" in req.headers.get("Cache-Control", "").lower():
+        return True
+    if req.headers.get("X-Cache-Bypass", "").lower() in ("1", "true", "yes"):
+        return True
+    return req.args.get("no_cache", "").lower() in ("1", "true", "yes")
+
+
+class _LRUTier:
+    """
+    In-process LRU with per-entry expiry.
+    """
+
+    def __init__(self, size: int):
+        self.size    = size
+        self._items  = OrderedDict()
+        self._lock   = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, expires: float) -> None:
+        with self._lock:
+            self._items[key] = (value, expires)
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class _SQLiteTier:
+    """
+    Shared on-disk tier. WAL mode lets every gunicorn worker read while one writes.
+    """
+
+    def __init__(self, path: str):
+        self.path   = path
+        self._conn  = None
+        self._pid   = None
+        self._lock  = threading.Lock()
+        self._last_purge = time.time()
+
+    def _connection(self) -> sqlite3.Connection:
+        # never reuse a connection inherited across fork()
+        if self._conn is None or self._pid != os.getpid():
+            conn = storage.connect(self.path, timeout=1.0)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS results_expires ON results (expires)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value, expires FROM results WHERE key = ? AND expires >= ?", (key, time.time())
+            ).fetchone()
+        return row
+
+    def set(self, key: str, value: str, expires: float) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("INSERT OR REPLACE INTO results (key, value, expires) VALUES (?, ?, ?)", (key, value, expires))
+            now = time.time()
+            if now - self._last_purge > _PURGE_EVERY_SECONDS:
+                self._last_purge = now
+                conn.execute("DELETE FROM results WHERE expires < ?", (now,))
+
+
+class ResultCache:
+    """
+    Two-tier cache for upstream tool results: a per-worker LRU in front of a
+    SQLite file every worker shares. Disk errors degrade to a miss, never a 500.
+    Code on the event loop uses get_async()/set_async(), which leave the disk
+    tier to a thread so a locked file never stalls the loop.
+    """
+
+    def __init__(self, size: int = _DEFAULT_SIZE, ttl: float = _DEFAULT_TTL, path: Optional[str] = _DEFAULT_PATH):
+        self.ttl    = ttl
+        self.memory = _LRUTier(size)
+        self.disk   = _SQLiteTier(path) if path else None
+        self.counts = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "bypassed": 0, "disk_errors": 0}
+        self._lock  = threading.Lock()   # counters move on request threads, the loop and executor threads
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] += 1
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            self.count("memory_hits")
+            return value
+        return self._from_disk(key)
+
+    async def get_async(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            self.count("memory_hits")
+            return value
+        if self.disk is None:
+            self.count("misses")
+            return None
+        return await asyncio.get_running_loop().run_in_executor(None, self._from_disk, key)
+
+    def _from_disk(self, key: str) -> Optional[str]:
+        if self.disk is not None:
+            try:
+                row = self.disk.get(key)
+            except sqlite3.Error:
+                self.count("disk_errors")
+                row = None
+            if row is not None:
+                self.count("disk_hits")
+                self.memory.set(key, row[0], row[1])
+                return row[0]
+
+        self.count("misses")
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        expires = self._to_memory(key, value)
+        if expires is not None:
+            self._to_disk(key, value, expires)
+
+    async def set_async(self, key: str, value: str) -> None:
+        expires = self._to_memory(key, value)
+        if expires is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._to_disk, key, value, expires)
+
+    def _to_memory(self, key: str, value: str) -> Optional[float]:
+        if not value:
+            return None
+        expires = time.time() + self.ttl
+        self.memory.set(key, value, expires)
+        self.count("stores")
+        return expires if self.disk is not None else None
+
+    def _to_disk(self, key: str, value: str, expires: float) -> None:
+        try:
+            self.disk.set(key, value, expires)
+        except sqlite3.Error:
+            self.count("disk_errors")
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+        lookups = counts["memory_hits"] + counts["disk_hits"] + counts["misses"]
+        hits = counts["memory_hits"] + counts["disk_hits"]
+        return {
+            **counts,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "disk_path": self.disk.path if self.disk is not None else None,
+        }
+
+
+_cache: Optional[ResultCache] = None
+
+
+def get_cache() -> Optional[ResultCache]:
+    """
+    Return the process-wide result cache, or None when caching is disabled.
+    """
+    global _cache
+    if os.getenv(_CACHE_ENABLED_ENV, "1") == "0":
+        return None
+    if _cache is None:
+        _cache = ResultCache(
+            size=int(os.getenv(_CACHE_SIZE_ENV, _DEFAULT_SIZE)),
+            ttl=float(os.getenv(_CACHE_TTL_ENV, _DEFAULT_TTL)),
+            path=os.getenv(_CACHE_PATH_ENV, _DEFAULT_PATH),
+        )
+    return _cache
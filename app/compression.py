@@ -0,0 +1,100 @@
+import os
+import gzip
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # optional: without it responses are gzip-compressed only
+    brotli = None
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Response compression (all optional, read from the environment)
+_ENABLED_ENV   = "COMPRESSION_ENABLED"     # "0" sends everything uncompressed
+_MIN_BYTES_ENV = "COMPRESSION_MIN_BYTES"   # smaller bodies aren't worth the CPU
+
+_DEFAULT_MIN_BYTES = 512
+_GZIP_LEVEL        = 6
+_BROTLI_QUALITY    = 5
+_CACHE_ENTRIES     = 64    # compressed bodies of responses with an ETag (pages, assets)
+_COMPRESSIBLE      = {"text/html", "text/plain", "text/css", "text/javascript", "application/javascript",
+                      "application/json", "image/svg+xml"}
+# ────────────────────────────────────────────────────────────────────────────────
+
+_cache: "OrderedDict[tuple, bytes]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _encode(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=_GZIP_LEVEL, mtime=0)
+
+
+def _encoded(data: bytes, encoding: str, etag: Optional[str]) -> bytes:
+    """
+    Compress `data`; bodies with an ETag are the same every time, so their
+    compressed form is kept.
+    """
+    if etag is None:
+        return _encode(data, encoding)
+    key = (etag, encoding)
+    with _cache_lock:
+        body = _cache.get(key)
+        if body is not None:
+            _cache.move_to_end(key)
+            return body
+    body = _encode(data, encoding)
+    with _cache_lock:
+        _cache[key] = body
+        while len(_cache) > _CACHE_ENTRIES:
+            _cache.popitem(last=False)
+    return body
+
+
+def _choose(accept_encodings) -> Optional[str]:
+    if brotli is not None and accept_encodings["br"] and accept_encodings["br"] >= accept_encodings["gzip"]:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def init_app(app) -> None:
+    """
+    Compress text responses (HTML, JSON, JS, ...) with brotli or gzip as the
+    client accepts. Streams (SSE) and file passthroughs are left alone.
+    """
+    from flask import request
+
+    if os.getenv(_ENABLED_ENV, "1") == "0":
+        return
+    min_bytes = int(os.getenv(_MIN_BYTES_ENV, _DEFAULT_MIN_BYTES))
+
+    @app.after_request
+    def _compress(response):
+        if (response.direct_passthrough or response.is_streamed or response.status_code == 204
+                or response.status_code < 200 or "Content-Encoding" in response.headers
+                or response.mimetype not in _COMPRESSIBLE):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        encoding = _choose(request.accept_encodings)
+        if response.status_code == 304:
+            etag, _ = response.get_etag()
+            if etag is not None and encoding is not None:
+                response.set_etag(etag, weak=True)  # matches what the 200 carried
+            return response
+        if encoding is None or response.content_length is not None and response.content_length < min_bytes:
+            return response
+
+        data = response.get_data()
+        if len(data) < min_bytes:
+            return response
+        etag, _ = response.get_etag()
+        response.set_data(_encoded(data, encoding, etag))
+        response.headers["Content-Encoding"] = encoding
+        if etag is not None:
+            response.set_etag(etag, weak=True)  # same resource, different bytes
+        return response
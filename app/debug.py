@@ -0,0 +1,79 @@
+from flask import Blueprint, abort, jsonify, redirect, render_template, request, send_from_directory, url_for
+from . import profiling
+from .admin import admin_required
+from .tracing import get_store
+
+debug_bp = Blueprint('debug', __name__)
+
+
+@debug_bp.route('/debug/traces')
+@admin_required
+def traces():
+    """
+    This worker's recent and slowest traces (HTML, or JSON with ?format=json).
+    """
+    store = get_store()
+    recent  = [t.summary() for t in store.recent()]
+    slowest = [t.summary() for t in store.slowest_traces()]
+    if request.args.get("format") == "json":
+        return jsonify({**store.stats(), "recent": recent, "slowest": slowest})
+    return render_template('debug_traces.html', recent=recent, slowest=slowest, stats=store.stats())
+
+
+@debug_bp.route('/debug/traces/<trace_id>')
+@admin_required
+def trace_detail(trace_id):
+    """
+    One trace as a waterfall of its spans (or OTLP/JSON with ?format=json).
+    """
+    trace = get_store().get(trace_id)
+    if trace is None:
+        abort(404)
+    if request.args.get("format") == "json":
+        return jsonify(trace.to_otlp())
+    return render_template('debug_trace.html', trace=trace.summary(), rows=trace.waterfall())
+
+
+@debug_bp.route('/debug/profiles')
+@admin_required
+def profiles():
+    """
+    Profiles written by any worker, newest first, and a form to sample this one.
+    """
+    if request.args.get("format") == "json":
+        return jsonify({"enabled": profiling.enabled(), "profiles": profiling.list_profiles()})
+    return render_template('debug_profiles.html', profiles=profiling.list_profiles(),
+                           enabled=profiling.enabled(), max_seconds=profiling.max_seconds(),
+                           busy=request.args.get("busy"))
+
+
+@debug_bp.route('/debug/profiles/sample', methods=['POST'])
+@admin_required
+def sample_profile():
+    """
+    Sample every thread of the worker that answers for ?seconds=N (or the
+    form field); the collapsed stacks show up in /debug/profiles afterwards.
+    """
+    if not profiling.enabled():
+        abort(404)
+    try:
+        seconds = float(request.values.get("seconds", 10))
+    except ValueError:
+        abort(400)
+    started = profiling.sample_worker(seconds)
+    if request.accept_mimetypes.best == "application/json" or request.args.get("format") == "json":
+        return jsonify({"started": started}), 202 if started else 409
+    return redirect(url_for('debug.profiles', **({} if started else {"busy": 1})), code=303)
+
+
+@debug_bp.route('/debug/profiles/<name>')
+@admin_required
+def download_profile(name):
+    """
+    Download one profile: .prof is pstats (snakeviz, flameprof, python -m pstats),
+    .collapsed is folded stacks (flamegraph.pl, speedscope, inferno).
+    """
+    if not profiling.PROFILE_FILE.match(name):
+        abort(404)
+    return send_from_directory(profiling.profile_dir(), name, as_attachment=True,
+                               mimetype="text/plain" if name.endswith(".collapsed") else "application/octet-stream")
@@ -0,0 +1,52 @@
+import ssl
+import select
+import socket
+
+from . import metrics
+
+
+class ClientWatch:
+    """
+    Tells whether the client of one request has hung up, by peeking at its
+    socket: readable with nothing to read means the peer closed. Pass it as
+    `cancel_if` to the blocking agent entry points so a gone client cancels the
+    upstream call. Sockets that can't be peeked (TLS terminated in-process, or
+    servers that don't expose the socket) always count as connected.
+    """
+
+    def __init__(self, sock, route: str):
+        self._sock = None if isinstance(sock, ssl.SSLSocket) else sock
+        self.route = route
+        self.gone  = False
+
+    def __call__(self) -> bool:
+        if self.gone:
+            return True
+        if self._sock is None:
+            return False
+        try:
+            readable, _, _ = select.select([self._sock], [], [], 0)
+            if readable and self._sock.recv(1, socket.MSG_PEEK) == b"":
+                self.mark()
+        except (BlockingIOError, InterruptedError, ValueError):
+            pass
+        except OSError:
+            self.mark()  # reset by peer and friends
+        return self.gone
+
+    def mark(self) -> None:
+        """
+        Record the disconnect (once); also called when a stream write fails.
+        """
+        if not self.gone:
+            self.gone = True
+            metrics.http_cancelled.inc(route=self.route)
+
+
+def client_watch(req) -> ClientWatch:
+    """
+    A ClientWatch for the current Flask request (gunicorn or the dev server).
+    """
+    environ = req.environ
+    sock = environ.get("gunicorn.socket") or environ.get("werkzeug.socket")
+    return ClientWatch(sock, req.url_rule.rule if req.url_rule else "unmatched")
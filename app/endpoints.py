@@ -0,0 +1,214 @@
+import os
+import time
+import random
+import asyncio
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+from . import metrics
+
+# ────────────────────────────────────────────────────────────────────────────────
+# MCP endpoint balancing (all optional, read from the environment)
+_URLS_ENV            = "MCP_SSE_URLS"          # comma-separated SSE URLs of interchangeable MCP servers
+_EJECT_AFTER_ENV     = "MCP_EJECT_AFTER"       # consecutive failures that take an endpoint out of rotation
+_EJECT_SECONDS_ENV   = "MCP_EJECT_SECONDS"     # first ejection period; doubles while the endpoint keeps failing
+_HEALTH_INTERVAL_ENV = "MCP_HEALTH_INTERVAL"   # seconds between background health checks
+
+_DEFAULT_EJECT_AFTER = 3
+_DEFAULT_EJECT_SECS  = 30
+_MAX_EJECT_SECONDS   = 300
+_DEFAULT_INTERVAL    = 10
+_PROBE_TIMEOUT       = 10
+_EWMA_ALPHA          = 0.3    # weight of the newest latency sample
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+class Endpoint:
+    """
+    One MCP server replica: its smoothed call latency, calls in flight and
+    ejection state.
+    """
+
+    def __init__(self, url: str):
+        self.url           = url
+        self.name          = urlsplit(url).netloc or url
+        self.in_flight     = 0
+        self.ewma          = None
+        self.failures      = 0
+        self.ejected_until = 0.0
+        self.eject_seconds = 0.0
+        self.counts        = {"ok": 0, "failed": 0, "ejections": 0, "readmissions": 0}
+
+    @property
+    def ejected(self) -> bool:
+        return self.ejected_until > 0
+
+    def observe(self, seconds: float) -> None:
+        self.ewma = seconds if self.ewma is None else _EWMA_ALPHA * seconds + (1 - _EWMA_ALPHA) * self.ewma
+        metrics.endpoint_latency.observe(seconds, endpoint=self.name)
+
+    def stats(self) -> dict:
+        return {**self.counts, "url": self.url, "in_flight": self.in_flight,
+                "ewma_seconds": round(self.ewma, 4) if self.ewma is not None else None,
+                "consecutive_failures": self.failures, "ejected": self.ejected,
+                "ejected_for": round(max(0.0, self.ejected_until - time.monotonic()), 1) if self.ejected else None}
+
+
+class EndpointBalancer:
+    """
+    Routes each upstream call to the healthy endpoint with the lowest
+    (calls in flight + 1) x EWMA latency, so a slow or busy replica gets less
+    traffic; endpoints without samples yet are tried first.
+
+    An endpoint is ejected after `eject_after` consecutive failures. A
+    background task probes every endpoint each `interval` seconds: an ejected
+    one comes back after a successful probe once its ejection period (doubling
+    on every re-ejection, up to a cap) has passed. With a single endpoint
+    nothing is ever ejected; the circuit breakers cover that case. Lives on the
+    background loop; not thread-safe.
+    """
+
+    def __init__(self, urls: List[str], probe: Callable[[Endpoint], Awaitable[None]],
+                 eject_after: int = _DEFAULT_EJECT_AFTER, eject_seconds: float = _DEFAULT_EJECT_SECS,
+                 interval: float = _DEFAULT_INTERVAL):
+        self.endpoints     = [Endpoint(url) for url in dict.fromkeys(urls)]
+        self.eject_after   = max(1, eject_after)
+        self.eject_seconds = eject_seconds
+        self.interval      = interval
+        self._probe        = probe
+        self._checker      = None
+        for endpoint in self.endpoints:
+            metrics.endpoint_healthy.set(1, endpoint=endpoint.name)
+
+    def pick(self, exclude: Iterable[Endpoint] = ()) -> Optional[Endpoint]:
+        """
+        The endpoint the next call should use, skipping `exclude`; None once
+        every endpoint has been excluded.
+        """
+        self._ensure_checker()
+        remaining = [e for e in self.endpoints if e not in exclude]
+        if not remaining:
+            return None
+        candidates = [e for e in remaining if not e.ejected]
+        if not candidates:
+            # everything is out: try the one due back soonest rather than nothing
+            return min(remaining, key=lambda e: e.ejected_until)
+        unsampled = [e for e in candidates if e.ewma is None]
+        if unsampled:
+            return min(unsampled, key=lambda e: (e.in_flight, random.random()))
+        return min(candidates, key=lambda e: ((e.in_flight + 1) * e.ewma, random.random()))
+
+    @contextmanager
+    def track(self, endpoint: Endpoint, ok_errors: tuple = ()):
+        """
+        Count a call to `endpoint` as in flight and record how it went.
+        Exceptions in `ok_errors` mean the server answered; cancellation says
+        nothing about the endpoint.
+        """
+        endpoint.in_flight += 1
+        started = time.monotonic()
+        try:
+            yield endpoint
+        except ok_errors:
+            self.record(endpoint, time.monotonic() - started, success=True)
+            raise
+        except Exception:
+            self.record(endpoint, None, success=False)
+            raise
+        else:
+            self.record(endpoint, time.monotonic() - started, success=True)
+        finally:
+            endpoint.in_flight -= 1
+
+    def record(self, endpoint: Endpoint, seconds: Optional[float], success: bool) -> None:
+        if success:
+            endpoint.counts["ok"] += 1
+            endpoint.failures = 0
+            if seconds is not None:
+                endpoint.observe(seconds)
+            if endpoint.ejected:
+                self._readmit(endpoint)  # picked while everything was out, and it answered
+            metrics.endpoint_calls.inc(endpoint=endpoint.name, outcome="ok")
+            return
+
+        endpoint.counts["failed"] += 1
+        endpoint.failures += 1
+        metrics.endpoint_calls.inc(endpoint=endpoint.name, outcome="failed")
+        if len(self.endpoints) > 1 and not endpoint.ejected and endpoint.failures >= self.eject_after:
+            self._eject(endpoint)
+
+    def _eject(self, endpoint: Endpoint) -> None:
+        endpoint.eject_seconds = min(_MAX_EJECT_SECONDS, (endpoint.eject_seconds * 2) or self.eject_seconds)
+        endpoint.ejected_until = time.monotonic() + endpoint.eject_seconds
+        endpoint.counts["ejections"] += 1
+        metrics.endpoint_healthy.set(0, endpoint=endpoint.name)
+        metrics.endpoint_ejections.inc(endpoint=endpoint.name)
+
+    def _readmit(self, endpoint: Endpoint) -> None:
+        endpoint.ejected_until = 0.0
+        endpoint.eject_seconds = 0.0
+        endpoint.failures = 0
+        endpoint.counts["readmissions"] += 1
+        metrics.endpoint_healthy.set(1, endpoint=endpoint.name)
+
+    def _ensure_checker(self) -> None:
+        if len(self.endpoints) < 2 or self.interval <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        if self._checker is None or self._checker.done() or self._checker.get_loop() is not loop:
+            self._checker = loop.create_task(self._check_forever())
+
+    async def _check_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await asyncio.gather(*(self._check(e) for e in self.endpoints))
+
+    async def _check(self, endpoint: Endpoint) -> None:
+        if endpoint.ejected and time.monotonic() < endpoint.ejected_until:
+            return  # still serving its ejection period
+        try:
+            await asyncio.wait_for(self._probe(endpoint), _PROBE_TIMEOUT)
+        except Exception:
+            if endpoint.ejected:
+                self._eject(endpoint)  # still down: wait longer before the next try
+            else:
+                self.record(endpoint, None, success=False)
+            return
+        if endpoint.ejected:
+            self._readmit(endpoint)
+
+    def stats(self) -> dict:
+        return {"eject_after": self.eject_after, "health_interval": self.interval,
+                "endpoints": [e.stats() for e in self.endpoints]}
+
+
+def configured_urls(default: str) -> List[str]:
+    """
+    MCP_SSE_URLS split on commas, else just `default`.
+    """
+    urls = [u.strip() for u in os.getenv(_URLS_ENV, "").split(",") if u.strip()]
+    return urls or [default]
+
+
+_balancer: Optional[EndpointBalancer] = None
+
+
+def get_balancer(default_url: str, probe: Callable[[Endpoint], Awaitable[None]]) -> EndpointBalancer:
+    """
+    Return this process's endpoint balancer. Must be called from the background loop.
+    """
+    global _balancer
+    if _balancer is None:
+        _balancer = EndpointBalancer(
+            configured_urls(default_url),
+            probe,
+            eject_after=int(os.getenv(_EJECT_AFTER_ENV, _DEFAULT_EJECT_AFTER)),
+            eject_seconds=float(os.getenv(_EJECT_SECONDS_ENV, _DEFAULT_EJECT_SECS)),
+            interval=float(os.getenv(_HEALTH_INTERVAL_ENV, _DEFAULT_INTERVAL)),
+        )
+    return _balancer
+
+
+def stats() -> Dict:
+    return _balancer.stats() if _balancer is not None else {"endpoints": []}
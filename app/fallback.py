@@ -0,0 +1,99 @@
+import re
+from typing import List, Tuple
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Template-based stand-ins for the three MCP tools, used while a tool's circuit
+# is open: they build a structured prompt from what the user already gave us
+# (Quick-mode prompt and tone, or the interactive answers) in milliseconds.
+
+# what one_shot_input() in agno_agent.py appends to the user's prompt
+_TONE_SUFFIX = re.compile(r"\s*\[Please consider a (?P<tone>.+?) writing tone to optimize the given prompt\]\s*$", re.S)
+_QA_PAIR     = re.compile(r"Question:\s*(?P<q>.*?)\nAnswer:\s*(?P<a>.*?)(?=\n\nQuestion:|\Z)", re.S)
+
+_FOLLOWUP_QUESTIONS = [
+    "Who will read or use the result, and how familiar are they with the topic?",
+    "What would an ideal answer look like (length, level of detail, an example you like)?",
+    "Is there anything the AI should avoid, or any assumption it should not make?",
+]
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+class DegradedText(str):
+    """
+    A result produced by this module rather than the upstream tool; callers
+    check `degraded` to tell the user.
+    """
+    degraded = True
+
+
+def split_tone(text: str) -> Tuple[str, str]:
+    """
+    (prompt, tone) of a one-shot tool input; "Standard" when no tone was given.
+    """
+    match = _TONE_SUFFIX.search(text)
+    if match is None:
+        return text.strip(), "Standard"
+    return text[:match.start()].strip(), match.group("tone").strip()
+
+
+def _qa_pairs(text: str) -> List[Tuple[str, str]]:
+    return [(m.group("q").strip(), m.group("a").strip()) for m in _QA_PAIR.finditer(text)]
+
+
+def one_shot(text: str) -> DegradedText:
+    """
+    Fallback for the one-shot tool: the prompt wrapped in a role, task,
+    instructions, tone and output-format skeleton.
+    """
+    prompt, tone = split_tone(text)
+    tone_line = "clear, neutral and professional" if tone.lower() == "standard" else tone
+    return DegradedText(
+        "You are an expert assistant in the subject of the task below.\n\n"
+        f"## Task\n{prompt}\n\n"
+        "## Instructions\n"
+        "- Restate the goal in one sentence and list any assumptions you make.\n"
+        "- Work through the task step by step and be specific; prefer concrete examples to generalities.\n"
+        "- If essential information is missing, ask up to three clarifying questions before answering.\n\n"
+        f"## Tone\nUse this tone throughout: {tone_line}.\n\n"
+        "## Output format\n"
+        "A well-structured answer with headings or bullet points where they help, ending with a short summary."
+    )
+
+
+def followup_questions(text: str) -> DegradedText:
+    """
+    Fallback for the five-questions tool: three general follow-up questions in
+    the numbered format the interactive flow parses.
+    """
+    return DegradedText("\n".join(f"{i}. {q}" for i, q in enumerate(_FOLLOWUP_QUESTIONS, start=1)))
+
+
+def final_prompt(text: str) -> DegradedText:
+    """
+    Fallback for the eight-questions tool: the interactive answers laid out as
+    goal, role, format, constraints and extra context. The first five pairs are
+    the fixed interactive questions, in order; the rest are follow-ups.
+    """
+    pairs   = _qa_pairs(text)
+    answers = [a for _, a in pairs[:5]] + [""] * (5 - min(5, len(pairs)))
+    goal, role, style, constraints, extra = answers
+
+    sections = [f"Act as {role}." if role else "Act as an expert assistant."]
+    if goal:
+        sections.append(f"## Goal\n{goal}")
+    if style:
+        sections.append(f"## Format and style\n{style}")
+    if constraints:
+        sections.append(f"## Constraints\n{constraints}")
+
+    details = [extra] if extra else []
+    details += [f"{q} {a}" for q, a in pairs[5:] if a]
+    if details:
+        sections.append("## Additional context\n" + "\n".join(f"- {d}" for d in details))
+
+    sections.append(
+        "## How to answer\n"
+        "Use all of the context above. If something essential is still unclear, ask before answering; "
+        "otherwise give a complete, well-structured response."
+    )
+    return DegradedText("\n\n".join(sections))
@@ -0,0 +1,198 @@
+import os
+import time
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+
+from . import metrics, tracing
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Hedging / adaptive timeout tuning (all optional, read from the environment)
+_HEDGE_ENABLED_ENV      = "HEDGE_ENABLED"           # "0" never sends a duplicate request
+_HEDGE_PERCENTILE_ENV   = "HEDGE_PERCENTILE"        # hedge once the first attempt is slower than this
+_HEDGE_BUDGET_ENV       = "HEDGE_BUDGET_RATIO"      # at most this many hedges per upstream call, on average
+_HEDGE_MIN_SAMPLES_ENV  = "HEDGE_MIN_SAMPLES"       # latencies a tool needs before it is hedged or timed out early
+_TIMEOUT_CEILING_ENV    = "UPSTREAM_TIMEOUT"        # hard limit for one upstream call, in seconds
+_TIMEOUT_FLOOR_ENV      = "UPSTREAM_TIMEOUT_FLOOR"  # adaptive timeouts never go below this
+_TIMEOUT_FACTOR_ENV     = "UPSTREAM_TIMEOUT_FACTOR" # adaptive timeout = p99 x this factor
+
+_DEFAULT_PERCENTILE     = 95
+_DEFAULT_BUDGET         = 0.1
+_DEFAULT_MIN_SAMPLES    = 20
+_DEFAULT_CEILING        = 300
+_DEFAULT_FLOOR          = 30
+_DEFAULT_FACTOR         = 4
+_WINDOW                 = 200   # latencies remembered per tool
+_BUDGET_BURST           = 10    # hedges that may be spent back to back
+_MIN_HEDGE_DELAY        = 0.05
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+class _LatencyWindow:
+    """
+    The most recent successful latencies of one tool.
+    """
+
+    def __init__(self, size: int = _WINDOW):
+        self._values = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self._values.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self._values:
+            return None
+        ordered = sorted(self._values)
+        index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+
+class Hedger:
+    """
+    Adaptive timeouts and hedged requests for upstream calls, per tool.
+
+    run() starts the call; if it is still pending after the tool's observed
+    percentile latency (p95 by default), one duplicate is started and whichever
+    succeeds first wins while the other is cancelled. Duplicates are paid for
+    from a budget that refills by `budget_ratio` per call, so hedging adds at
+    most that share of extra upstream load. The whole call is bounded by a
+    timeout derived from the tool's p99, between a floor and a hard ceiling.
+    Lives on the background loop; not thread-safe.
+    """
+
+    def __init__(self, enabled: bool = True, percentile: float = _DEFAULT_PERCENTILE,
+                 budget_ratio: float = _DEFAULT_BUDGET, min_samples: int = _DEFAULT_MIN_SAMPLES,
+                 ceiling: float = _DEFAULT_CEILING, floor: float = _DEFAULT_FLOOR,
+                 factor: float = _DEFAULT_FACTOR):
+        self.enabled      = enabled
+        self.percentile   = percentile
+        self.budget_ratio = budget_ratio
+        self.min_samples  = max(1, min_samples)
+        self.ceiling      = ceiling
+        self.floor        = min(floor, ceiling)
+        self.factor       = factor
+        self._windows: Dict[str, _LatencyWindow] = {}
+        self._budget      = float(_BUDGET_BURST)
+        self.counts       = {"calls": 0, "hedged": 0, "hedge_wins": 0, "budget_denied": 0, "timeouts": 0}
+
+    def _window(self, tool: str) -> _LatencyWindow:
+        return self._windows.setdefault(tool, _LatencyWindow())
+
+    def hedge_delay(self, tool: str) -> Optional[float]:
+        """
+        Seconds to wait before hedging `tool`, or None while it can't be hedged.
+        """
+        window = self._window(tool)
+        if not self.enabled or len(window) < self.min_samples:
+            return None
+        return max(_MIN_HEDGE_DELAY, window.percentile(self.percentile))
+
+    def timeout(self, tool: str) -> float:
+        window = self._window(tool)
+        if len(window) < self.min_samples:
+            return self.ceiling
+        return min(self.ceiling, max(self.floor, window.percentile(99) * self.factor))
+
+    def _take_budget(self) -> bool:
+        if self._budget >= 1:
+            self._budget -= 1
+            return True
+        return False
+
+    async def run(self, tool: str, attempt: Callable[[], Awaitable[str]]) -> str:
+        """
+        Await `attempt()` under the tool's adaptive timeout, hedging it once if
+        it runs slow. Errors are not retried: a failed attempt only loses to
+        the other one if a hedge is already running.
+        """
+        self.counts["calls"] += 1
+        self._budget = min(float(_BUDGET_BURST), self._budget + self.budget_ratio)
+
+        started  = time.monotonic()
+        deadline = started + self.timeout(tool)
+        delay    = self.hedge_delay(tool)
+
+        async def traced(role: str) -> str:
+            with tracing.span("upstream_attempt", role=role, timeout=round(deadline - started, 1)):
+                return await attempt()
+
+        attempts = {asyncio.ensure_future(traced("primary")): (started, "primary")}
+        hedge_at = started + delay if delay is not None else None
+        error    = None
+
+        try:
+            while attempts:
+                now  = time.monotonic()
+                wake = min(deadline, hedge_at) if hedge_at is not None else deadline
+                done, _ = await asyncio.wait(attempts, timeout=max(0.0, wake - now),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    attempt_started, role = attempts.pop(task)
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    self._window(tool).add(time.monotonic() - attempt_started)
+                    if role == "hedge":
+                        self.counts["hedge_wins"] += 1
+                        metrics.upstream_hedges.inc(tool=tool, outcome="won")
+                    return task.result()
+
+                if not attempts and error is not None:
+                    raise error
+                if hedge_at is not None and time.monotonic() >= hedge_at:
+                    hedge_at = None
+                    if self._take_budget():
+                        self.counts["hedged"] += 1
+                        metrics.upstream_hedges.inc(tool=tool, outcome="launched")
+                        attempts[asyncio.ensure_future(traced("hedge"))] = (time.monotonic(), "hedge")
+                    else:
+                        self.counts["budget_denied"] += 1
+                        metrics.upstream_hedges.inc(tool=tool, outcome="budget_denied")
+                if time.monotonic() >= deadline:
+                    self.counts["timeouts"] += 1
+                    metrics.upstream_timeouts.inc(tool=tool)
+                    raise TimeoutError(f"Upstream call to '{tool}' timed out after {deadline - started:.1f}s.")
+            raise error
+        finally:
+            # cancel the loser (or everything on timeout / caller cancellation)
+            for task in attempts:
+                if task.done() and not task.cancelled():
+                    task.exception()  # finished alongside the winner; nothing left to report
+                task.cancel()
+
+    def stats(self) -> dict:
+        tools = {}
+        for tool, window in self._windows.items():
+            tools[tool] = {
+                "samples": len(window),
+                "p50": window.percentile(50),
+                "p95": window.percentile(95),
+                "p99": window.percentile(99),
+                "hedge_delay": self.hedge_delay(tool),
+                "timeout": self.timeout(tool),
+            }
+        return {**self.counts, "enabled": self.enabled, "budget": round(self._budget, 2), "tools": tools}
+
+
+_hedger: Optional[Hedger] = None
+
+
+def get_hedger() -> Hedger:
+    """
+    Return the process-wide hedger.
+    """
+    global _hedger
+    if _hedger is None:
+        _hedger = Hedger(
+            enabled=os.getenv(_HEDGE_ENABLED_ENV, "1") != "0",
+            percentile=float(os.getenv(_HEDGE_PERCENTILE_ENV, _DEFAULT_PERCENTILE)),
+            budget_ratio=float(os.getenv(_HEDGE_BUDGET_ENV, _DEFAULT_BUDGET)),
+            min_samples=int(os.getenv(_HEDGE_MIN_SAMPLES_ENV, _DEFAULT_MIN_SAMPLES)),
+            ceiling=float(os.getenv(_TIMEOUT_CEILING_ENV, _DEFAULT_CEILING)),
+            floor=float(os.getenv(_TIMEOUT_FLOOR_ENV, _DEFAULT_FLOOR)),
+            factor=float(os.getenv(_TIMEOUT_FACTOR_ENV, _DEFAULT_FACTOR)),
+        )
+    return _hedger
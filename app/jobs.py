@@ -0,0 +1,379 @@
+import os
+import time
+import json
+import asyncio
+import hashlib
+import sqlite3
+import functools
+import secrets
+import tempfile
+import threading
+from typing import Awaitable, Callable, Optional
+
+from . import metrics, storage, tracing
+from .mcp_pool import get_loop
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Job queue tuning (all optional, read from the environment)
+_JOB_WORKERS_ENV     = "JOB_WORKERS"       # jobs running at once per worker process
+_JOB_MAX_PENDING_ENV = "JOB_MAX_PENDING"   # queued + running jobs per process before refusing new ones
+_JOB_TTL_ENV         = "JOB_TTL_SECONDS"   # how long a job and its result can be fetched
+_JOB_STORE_PATH_ENV  = "JOB_STORE_PATH"    # SQLite file shared by workers ("" keeps jobs in memory)
+_JOB_ABANDON_ENV     = "JOB_ABANDON_SECONDS" # cancel a running job nobody has polled for this long ("0" never)
+
+_DEFAULT_WORKERS     = 4
+_DEFAULT_MAX_PENDING = 100
+_DEFAULT_TTL         = 15 * 60
+_DEFAULT_ABANDON     = 30
+_ABANDON_CHECK_EVERY = 5
+_DEFAULT_STORE_PATH  = os.path.join(tempfile.gettempdir(), "prompt-optimizer-jobs.sqlite3")
+_PURGE_EVERY_SECONDS = 30
+_HEARTBEAT_EVERY     = 5    # an owner refreshes its unfinished jobs this often
+_STALE_AFTER         = 30   # an unfinished job whose owner went quiet this long is given up
+# ────────────────────────────────────────────────────────────────────────────────
+
+# Job states
+QUEUED, RUNNING, DONE, ERROR = "queued", "running", "done", "error"
+
+
+class JobQueueFull(RuntimeError):
+    """
+    Raised by submit() when this process already has too many pending jobs.
+    """
+
+
+class _MemoryJobStore:
+    """
+    Job records in a dict; only visible to the process that created them.
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def put(self, job: dict) -> None:
+        with self._lock:
+            self._jobs[job["id"]] = dict(job)
+
+    def update(self, job_id: str, **fields) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields, updated=time.time())
+
+    def touch(self, job_id: str) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id]["seen"] = time.time()
+
+    def heartbeat(self, job_ids, now: float) -> None:
+        with self._lock:
+            for job_id in job_ids:
+                if job_id in self._jobs:
+                    self._jobs[job_id]["beat"] = now
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def find_reusable(self, dedup_key: str, since: float) -> Optional[dict]:
+        with self._lock:
+            for job in self._jobs.values():
+                if (job["dedup_key"] == dedup_key and job["status"] != ERROR
+                        and not job.get("degraded") and job["created"] >= since):
+                    return dict(job)
+        return None
+
+    def purge(self, before: float) -> None:
+        with self._lock:
+            for job_id in [j for j, job in self._jobs.items() if job["created"] < before]:
+                del self._jobs[job_id]
+
+
+class _SQLiteJobStore:
+    """
+    Job records in a SQLite file, so any gunicorn worker can answer a status poll
+    for a job another worker is running.
+    """
+
+    _COLUMNS = ("id", "dedup_key", "kind", "status", "result", "error", "created", "updated", "degraded", "seen",
+                "owner", "beat")
+
+    def __init__(self, path: str):
+        self.path  = path
+        self._conn = None
+        self._pid  = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            conn = storage.connect(self.path, timeout=2.0)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, dedup_key TEXT, kind TEXT, status TEXT,"
+                " result TEXT, error TEXT, created REAL, updated REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (dedup_key, created)")
+            # files created before fallback results / abandonment / heartbeats existed
+            for column in ("degraded INTEGER DEFAULT 0", "seen REAL", "owner INTEGER", "beat REAL"):
+                try:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column}")
+                except sqlite3.OperationalError:
+                    pass
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _row(self, row) -> Optional[dict]:
+        return dict(zip(self._COLUMNS, row)) if row else None
+
+    def put(self, job: dict) -> None:
+        with self._lock:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                tuple(job.get(c) for c in self._COLUMNS),
+            )
+
+    def update(self, job_id: str, **fields) -> None:
+        fields["updated"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._connection().execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def touch(self, job_id: str) -> None:
+        with self._lock:
+            self._connection().execute("UPDATE jobs SET seen = ? WHERE id = ?", (time.time(), job_id))
+
+    def heartbeat(self, job_ids, now: float) -> None:
+        job_ids = list(job_ids)
+        if not job_ids:
+            return
+        with self._lock:
+            self._connection().execute(
+                f"UPDATE jobs SET beat = ? WHERE id IN ({', '.join('?' * len(job_ids))})", (now, *job_ids))
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._row(self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def find_reusable(self, dedup_key: str, since: float) -> Optional[dict]:
+        with self._lock:
+            return self._row(self._connection().execute(
+                "SELECT * FROM jobs WHERE dedup_key = ? AND status != ? AND NOT degraded AND created >= ?"
+                " ORDER BY created DESC LIMIT 1",
+                (dedup_key, ERROR, since),
+            ).fetchone())
+
+    def purge(self, before: float) -> None:
+        with self._lock:
+            self._connection().execute("DELETE FROM jobs WHERE created < ?", (before,))
+
+
+class JobQueue:
+    """
+    Runs long upstream calls as background jobs on the worker's event loop.
+
+    submit() returns a job id immediately; the caller polls get() for
+    status/result. Resubmitting the same work (same dedup key) while an earlier
+    job is still fresh, not failed and not a degraded fallback returns the
+    earlier job instead.
+
+    Every get() of an unfinished job counts as someone still waiting for it; a
+    job nobody has asked about for `abandon_after` seconds (the user closed the
+    page) is cancelled along with its upstream call.
+
+    Each job records the pid of the worker running it, which refreshes a
+    heartbeat on its unfinished jobs every few seconds. An unfinished job whose
+    owner has exited or gone quiet for `_STALE_AFTER` seconds is marked failed
+    when polled, and is never reused for a new submission.
+    """
+
+    def __init__(self, store, workers: int = _DEFAULT_WORKERS,
+                 max_pending: int = _DEFAULT_MAX_PENDING, ttl: float = _DEFAULT_TTL,
+                 abandon_after: float = _DEFAULT_ABANDON):
+        self.store         = store
+        self.workers       = max(1, workers)
+        self.max_pending   = max(1, max_pending)
+        self.ttl           = ttl
+        self.abandon_after = abandon_after
+        self._pending    = 0
+        self._lock       = threading.Lock()
+        self._slots      = None
+        self._last_purge = 0.0
+        self._owned      = set()
+        self._heartbeat  = None
+        self.counts      = {"submitted": 0, "deduplicated": 0, "rejected": 0, "done": 0, "failed": 0, "abandoned": 0,
+                            "orphaned": 0}
+
+    def submit(self, kind: str, payload, fn: Callable[[], Awaitable[str]]) -> str:
+        self._maybe_purge()
+        # a digest, so the store doesn't keep a second plaintext copy of the prompt
+        dedup_key = hashlib.sha256(
+            json.dumps([kind, payload], sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+        while True:
+            existing = self.store.find_reusable(dedup_key, time.time() - self.ttl)
+            if existing is None:
+                break
+            # a job whose worker died would never finish: fail it and look again
+            if not self._orphan(existing):
+                self.counts["deduplicated"] += 1
+                return existing["id"]
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.counts["rejected"] += 1
+                raise JobQueueFull("Too many pending jobs, please try again shortly.")
+            self._pending += 1
+
+        now = time.time()
+        job_id = secrets.token_urlsafe(16)
+        self.store.put({"id": job_id, "dedup_key": dedup_key, "kind": kind, "status": QUEUED,
+                        "result": None, "error": None, "created": now, "updated": now, "degraded": 0,
+                        "seen": now, "owner": os.getpid(), "beat": now})
+        with self._lock:
+            self._owned.add(job_id)
+        self.counts["submitted"] += 1
+        tracing.annotate(**{"job.id": job_id})
+        submitted_by = tracing.current()
+        asyncio.run_coroutine_threadsafe(
+            self._run(job_id, kind, fn, submitted_by.trace.trace_id if submitted_by else None), get_loop())
+        return job_id
+
+    async def _run(self, job_id: str, kind: str, fn: Callable[[], Awaitable[str]],
+                   submitted_by: Optional[str] = None) -> None:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.ensure_future(self._beat())
+        # a trace of its own (the submitting request has long finished), linked back to it
+        root = tracing.start_trace(f"job {kind}", kind="internal", **{"job.id": job_id, "job.kind": kind},
+                                   **({"link.trace_id": submitted_by} if submitted_by else {}))
+        try:
+            async with self._slots:
+                if await self._abandoned(job_id):
+                    await self._give_up(job_id, kind)
+                    return
+                await self._store("update", job_id, status=RUNNING)
+
+                task = asyncio.ensure_future(fn())
+                while not task.done():
+                    await asyncio.wait([task], timeout=_ABANDON_CHECK_EVERY)
+                    if not task.done() and await self._abandoned(job_id):
+                        task.cancel()
+                        await asyncio.wait([task])
+
+                if task.cancelled():
+                    await self._give_up(job_id, kind)
+                    tracing.annotate(**{"job.status": "abandoned"})
+                elif task.exception() is not None:
+                    await self._store("update", job_id, status=ERROR, error=str(task.exception()))
+                    self.counts["failed"] += 1
+                    tracing.fail(task.exception())
+                else:
+                    result = task.result()
+                    await self._store("update", job_id, status=DONE, result=result,
+                                      degraded=int(getattr(result, "degraded", False)))
+                    self.counts["done"] += 1
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._owned.discard(job_id)
+            tracing.finish_trace(root)
+
+    async def _beat(self) -> None:
+        # one task per worker loop; a failed write is retried on the next beat
+        while True:
+            await asyncio.sleep(_HEARTBEAT_EVERY)
+            with self._lock:
+                owned = list(self._owned)
+            if owned:
+                try:
+                    await self._store("heartbeat", owned, time.time())
+                except sqlite3.Error:
+                    pass
+
+    async def _store(self, method: str, *args, **kwargs):
+        # store calls made from the event loop run on a thread: a SQLite file
+        # locked by another worker mustn't stall every upstream call in this one
+        call = functools.partial(getattr(self.store, method), *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(None, call)
+
+    async def _abandoned(self, job_id: str) -> bool:
+        if self.abandon_after <= 0:
+            return False
+        job = await self._store("get", job_id)
+        return job is not None and time.time() - (job.get("seen") or job["created"]) > self.abandon_after
+
+    async def _give_up(self, job_id: str, kind: str) -> None:
+        await self._store("update", job_id, status=ERROR, error="Cancelled: nobody was waiting for the result any more.")
+        self.counts["abandoned"] += 1
+        metrics.http_cancelled.inc(route=f"job:{kind}")
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """
+        Return the job record, or None if it never existed or has expired.
+        Marks an unfinished job as still wanted.
+        """
+        job = self.store.get(job_id)
+        if job is None or job["created"] < time.time() - self.ttl:
+            return None
+        if job["status"] in (QUEUED, RUNNING):
+            if self._orphan(job):
+                return self.store.get(job_id)
+            self.store.touch(job_id)
+        return job
+
+    def _orphan(self, job: dict) -> bool:
+        """
+        Mark an unfinished job failed if its owner exited or stopped beating.
+        """
+        if job["status"] not in (QUEUED, RUNNING):
+            return False
+        owner, beat = job.get("owner"), job.get("beat") or job["created"]
+        if time.time() - beat <= _STALE_AFTER and (owner is None or _alive(owner)):
+            return False
+        self.store.update(job["id"], status=ERROR, error="The server stopped while running this step, please try again.")
+        self.counts["orphaned"] += 1
+        return True
+
+    def _maybe_purge(self) -> None:
+        now = time.time()
+        if now - self._last_purge > _PURGE_EVERY_SECONDS:
+            self._last_purge = now
+            self.store.purge(now - self.ttl)
+
+    def stats(self) -> dict:
+        return {**self.counts, "pending": self._pending, "workers": self.workers, "max_pending": self.max_pending,
+                "abandon_after": self.abandon_after}
+
+
+def _alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # exists, but isn't ours to signal
+    return True
+
+
+_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """
+    Return the process-wide job queue, building its store on first use.
+    """
+    global _queue
+    if _queue is None:
+        path = os.getenv(_JOB_STORE_PATH_ENV, _DEFAULT_STORE_PATH)
+        _queue = JobQueue(
+            _SQLiteJobStore(path) if path else _MemoryJobStore(),
+            workers=int(os.getenv(_JOB_WORKERS_ENV, _DEFAULT_WORKERS)),
+            max_pending=int(os.getenv(_JOB_MAX_PENDING_ENV, _DEFAULT_MAX_PENDING)),
+            ttl=float(os.getenv(_JOB_TTL_ENV, _DEFAULT_TTL)),
+            abandon_after=float(os.getenv(_JOB_ABANDON_ENV, _DEFAULT_ABANDON)),
+        )
+    return _queue
@@ -0,0 +1,201 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import random
+import asyncio
+import logging
+import logging.handlers
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Logging pipeline and agent trace sampling (all optional, read from the environment)
+_LOG_FORMAT_ENV    = "LOG_FORMAT"                 # "json" (one object per line) or "text"
+_LOG_LEVEL_ENV     = "LOG_LEVEL"
+_TRACE_SAMPLE_ENV  = "AGENT_TRACE_SAMPLE"         # share of agent runs whose full debug trace is captured and logged
+_TRACE_SLOW_ENV    = "AGENT_TRACE_SLOW_SECONDS"   # log the summary of runs slower than this as a warning ("0" = never)
+_TRACE_ERRORS_ENV  = "AGENT_TRACE_ERRORS"         # "0" stops logging the summary of failed runs as a warning
+
+_DEFAULT_SAMPLE    = 0.01
+_DEFAULT_SLOW      = 10.0
+_MAX_TRACE_RECORDS = 2000   # per run; the rest of a runaway trace is dropped
+_AGNO_LOGGERS      = ("agno", "agno-team", "agno-workflow")
+_QUIET_LOGGERS     = ("httpx", "httpcore")   # a line per HTTP request to the upstreams: warnings only
+# ────────────────────────────────────────────────────────────────────────────────
+
+log = logging.getLogger(__name__)
+
+# debug records of the agent run in progress (None: this run's trace isn't kept)
+_trace: ContextVar[Optional[list]] = ContextVar("agent_trace", default=None)
+
+# attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener     = None
+_listener_pid = None
+_agno_ready   = False
+_sampled_runs = 0   # sampled agent runs in flight (all on the worker's event loop)
+
+
+def _extras(record: logging.LogRecord) -> dict:
+    # callables are deferred values: evaluated here, on the logging thread
+    return {k: v() if callable(v) else v for k, v in record.__dict__.items() if k not in _RECORD_ATTRS}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record: time, level, logger, message, any `extra=`
+    fields and the traceback.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {"ts": round(record.created, 3), "level": record.levelname, "logger": record.name,
+                 "msg": record.getMessage(), **_extras(record)}
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """
+    Human-readable variant for local runs: message, then key=value extras.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        extras = _extras(record)
+        lines  = extras.pop("trace", None)
+        text = f"{self.formatTime(record)} {record.levelname} {record.name}: {record.getMessage()}"
+        text += "".join(f" {k}={v}" for k, v in extras.items())
+        if lines:
+            text += "".join(f"\n    {line}" for line in lines)
+        if record.exc_text:
+            text += "\n" + record.exc_text
+        return text
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the listener thread with only the cheap work done here:
+    the message is interpolated (arguments may change later) and a traceback
+    rendered; JSON encoding and the write happen on the listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class _AgnoHandler(logging.Handler):
+    """
+    Replaces agno's console handler: debug records join the current run's
+    trace buffer (or are dropped unformatted), everything else goes to the
+    normal pipeline.
+    """
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.levelno > logging.DEBUG:
+            logging.getLogger().handle(record)
+            return
+        buffer = _trace.get()
+        if buffer is not None and len(buffer) < _MAX_TRACE_RECORDS:
+            buffer.append(record)
+
+
+def init_logging() -> None:
+    """
+    Route all logging through a queue to a background writer thread (once per
+    process; called again after a fork it starts a new listener).
+    """
+    global _listener, _listener_pid
+    if _listener_pid == os.getpid():
+        return
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(TextFormatter() if os.getenv(_LOG_FORMAT_ENV, "json").lower() == "text" else JsonFormatter())
+    records = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    _listener_pid = os.getpid()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    root.handlers = [_QueueHandler(records)]
+    root.setLevel(os.getenv(_LOG_LEVEL_ENV, "INFO").upper())
+    for name in _QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+
+def _settings():
+    sample = float(os.getenv(_TRACE_SAMPLE_ENV, _DEFAULT_SAMPLE))
+    slow   = float(os.getenv(_TRACE_SLOW_ENV, _DEFAULT_SLOW))
+    errors = os.getenv(_TRACE_ERRORS_ENV, "1") != "0"
+    return sample, slow, errors
+
+
+def agent_debug() -> bool:
+    """
+    debug_mode for an agent built inside agent_trace(). agno's debug switch is
+    process-wide and set by each run as it starts, so it is on while any
+    sampled run is in flight and off otherwise: unsampled runs then skip
+    agno's debug records entirely.
+    """
+    return _sampled_runs > 0
+
+
+def _install_agno_handler() -> None:
+    global _agno_ready
+    if _agno_ready:
+        return
+    handler = _AgnoHandler()
+    for name in _AGNO_LOGGERS:
+        logging.getLogger(name).handlers = [handler]
+    _agno_ready = True
+
+
+@contextmanager
+def agent_trace(**fields):
+    """
+    Wrap one agent run, including building the agent. A one-line summary is
+    always logged, as a warning when the run was slow or failed. Only a
+    sampled run (AGENT_TRACE_SAMPLE) turns agno's debug output on, keeps it in
+    memory and writes it out. The caller may add fields (tokens, ...) to the
+    yielded dict.
+    """
+    global _sampled_runs
+    _install_agno_handler()
+    sample, slow, errors = _settings()
+    sampled = random.random() < sample
+    buffer = [] if sampled else None
+    if sampled:
+        _sampled_runs += 1
+    token = _trace.set(buffer)
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield fields
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    except Exception as e:
+        outcome = "error"
+        fields["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _trace.reset(token)
+        if sampled:
+            _sampled_runs -= 1
+        seconds = time.perf_counter() - started
+        flagged = (slow > 0 and seconds >= slow) or (errors and outcome == "error")
+        log.log(logging.WARNING if flagged else logging.INFO, "agent run",
+                extra={**fields, "outcome": outcome, "seconds": round(seconds, 3), "traced": sampled})
+        if buffer:
+            log.info("agent trace", extra={**fields, "reason": "sampled", "records": len(buffer),
+                                           "trace": lambda: [r.getMessage() for r in buffer]})
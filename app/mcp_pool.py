@@ -0,0 +1,357 @@
+import os
+import time
+import asyncio
+import threading
+from builtins import BaseExceptionGroup
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Optional
+
+from . import metrics, tracing
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Pool tuning (all optional, read from the environment)
+_POOL_SIZE_ENV         = "MCP_POOL_SIZE"              # max concurrent sessions per worker
+_POOL_IDLE_ENV         = "MCP_POOL_IDLE_SECONDS"      # evict sessions unused for this long
+_POOL_HEALTH_ENV       = "MCP_POOL_HEALTH_SECONDS"    # ping sessions idle for longer than this before reuse
+_POOL_CONNECT_RETRIES  = "MCP_POOL_CONNECT_RETRIES"   # extra attempts when opening a session fails
+
+_DEFAULT_POOL_SIZE     = 4
+_DEFAULT_IDLE_SECONDS  = 300
+_DEFAULT_HEALTH_SECS   = 30
+_DEFAULT_RETRIES       = 2
+_PING_TIMEOUT_SECONDS  = 5
+CANCEL_POLL_SECONDS    = 0.5    # how often a blocked caller checks whether it should give up
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+class ToolCallError(RuntimeError):
+    """
+    The MCP tool itself reported an error; the session that carried the call is
+    still healthy and goes back to the pool.
+    """
+
+
+class RequestCancelled(RuntimeError):
+    """
+    Raised by run_sync() when `cancel_if` fired (the client went away) and the
+    coroutine was cancelled.
+    """
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class _PooledSession:
+    """
+    One warm MCP connection. The SSE client is entered and exited inside a single
+    owner task, so anyio's cancel scopes never cross tasks on teardown.
+    """
+
+    def __init__(self, factory: Callable):
+        self._factory  = factory
+        self._closing  = asyncio.Event()
+        self._task     = None
+        self.tools     = None
+        self.alive     = False
+        self.last_used = time.monotonic()
+        self.last_seen = time.monotonic()
+
+    async def open(self) -> None:
+        ready = asyncio.get_running_loop().create_future()
+        self._task = asyncio.create_task(self._own(ready))
+        try:
+            await ready
+        except asyncio.CancelledError:
+            await self.close()
+            raise
+
+    async def _own(self, ready: asyncio.Future) -> None:
+        tools = self._factory()
+        try:
+            with metrics.stage("mcp_connect"):
+                await tools.__aenter__()
+        except BaseException as e:
+            ready.set_exception(e if isinstance(e, Exception) else RuntimeError(str(e)))
+            return
+
+        self.tools = tools
+        self.alive = True
+        ready.set_result(None)
+        try:
+            await self._closing.wait()
+        finally:
+            self.alive = False
+            started = time.perf_counter()
+            try:
+                await tools.__aexit__(None, None, None)
+            except BaseExceptionGroup:
+                # swallow the known TaskGroup cleanup noise
+                pass
+            except Exception as e:
+                if "cancel scope" not in str(e):
+                    raise
+            finally:
+                metrics.observe_stage("mcp_close", time.perf_counter() - started)
+
+    async def ping(self) -> bool:
+        try:
+            await asyncio.wait_for(self.tools.session.send_ping(), _PING_TIMEOUT_SECONDS)
+        except Exception:
+            return False
+        self.last_seen = time.monotonic()
+        return True
+
+    def next_request_id(self) -> int:
+        return getattr(self.tools.session, "_request_id", 0)
+
+    async def abandon(self, first_request_id: int) -> bool:
+        """
+        The borrower was cancelled mid-call: tell the server to stop working on
+        the last request sent since `first_request_id` and check the connection
+        survived, so it can be reused. False if it can't be trusted any more.
+        """
+        from mcp.types import CancelledNotification, CancelledNotificationParams, ClientNotification
+
+        if not self.alive:
+            return False
+        last = self.next_request_id() - 1
+        if last < first_request_id:
+            return True  # nothing was sent
+        notification = CancelledNotification(
+            method="notifications/cancelled",
+            params=CancelledNotificationParams(requestId=last, reason="client disconnected"),
+        )
+        try:
+            await asyncio.wait_for(self.tools.session.send_notification(ClientNotification(notification)),
+                                   _PING_TIMEOUT_SECONDS)
+        except Exception:
+            return False
+        # the SSE client gives up on the whole connection if a POST fails, so
+        # make sure the notification went through before trusting it again
+        return await self.ping()
+
+    async def close(self) -> None:
+        self.alive = False
+        self._closing.set()
+        if self._task is not None:
+            await asyncio.wait([self._task])
+            if not self._task.cancelled():
+                self._task.exception()  # mark as retrieved; teardown errors are not actionable
+
+
+class MCPSessionPool:
+    """
+    A bounded pool of warm MCP sessions living on one event loop.
+
+    `session()` hands out an exclusive, health-checked session; sessions that
+    raise while borrowed are thrown away and replaced on the next checkout,
+    except on cancellation, where the server is told to drop the request and the
+    session goes back to the pool.
+    """
+
+    def __init__(self, factory: Callable, size: int = _DEFAULT_POOL_SIZE,
+                 idle_seconds: float = _DEFAULT_IDLE_SECONDS,
+                 health_seconds: float = _DEFAULT_HEALTH_SECS,
+                 connect_retries: int = _DEFAULT_RETRIES):
+        self._factory        = factory
+        self.size            = max(1, size)
+        self.idle_seconds    = idle_seconds
+        self.health_seconds  = health_seconds
+        self.connect_retries = max(0, connect_retries)
+        self._idle           = []
+        self._slots          = asyncio.Semaphore(self.size)
+        self._reaper         = None
+
+    @asynccontextmanager
+    async def session(self):
+        with metrics.stage("pool_wait"):
+            await self._slots.acquire()
+        entry = None
+        try:
+            entry = await self._checkout()
+            first_request_id = entry.next_request_id()
+            try:
+                yield entry.tools
+            except ToolCallError:
+                raise
+            except asyncio.CancelledError:
+                # the caller went away: no need to tear down a healthy connection
+                if not await entry.abandon(first_request_id):
+                    await entry.close()
+                    entry = None
+                raise
+            except BaseException:
+                # the connection state is unknown after a failure: never reuse it
+                await entry.close()
+                entry = None
+                raise
+        finally:
+            if entry is not None:
+                entry.last_used = time.monotonic()
+                self._idle.append(entry)
+            self._slots.release()
+
+    async def _checkout(self) -> _PooledSession:
+        self._ensure_reaper()
+        while self._idle:
+            entry = self._idle.pop()  # LIFO keeps the hottest connection busy
+            now = time.monotonic()
+            if not entry.alive or now - entry.last_used > self.idle_seconds:
+                await entry.close()
+                continue
+            if now - entry.last_seen > self.health_seconds and not await entry.ping():
+                await entry.close()
+                continue
+            return entry
+        return await self._connect()
+
+    async def _connect(self) -> _PooledSession:
+        last_error = None
+        for attempt in range(self.connect_retries + 1):
+            entry = _PooledSession(self._factory)
+            try:
+                await entry.open()
+                return entry
+            except Exception as e:
+                last_error = e
+                if attempt < self.connect_retries:
+                    await asyncio.sleep(min(0.25 * (2 ** attempt), 2.0))
+        raise last_error
+
+    async def probe(self) -> None:
+        """
+        Health check that never waits for a slot, so a busy but healthy server
+        isn't reported down: pings an idle session if there is one, else a
+        throwaway connection. Raises if the server doesn't answer.
+        """
+        if self._idle:
+            entry = self._idle.pop()
+            try:
+                healthy = entry.alive and await entry.ping()
+            except BaseException:
+                await entry.close()
+                raise
+            if healthy:
+                self._idle.append(entry)
+                return
+            await entry.close()  # a stale connection says little about the server: try a fresh one
+
+        entry = _PooledSession(self._factory)
+        await entry.open()
+        try:
+            if not await entry.ping():
+                raise ConnectionError("MCP server did not answer the health ping")
+        finally:
+            await entry.close()
+
+    def _ensure_reaper(self) -> None:
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_forever())
+
+    async def _reap_forever(self) -> None:
+        while True:
+            await asyncio.sleep(max(1.0, self.idle_seconds / 4))
+            now = time.monotonic()
+            stale = [e for e in self._idle if not e.alive or now - e.last_used > self.idle_seconds]
+            for entry in stale:
+                self._idle.remove(entry)
+                await entry.close()
+
+    async def close(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+        while self._idle:
+            await self._idle.pop().close()
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# One background event loop per worker process
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_pid: Optional[int] = None
+_loop_lock = threading.Lock()
+_pools: Dict[str, MCPSessionPool] = {}
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return this process's background event loop, starting it on first use.
+    Re-created after a fork so gunicorn workers never share the master's loop.
+    """
+    global _loop, _loop_pid, _pools
+    if _loop is not None and _loop_pid == os.getpid():
+        return _loop
+
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="mcp-loop", daemon=True)
+            thread.start()
+            _loop, _loop_pid, _pools = loop, os.getpid(), {}
+    return _loop
+
+
+def get_pool(factory: Callable, key: str = "default") -> MCPSessionPool:
+    """
+    Return the worker's session pool for `key` (one per MCP endpoint). Must be
+    called from the background loop.
+    """
+    pool = _pools.get(key)
+    if pool is None:
+        pool = _pools[key] = MCPSessionPool(
+            factory,
+            size=_env_int(_POOL_SIZE_ENV, _DEFAULT_POOL_SIZE),
+            idle_seconds=_env_int(_POOL_IDLE_ENV, _DEFAULT_IDLE_SECONDS),
+            health_seconds=_env_int(_POOL_HEALTH_ENV, _DEFAULT_HEALTH_SECS),
+            connect_retries=_env_int(_POOL_CONNECT_RETRIES, _DEFAULT_RETRIES),
+        )
+    return pool
+
+
+async def close_pools() -> None:
+    for pool in list(_pools.values()):
+        await pool.close()
+
+
+def shutdown(timeout: Optional[float] = None) -> None:
+    """
+    Blocking close_pools() for a worker that is exiting. Does nothing if this
+    process never opened a pool (e.g. the gunicorn master).
+    """
+    if _pools and _loop_pid == os.getpid():
+        run_sync(close_pools(), timeout)
+
+
+def run_sync(coro, timeout: Optional[float] = None, cancel_if: Optional[Callable[[], bool]] = None):
+    """
+    Blocking bridge for Flask views: run `coro` on the background loop and wait.
+    With `cancel_if`, it is polled while waiting; once it returns True the
+    coroutine is cancelled and RequestCancelled is raised.
+    """
+    submitted = time.perf_counter()
+    parent = tracing.current()
+
+    async def timed():
+        metrics.observe_stage("loop_dispatch", time.perf_counter() - submitted)
+        return await tracing.carry(coro, parent)
+
+    future = asyncio.run_coroutine_threadsafe(timed(), get_loop())
+    if cancel_if is None:
+        return future.result(timeout)
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        wait = CANCEL_POLL_SECONDS
+        if deadline is not None:
+            wait = max(0.0, min(wait, deadline - time.monotonic()))
+        try:
+            return future.result(wait)
+        except TimeoutError:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise
+        if cancel_if():
+            future.cancel()
+            raise RequestCancelled("The client went away before the result was ready.")
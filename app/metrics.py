@@ -0,0 +1,415 @@
+import os
+import json
+import time
+import fcntl
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+from . import tracing
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Every worker dumps its own samples into this directory; /metrics merges them
+_METRICS_DIR_ENV    = "METRICS_DIR"
+_DEFAULT_DIR        = os.path.join(tempfile.gettempdir(), "prompt-optimizer-metrics")
+_FLUSH_SECONDS      = 5
+_RETIRED_FILE       = "retired.json"   # counters and histograms folded in from workers that have exited
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SIMILARITY_BUCKETS = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.98, 0.999, 1.0)
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        self.name    = name
+        self.help    = help_text
+        self.labels  = tuple(labels)
+        self._values = {}
+        self._lock   = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {json.dumps(k): v if not isinstance(v, list) else list(v) for k, v in self._values.items()}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            # per-bucket counts (non-cumulative) followed by sum and count
+            state = self._values.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            else:
+                state[len(self.buckets)] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+
+class Registry:
+    """
+    Process-local metrics that aggregate across gunicorn workers: each process
+    periodically writes a JSON snapshot to METRICS_DIR, and render() merges the
+    snapshots of all workers. When a worker exits, its counters and
+    histograms are folded into one aggregate file and its own file is
+    removed (its gauges are dropped), so recycled workers don't pile up files.
+    """
+
+    def __init__(self, directory: str):
+        self.directory  = directory
+        self._metrics   = {}
+        self._flusher   = None
+        self._flush_pid = None
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Iterable[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    # ── persistence ────────────────────────────────────────────────────────────
+    def _path(self, pid: int) -> str:
+        return os.path.join(self.directory, f"{pid}.json")
+
+    def flush(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        data = {name: metric.snapshot() for name, metric in self._metrics.items()}
+        tmp = self._path(os.getpid()) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, self._path(os.getpid()))
+
+    def start_flusher(self) -> None:
+        """
+        Start (once per process) the thread that keeps this worker's file current.
+        """
+        if self._flush_pid == os.getpid():
+            return
+        self._flush_pid = os.getpid()
+
+        def loop():
+            while True:
+                time.sleep(_FLUSH_SECONDS)
+                try:
+                    self.flush()
+                except OSError:
+                    pass
+
+        self._flusher = threading.Thread(target=loop, name="metrics-flush", daemon=True)
+        self._flusher.start()
+
+    def retire(self, pid: int) -> None:
+        """
+        Fold the snapshot of an exited worker into the aggregate file and
+        delete it. Called from gunicorn's child_exit hook, and by /metrics for
+        any dead worker's file still lying around.
+        """
+        path = self._path(pid)
+        try:
+            lock = open(os.path.join(self.directory, ".retire.lock"), "w")
+        except OSError:
+            return
+        with lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except FileNotFoundError:
+                return  # someone else folded it already
+            except ValueError:
+                data = {}
+            retired = os.path.join(self.directory, _RETIRED_FILE)
+            try:
+                with open(retired) as f:
+                    merged = {name: {tuple(json.loads(k)): v for k, v in values.items()}
+                              for name, values in json.load(f).items()}
+            except (OSError, ValueError):
+                merged = {}
+            _merge(merged, data, lambda name: name in self._metrics and self._metrics[name].kind != "gauge")
+            tmp = retired + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump({name: {json.dumps(list(k)): v for k, v in values.items()}
+                           for name, values in merged.items()}, f)
+            os.replace(tmp, retired)
+            os.remove(path)
+
+    def _files(self) -> list:
+        try:
+            return [f for f in os.listdir(self.directory) if f.endswith(".json")]
+        except FileNotFoundError:
+            return []
+
+    def _collect(self) -> Dict[str, Dict[tuple, object]]:
+        merged = {name: {} for name in self._metrics}
+
+        # workers that died without child_exit running (or outside gunicorn)
+        for filename in self._files():
+            if filename[:-5].isdigit() and not _pid_alive(int(filename[:-5])):
+                try:
+                    self.retire(int(filename[:-5]))
+                except OSError:
+                    pass
+
+        for filename in self._files():
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            worker = filename[:-5].isdigit()   # the aggregate file has no gauges to give
+            _merge(merged, data, lambda name: name in self._metrics and (worker or self._metrics[name].kind != "gauge"))
+        return merged
+
+    # ── exposition ─────────────────────────────────────────────────────────────
+    def render(self) -> str:
+        """
+        Prometheus text exposition (format 0.0.4) of all workers' metrics.
+        """
+        try:
+            self.flush()
+        except OSError:
+            pass
+
+        lines = []
+        for name, values in self._collect().items():
+            metric = self._metrics[name]
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for key, value in sorted(values.items()):
+                labels = dict(zip(metric.labels, key))
+                if metric.kind != "histogram":
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets + ("+Inf",), value[:-2]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels({**labels, 'le': _number(bound)})} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(value[-2])}")
+                lines.append(f"{name}_count{_labels(labels)} {value[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def reset_directory(self) -> None:
+        """
+        Remove snapshots left by a previous run (called from the gunicorn master).
+        """
+        try:
+            for filename in os.listdir(self.directory):
+                os.remove(os.path.join(self.directory, filename))
+        except FileNotFoundError:
+            pass
+
+
+def _merge(into: dict, data: dict, wanted) -> None:
+    # add one snapshot's values (keys as JSON strings) into `into` (keys as tuples)
+    for name, values in data.items():
+        if not wanted(name):
+            continue
+        target = into.setdefault(name, {})
+        for raw_key, value in values.items():
+            key = tuple(json.loads(raw_key))
+            current = target.get(key)
+            if current is None:
+                target[key] = value
+            elif isinstance(value, list):
+                target[key] = [a + b for a, b in zip(current, value)]
+            else:
+                target[key] = current + value
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+    return "{" + body + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value) -> str:
+    if isinstance(value, str):
+        return value
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = Registry(os.getenv(_METRICS_DIR_ENV, _DEFAULT_DIR))
+
+# ────────────────────────────────────────────────────────────────────────────────
+# HTTP layer
+http_request_seconds = registry.histogram(
+    "http_request_duration_seconds", "Request latency by route.", ("route", "method", "status"))
+http_in_flight = registry.gauge(
+    "http_requests_in_flight", "Requests currently being handled.", ("route",))
+http_exceptions = registry.counter(
+    "http_request_exceptions_total", "Unhandled exceptions raised by views.", ("route", "exception"))
+http_cancelled = registry.counter(
+    "http_requests_cancelled_total", "Requests whose client went away before the answer; upstream work cancelled.",
+    ("route",))
+
+# Agent pipeline
+stage_seconds = registry.histogram(
+    "agent_stage_duration_seconds", "Time spent in each stage of an upstream call.", ("stage",))
+stage_errors = registry.counter(
+    "agent_stage_errors_total", "Stage failures by exception type.", ("stage", "exception"))
+upstream_in_flight = registry.gauge(
+    "upstream_calls_in_flight", "Upstream tool calls currently running.", ("tool",))
+upstream_calls = registry.counter(
+    "upstream_calls_total", "Upstream tool calls by outcome.", ("tool", "outcome"))
+upstream_hedges = registry.counter(
+    "upstream_hedges_total", "Hedged duplicate upstream calls by outcome.", ("tool", "outcome"))
+upstream_timeouts = registry.counter(
+    "upstream_timeouts_total", "Upstream calls cut off by the adaptive timeout.", ("tool",))
+admission_active = registry.gauge(
+    "admission_upstream_active", "Upstream calls holding an admission slot.")
+admission_queue_depth = registry.gauge(
+    "admission_queue_depth", "Upstream calls waiting for an admission slot.")
+admission_wait_seconds = registry.histogram(
+    "admission_wait_duration_seconds", "Time spent waiting for an admission slot.")
+admission_rejections = registry.counter(
+    "admission_rejections_total", "Requests refused by admission control.", ("reason",))
+circuit_state = registry.gauge(
+    "circuit_state", "Upstream circuit per tool: 0 closed, 1 half-open, 2 open.", ("tool",))
+circuit_transitions = registry.counter(
+    "circuit_transitions_total", "Circuit state changes by tool and new state.", ("tool", "state"))
+endpoint_healthy = registry.gauge(
+    "mcp_endpoint_healthy", "Workers that have the MCP endpoint in rotation (0 = ejected everywhere).",
+    ("endpoint",))
+endpoint_latency = registry.histogram(
+    "mcp_endpoint_call_duration_seconds", "Successful call latency per MCP endpoint.", ("endpoint",))
+endpoint_calls = registry.counter(
+    "mcp_endpoint_calls_total", "Calls and health probes per MCP endpoint by outcome.", ("endpoint", "outcome"))
+endpoint_ejections = registry.counter(
+    "mcp_endpoint_ejections_total", "Times an MCP endpoint was taken out of rotation.", ("endpoint",))
+neardup_lookups = registry.counter(
+    "neardup_lookups_total", "Near-duplicate index lookups by outcome (exact, near, miss).", ("tool", "outcome"))
+neardup_hit_similarity = registry.histogram(
+    "neardup_hit_similarity", "Similarity of the stored prompt whose result was reused.", ("tool",),
+    buckets=SIMILARITY_BUCKETS)
+neardup_audit_similarity = registry.histogram(
+    "neardup_audit_similarity", "Similarity between a reused result and a fresh upstream answer for the same prompt.",
+    buckets=SIMILARITY_BUCKETS)
+agent_tokens = registry.counter(
+    "agent_tokens_total", "LLM tokens used by the agent path.", ("tool", "direction"))
+agent_inference_seconds = registry.histogram(
+    "agent_inference_duration_seconds", "Model time per agent run, by requested tool.", ("tool",))
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time one pipeline stage and count its failures by exception type; inside
+    a traced request it is also recorded as a span.
+    """
+    started = time.perf_counter()
+    try:
+        with tracing.span(name):
+            yield
+    except BaseException as e:
+        stage_errors.inc(stage=name, exception=type(e).__name__)
+        raise
+    finally:
+        stage_seconds.observe(time.perf_counter() - started, stage=name)
+
+
+def observe_stage(name: str, seconds: float) -> None:
+    stage_seconds.observe(seconds, stage=name)
+
+
+def init_app(app) -> None:
+    """
+    Install per-route latency, in-flight and exception tracking on `app`.
+    """
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_started = time.perf_counter()
+        g._metrics_route = request.url_rule.rule if request.url_rule else "unmatched"
+        http_in_flight.inc(route=g._metrics_route)
+        registry.start_flusher()
+
+    @app.after_request
+    def _record(response):
+        started = g.pop("_metrics_started", None)
+        if started is not None:
+            http_request_seconds.observe(
+                time.perf_counter() - started,
+                route=g._metrics_route, method=request.method, status=response.status_code,
+            )
+        return response
+
+    @app.teardown_request
+    def _finish(exc: Optional[BaseException]):
+        route = g.pop("_metrics_route", None)
+        if route is not None:
+            http_in_flight.dec(route=route)
+        if exc is not None:
+            http_exceptions.inc(route=route or "unmatched", exception=type(exc).__name__)
@@ -0,0 +1,248 @@
+import os
+import re
+import time
+import random
+import hashlib
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Hashable, List, Optional, Set, Tuple
+
+from . import metrics
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Near-duplicate index tuning (all optional, read from the environment)
+_ENABLED_ENV     = "NEAR_DUP_ENABLED"       # "0" turns the index off
+_THRESHOLD_ENV   = "NEAR_DUP_THRESHOLD"     # Jaccard similarity of normalized shingles needed to reuse a result
+_SIZE_ENV        = "NEAR_DUP_SIZE"          # prompts remembered per worker (least recently used go first)
+_TTL_ENV         = "NEAR_DUP_TTL"           # seconds a remembered result may be reused
+_AUDIT_ENV       = "NEAR_DUP_AUDIT_RATIO"   # share of near hits re-fetched in the background to measure quality
+
+_DEFAULT_THRESHOLD = 0.9
+_DEFAULT_SIZE      = 2000
+_DEFAULT_TTL       = 24 * 3600
+_MAX_CHARS         = 4000   # longer prompts are neither indexed nor looked up
+_SHINGLE_CHARS     = 5
+_BANDS, _ROWS      = 16, 4  # 64 MinHash values; candidates from any matching band of 4
+# ────────────────────────────────────────────────────────────────────────────────
+
+# XOR with a random mask stands in for each hash permutation: several times
+# cheaper than (a*h + b) mod p, and candidates are verified exactly anyway
+_MASKS = [random.Random(0x5EED + i).getrandbits(64) for i in range(_BANDS * _ROWS)]
+
+
+def normalize(text: str) -> str:
+    """
+    Lower-case words only: whitespace, casing and punctuation differences vanish.
+    """
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+def shingles(normalized: str) -> FrozenSet[str]:
+    if len(normalized) <= _SHINGLE_CHARS:
+        return frozenset([normalized])
+    return frozenset(normalized[i:i + _SHINGLE_CHARS] for i in range(len(normalized) - _SHINGLE_CHARS + 1))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _bands(shingle_set: FrozenSet[str]) -> List[Tuple[int, ...]]:
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+              for s in shingle_set]
+    signature = [min(h ^ mask for h in hashes) for mask in _MASKS]
+    return [tuple(signature[i * _ROWS:(i + 1) * _ROWS]) for i in range(_BANDS)]
+
+
+class _Histogram:
+    def __init__(self, edges=metrics.SIMILARITY_BUCKETS):
+        self.edges  = edges
+        self.counts = [0] * len(edges)
+
+    def add(self, value: float) -> None:
+        self.counts[min(bisect_left(self.edges, value), len(self.edges) - 1)] += 1
+
+    def as_dict(self) -> Dict[str, int]:
+        return {f"<={edge}": count for edge, count in zip(self.edges, self.counts)}
+
+
+class _Entry:
+    __slots__ = ("scope", "normalized", "result", "expires", "band_keys")
+
+    def __init__(self, scope, normalized, result, expires, band_keys):
+        self.scope      = scope
+        self.normalized = normalized
+        self.result     = result
+        self.expires    = expires
+        self.band_keys  = band_keys
+
+
+class NearDuplicateIndex:
+    """
+    Remembers optimized results by their input prompt and finds earlier prompts
+    that differ only trivially (whitespace, casing, punctuation, a word or two).
+
+    Prompts are normalized and cut into character shingles; a 64-value MinHash
+    split into 16 bands of 4 (LSH) finds candidates, whose exact shingle
+    Jaccard similarity must reach `threshold`. Entries are kept per scope (the
+    tool and writing tone), expire after `ttl` and are evicted least recently
+    used beyond `size`. Lives on the background loop; not thread-safe.
+    """
+
+    def __init__(self, threshold: float = _DEFAULT_THRESHOLD, size: int = _DEFAULT_SIZE,
+                 ttl: float = _DEFAULT_TTL, audit_ratio: float = 0.0):
+        self.threshold   = threshold
+        self.size        = max(1, size)
+        self.ttl         = ttl
+        self.audit_ratio = audit_ratio
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._exact: Dict[Tuple[Hashable, str], int] = {}
+        self._buckets: Dict[Tuple[Hashable, int, Tuple[int, ...]], Set[int]] = {}
+        self._next_id = 0
+        self.counts = {"lookups": 0, "exact_hits": 0, "near_hits": 0, "misses": 0, "candidates": 0,
+                       "skipped": 0, "stores": 0, "evictions": 0, "expired": 0, "audits": 0}
+        self.hit_similarity  = _Histogram()
+        self.miss_similarity = _Histogram()  # best candidate that fell short of the threshold
+        self.audit_similarity = _Histogram()
+
+    def lookup(self, scope: Hashable, text: str) -> Optional[Tuple[str, float]]:
+        """
+        (stored result, similarity) of the closest remembered prompt in `scope`
+        at or above the threshold, else None.
+        """
+        normalized = normalize(text)
+        if not normalized or len(normalized) > _MAX_CHARS:
+            self.counts["skipped"] += 1
+            return None
+        self.counts["lookups"] += 1
+        now = time.time()
+
+        entry_id = self._exact.get((scope, normalized))
+        if entry_id is not None and self._live(entry_id, now):
+            self.counts["exact_hits"] += 1
+            self.hit_similarity.add(1.0)
+            return self._touch(entry_id).result, 1.0
+
+        query = shingles(normalized)
+        candidates = set()
+        for band, key in enumerate(_bands(query)):
+            candidates |= self._buckets.get((scope, band, key), set())
+        self.counts["candidates"] += len(candidates)
+
+        best_id, best = None, 0.0
+        for candidate in candidates:
+            if not self._live(candidate, now):
+                continue
+            other = self._entries[candidate].normalized
+            # |A∩B| / |A∪B| can't beat the ratio of the set sizes: skip the exact work
+            if min(len(other), len(normalized)) < self.threshold * max(len(other), len(normalized)) - _SHINGLE_CHARS:
+                continue
+            similarity = jaccard(query, shingles(other))
+            if similarity > best:
+                best_id, best = candidate, similarity
+
+        if best_id is not None and best >= self.threshold:
+            self.counts["near_hits"] += 1
+            self.hit_similarity.add(best)
+            return self._touch(best_id).result, best
+
+        self.counts["misses"] += 1
+        if best_id is not None:
+            self.miss_similarity.add(best)
+        return None
+
+    def add(self, scope: Hashable, text: str, result: str) -> None:
+        normalized = normalize(text)
+        if not result or not normalized or len(normalized) > _MAX_CHARS:
+            return
+        existing = self._exact.get((scope, normalized))
+        if existing is not None:
+            self._remove(existing)
+
+        entry_id, self._next_id = self._next_id, self._next_id + 1
+        band_keys = [(scope, band, key) for band, key in enumerate(_bands(shingles(normalized)))]
+        self._entries[entry_id] = _Entry(scope, normalized, result, time.time() + self.ttl, band_keys)
+        self._exact[(scope, normalized)] = entry_id
+        for key in band_keys:
+            self._buckets.setdefault(key, set()).add(entry_id)
+        self.counts["stores"] += 1
+
+        while len(self._entries) > self.size:
+            self._remove(next(iter(self._entries)))
+            self.counts["evictions"] += 1
+
+    def should_audit(self) -> bool:
+        return self.audit_ratio > 0 and random.random() < self.audit_ratio
+
+    def record_audit(self, served: str, fresh: str) -> float:
+        """
+        Compare a result served from the index with what the upstream returned
+        for the same prompt; the distribution shows whether the threshold is safe.
+        """
+        similarity = jaccard(shingles(normalize(served)), shingles(normalize(fresh)))
+        self.counts["audits"] += 1
+        self.audit_similarity.add(similarity)
+        metrics.neardup_audit_similarity.observe(similarity)
+        return similarity
+
+    def _live(self, entry_id: int, now: float) -> bool:
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            return False
+        if entry.expires < now:
+            self._remove(entry_id)
+            self.counts["expired"] += 1
+            return False
+        return True
+
+    def _touch(self, entry_id: int) -> _Entry:
+        self._entries.move_to_end(entry_id)
+        return self._entries[entry_id]
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        if self._exact.get((entry.scope, entry.normalized)) == entry_id:
+            del self._exact[(entry.scope, entry.normalized)]
+        for key in entry.band_keys:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def stats(self) -> dict:
+        hits = self.counts["exact_hits"] + self.counts["near_hits"]
+        return {
+            **self.counts,
+            "hit_ratio": round(hits / self.counts["lookups"], 4) if self.counts["lookups"] else 0.0,
+            "entries": len(self._entries),
+            "buckets": len(self._buckets),
+            "threshold": self.threshold,
+            "size": self.size,
+            "audit_ratio": self.audit_ratio,
+            "hit_similarity": self.hit_similarity.as_dict(),
+            "best_miss_similarity": self.miss_similarity.as_dict(),
+            "audit_similarity": self.audit_similarity.as_dict(),
+        }
+
+
+_index: Optional[NearDuplicateIndex] = None
+
+
+def get_index() -> Optional[NearDuplicateIndex]:
+    """
+    Return this process's near-duplicate index, or None when it is disabled.
+    """
+    global _index
+    if os.getenv(_ENABLED_ENV, "1") == "0":
+        return None
+    if _index is None:
+        _index = NearDuplicateIndex(
+            threshold=float(os.getenv(_THRESHOLD_ENV, _DEFAULT_THRESHOLD)),
+            size=int(os.getenv(_SIZE_ENV, _DEFAULT_SIZE)),
+            ttl=float(os.getenv(_TTL_ENV, _DEFAULT_TTL)),
+            audit_ratio=float(os.getenv(_AUDIT_ENV, 0)),
+        )
+    return _index
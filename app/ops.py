@@ -0,0 +1,118 @@
+from flask import Blueprint, Response, jsonify
+from . import admission, breaker, endpoints
+from .admin import require_ops
+from .cache import get_cache
+from .agno_agent import upstream_flights
+from .hedging import get_hedger
+from .jobs import get_job_queue
+from .metrics import registry
+from .neardup import get_index
+from .sessions import get_session_interface
+from .tool_schemas import get_tool_schemas
+
+ops_bp = Blueprint('ops', __name__)
+
+# internal URLs and load figures: only for ADMIN_TOKEN / OPS_TOKEN holders
+ops_bp.before_request(require_ops)
+
+@ops_bp.route('/ops/cache')
+def cache_stats():
+    """
+    Returns JSON with this worker's result-cache hit/miss counters.
+    """
+    cache = get_cache()
+    if cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **cache.stats()})
+
+
+@ops_bp.route('/ops/near-dup')
+def near_dup_stats():
+    """
+    Returns JSON with this worker's near-duplicate index: size, hit counters and
+    similarity histograms of hits, near misses and audits (to tune the threshold).
+    """
+    index = get_index()
+    if index is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **index.stats()})
+
+
+@ops_bp.route('/ops/singleflight')
+def singleflight_stats():
+    """
+    Returns JSON with this worker's request-coalescing counters.
+    """
+    return jsonify({**upstream_flights.counts, "in_flight": upstream_flights.in_flight()})
+
+
+@ops_bp.route('/ops/jobs')
+def job_stats():
+    """
+    Returns JSON with this worker's background job queue counters.
+    """
+    return jsonify(get_job_queue().stats())
+
+
+@ops_bp.route('/ops/sessions')
+def session_stats():
+    """
+    Returns JSON with this worker's server-side session counters and the
+    number of stored sessions.
+    """
+    interface = get_session_interface()
+    if interface is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **interface.stats()})
+
+
+@ops_bp.route('/ops/tools')
+def tool_schema_stats():
+    """
+    Returns JSON with this worker's cached MCP tool schema snapshots (per endpoint) and counters.
+    """
+    return jsonify(get_tool_schemas().stats())
+
+
+@ops_bp.route('/ops/hedging')
+def hedging_stats():
+    """
+    Returns JSON with this worker's per-tool latency percentiles, adaptive
+    timeouts and hedging counters.
+    """
+    return jsonify(get_hedger().stats())
+
+
+@ops_bp.route('/ops/admission')
+def admission_stats():
+    """
+    Returns JSON with this worker's upstream slots, wait queue and rejection
+    counters, plus the shared rate limiter's counters.
+    """
+    return jsonify(admission.stats())
+
+
+@ops_bp.route('/ops/circuits')
+def circuit_stats():
+    """
+    Returns JSON with this worker's per-tool circuit breaker state.
+    """
+    return jsonify(breaker.stats())
+
+
+@ops_bp.route('/ops/endpoints')
+def endpoint_stats():
+    """
+    Returns JSON with this worker's view of each MCP endpoint: latency EWMA,
+    calls in flight, failures and ejection state.
+    """
+    return jsonify(endpoints.stats())
+
+
+@ops_bp.route('/metrics')
+def prometheus_metrics():
+    """
+    Prometheus text exposition of request and agent-pipeline metrics,
+    merged across all gunicorn workers.
+    """
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,289 @@
+import os
+import re
+import sys
+import time
+import pstats
+import cProfile
+import tempfile
+import itertools
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Set
+
+from .admin import admin_enabled, is_admin
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Profiling (admin only; nothing is installed unless ADMIN_TOKEN is set)
+_PROFILING_ENV    = "PROFILING_ENABLED"           # "0" turns profiling off even for admins
+_PROFILE_DIR_ENV  = "PROFILE_DIR"                 # where profiles are written; shared by the workers
+_PROFILE_KEEP_ENV = "PROFILE_KEEP"                # newest files kept in PROFILE_DIR
+_INTERVAL_ENV     = "PROFILE_SAMPLE_INTERVAL_MS"  # sampling profiler period
+_MAX_SECONDS_ENV  = "PROFILE_MAX_SECONDS"         # longest sampling run allowed
+
+_DEFAULT_DIR         = os.path.join(tempfile.gettempdir(), "prompt-optimizer-profiles")
+_DEFAULT_KEEP        = 50
+_DEFAULT_INTERVAL_MS = 10
+_DEFAULT_MAX_SECONDS = 60
+_LOOP_THREAD         = "mcp-loop"   # app/mcp_pool.py's background loop: agent and MCP client code run there
+PROFILE_FILE         = re.compile(r"^[0-9]{8}-[0-9]{6}-[0-9]+-[0-9]+-[a-z0-9_-]+\.(prof|collapsed)$")
+# ────────────────────────────────────────────────────────────────────────────────
+
+_sequence = itertools.count(1)
+
+
+def profile_dir() -> str:
+    return os.getenv(_PROFILE_DIR_ENV, _DEFAULT_DIR)
+
+
+def _new_path(label: str, ext: str) -> str:
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    label = re.sub(r"[^a-z0-9_-]+", "-", label.lower()).strip("-") or "profile"
+    return os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_sequence)}-{label[:40]}.{ext}")
+
+
+def _prune() -> None:
+    keep = int(os.getenv(_PROFILE_KEEP_ENV, _DEFAULT_KEEP))
+    for entry in list_profiles()[keep:]:
+        try:
+            os.remove(os.path.join(profile_dir(), entry["name"]))
+        except OSError:
+            pass
+
+
+def list_profiles() -> List[dict]:
+    """
+    Profile files in PROFILE_DIR, newest first.
+    """
+    try:
+        names = [n for n in os.listdir(profile_dir()) if PROFILE_FILE.match(n)]
+    except OSError:
+        return []
+    entries = []
+    for name in names:
+        try:
+            st = os.stat(os.path.join(profile_dir(), name))
+        except OSError:
+            continue
+        entries.append({"name": name, "bytes": st.st_size, "modified": st.st_mtime,
+                        "format": "pstats" if name.endswith(".prof") else "collapsed"})
+    return sorted(entries, key=lambda e: e["modified"], reverse=True)
+
+
+def _threads_named(name: str) -> Set[int]:
+    return {t.ident for t in threading.enumerate() if t.name == name and t.ident is not None}
+
+
+class Sampler:
+    """
+    Statistical profiler: every `interval` seconds a background thread reads
+    the stack of every thread (or only of `threads`) and counts it. The result
+    is in collapsed-stack format ("thread;outer;...;inner count" per line),
+    which flamegraph.pl, speedscope and inferno read directly. Nothing is
+    hooked into the profiled code, so its overhead is the sampling thread's
+    own CPU time.
+    """
+
+    def __init__(self, interval: float, threads: Optional[Set[int]] = None):
+        self.interval = interval
+        self.threads  = threads
+        self.samples  = 0
+        self._stacks  = Counter()
+        self._stop    = threading.Event()
+        self._thread  = None
+
+    def start(self) -> "Sampler":
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        names: Dict[int, str] = {}
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if frames.keys() - names.keys():
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in frames.items():
+                if ident == own or self.threads is not None and ident not in self.threads:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self._stacks[";".join(s.replace(";", ",") for s in reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+        _prune()
+
+
+def sample_interval() -> float:
+    return max(0.001, float(os.getenv(_INTERVAL_ENV, _DEFAULT_INTERVAL_MS)) / 1000)
+
+
+def max_seconds() -> float:
+    return float(os.getenv(_MAX_SECONDS_ENV, _DEFAULT_MAX_SECONDS))
+
+
+# one worker-wide sampling run at a time (started from /debug/profiles)
+_worker_sampler_lock = threading.Lock()
+
+
+def sample_worker(seconds: float) -> bool:
+    """
+    Sample every thread of this worker for `seconds` in the background and
+    write the collapsed stacks to PROFILE_DIR. False if a run is already going.
+    """
+    if not _worker_sampler_lock.acquire(blocking=False):
+        return False
+    seconds = max(0.1, min(seconds, max_seconds()))
+
+    def run() -> None:
+        try:
+            sampler = Sampler(sample_interval()).start()
+            time.sleep(seconds)
+            sampler.stop()
+            sampler.save(_new_path(f"worker-{seconds:g}s", "collapsed"))
+        finally:
+            _worker_sampler_lock.release()
+
+    threading.Thread(target=run, name="profile-worker", daemon=True).start()
+    return True
+
+
+# Up to 3.11 cProfile hooks only the thread that enables it; from 3.12 one
+# profiler sees every thread and a second one can't start meanwhile
+_PER_THREAD_PROFILER = sys.version_info < (3, 12)
+
+# only one request at a time may profile the shared loop thread
+_loop_profile_lock = threading.Lock()
+
+
+class _RequestProfile:
+    """
+    Profile of one request, from before the view runs until the response has
+    been sent. "cprofile" records every call on the request thread (view,
+    Jinja rendering, the hand-off to the loop) and on the background loop
+    (agent and MCP client code) into one pstats file; the loop part includes
+    whatever else the loop ran meanwhile, and is left out while another
+    request is profiling it. "sample" samples just those two threads into
+    collapsed stacks.
+    """
+
+    def __init__(self, mode: str, label: str):
+        self.mode  = mode
+        self.path  = _new_path(label, "collapsed" if mode == "sample" else "prof")
+        self.name  = os.path.basename(self.path)
+        self._main = self._loop = self._sampler = self._loop_ref = None
+        self._holds_loop = False
+
+    def start(self) -> bool:
+        """
+        Start profiling; False if it can't run right now (another cProfile
+        request is in progress on Python 3.12+).
+        """
+        if self.mode == "sample":
+            self._sampler = Sampler(sample_interval(),
+                                    threads={threading.get_ident()} | _threads_named(_LOOP_THREAD)).start()
+            return True
+
+        self._holds_loop = _loop_profile_lock.acquire(blocking=False)
+        if not self._holds_loop and not _PER_THREAD_PROFILER:
+            return False
+        if self._holds_loop and _PER_THREAD_PROFILER:
+            from .mcp_pool import get_loop
+
+            self._loop_ref = get_loop()
+            self._loop = cProfile.Profile()
+            self._loop_ref.call_soon_threadsafe(self._loop.enable)
+        self._main = cProfile.Profile()
+        self._main.enable()
+        return True
+
+    def finish(self) -> None:
+        if self._sampler is not None:
+            self._sampler.stop()
+            self._sampler.save(self.path)
+            return
+
+        self._main.disable()
+        stats = pstats.Stats(self._main)
+        if self._loop is not None:
+            stopped = threading.Event()
+
+            def disable() -> None:
+                self._loop.disable()
+                stopped.set()
+
+            self._loop_ref.call_soon_threadsafe(disable)
+            if stopped.wait(1.0):
+                self._loop.create_stats()
+                if self._loop.stats:
+                    stats.add(self._loop)
+        if self._holds_loop:
+            _loop_profile_lock.release()
+        stats.dump_stats(self.path)
+        _prune()
+
+
+def _requested_mode(request) -> Optional[str]:
+    value = (request.headers.get("X-Profile") or request.args.get("profile") or "").lower()
+    if value in ("1", "true", "cprofile", "pstats"):
+        return "cprofile"
+    if value == "sample":
+        return "sample"
+    return None
+
+
+def enabled() -> bool:
+    return admin_enabled() and os.getenv(_PROFILING_ENV, "1") != "0"
+
+
+def init_app(app) -> None:
+    """
+    Let an admin profile single requests: add `X-Profile: 1` (or ?profile=1)
+    for a cProfile/pstats profile, `sample` for collapsed stacks. The response
+    names the file in X-Profile-File; download it from /debug/profiles.
+    Without ADMIN_TOKEN nothing is installed, so there is no per-request cost.
+    """
+    from flask import g, request
+
+    if not enabled():
+        return
+
+    @app.before_request
+    def _start_profile():
+        mode = _requested_mode(request)
+        if mode is None or not is_admin():
+            return
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        profile = _RequestProfile(mode, f"{request.method}-{route}")
+        if profile.start():
+            g._profile = profile
+
+    @app.after_request
+    def _attach_profile(response):
+        profile = g.pop("_profile", None)
+        if profile is not None:
+            response.headers["X-Profile-File"] = profile.name
+            response.call_on_close(profile.finish)
+        return response
+
+    @app.teardown_request
+    def _abandon_profile(exc):
+        profile = g.pop("_profile", None)  # still here: after_request never ran
+        if profile is not None:
+            profile.finish()
@@ -2,24 +2,145 @@ import os
 import asyncio
 from flask import Blueprint, request, jsonify
 from flask_cors import cross_origin
-from .agno_agent   import query_agent
+from .agno_agent   import ONE_SHOT_TOOL, one_shot_input, query_tool, query_tools_batch, stream_tool, stream_tools_batch
+from .admission    import Overloaded, rate_limit_response
+from .breaker      import CircuitOpenError
+from .cache        import bypass_requested
+from .disconnect   import client_watch
+from .mcp_pool     import RequestCancelled
+from .streaming    import sse_response, wants_stream
 
 proxy_bp = Blueprint('proxy', __name__)
 
+# Largest number of prompts accepted by one /optimize/batch request
+_BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 50))
+
 @proxy_bp.route('/optimize', methods=['POST'])
 @cross_origin()  # allow your Chrome extension to call it
 def optimize():
     """
-    Expects JSON: { "prompt": "<original user prompt>" }
-    Returns JSON: { "optimized_prompt": "<agent's reply>" }
+    Expects JSON: { "prompt": "<original user prompt>", "no_cache": false, "stream": false }
+    Returns JSON: { "optimized_prompt": "<agent's reply>", "degraded"?: true }
+
+    "degraded" is set when the upstream optimizer is unavailable and the prompt
+    came from the local template fallback instead; with the fallback disabled
+    the reply is a 503 with Retry-After.
+
+    Each client (X-Extension-Id header, else IP) is rate limited: over the
+    limit the reply is a 429 with Retry-After; when the server has no upstream
+    capacity left it is a 503 with Retry-After. If the client disconnects before
+    the answer is ready the upstream call is cancelled (logged as a 499).
+
+    With "stream": true (or Accept: text/event-stream) the reply is an SSE stream
+    of status/progress events ending in a "result" event carrying
+    "optimized_prompt", or an "error" event.
     """
     payload = request.get_json(force=True, silent=True)
     if not payload or "prompt" not in payload:
         return jsonify({"error": "Missing 'prompt' field"}), 400
 
-    original = payload["prompt"]
+    limited = rate_limit_response(request)
+    if limited is not None:
+        return limited
+
+    original  = payload["prompt"]
+    use_cache = not (payload.get("no_cache") or bypass_requested(request))
+    watch     = client_watch(request)
+
+    if wants_stream(request, payload):
+        events = stream_tool(ONE_SHOT_TOOL, original, use_cache=use_cache, cancel_if=watch)
+        return sse_response(_as_optimize_events(events), watch)
+
     try:
-        optimized = query_agent("Call the prompt_optimizer_mcp_server_one_shot_optimization tool to optimize the following initial prompt: " + original)
-        return jsonify({"optimized_prompt": optimized})
+        optimized = query_tool(ONE_SHOT_TOOL, original, use_cache=use_cache, cancel_if=watch)
+        return jsonify({"optimized_prompt": optimized, **_degraded(optimized)})
+    except RequestCancelled as e:
+        return jsonify({"error": str(e)}), 499
+    except (CircuitOpenError, Overloaded) as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": str(int(e.retry_after + 0.5))}
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+
+def _degraded(result):
+    return {"degraded": True} if getattr(result, "degraded", False) else {}
+
+
+def _as_optimize_events(events):
+    # keep the final event's field name identical to the JSON contract
+    for event in events:
+        if event["event"] == "result":
+            event = {"event": "result", "optimized_prompt": event["text"],
+                     **({"degraded": True} if event.get("degraded") else {})}
+        yield event
+
+
+@proxy_bp.route('/optimize/batch', methods=['POST'])
+@cross_origin()
+def optimize_batch():
+    """
+    Expects JSON: { "items": [ { "prompt": "...", "tone": "Technical" }, "plain prompt", ... ],
+                    "no_cache": false, "stream": false }
+    Returns JSON: { "results": [ { "optimized_prompt": "...", "degraded"?: true } | { "error": "..." }, ... ] }
+    in the same order as "items".
+
+    With "stream": true (or Accept: text/event-stream) each result is sent as an
+    SSE "item" event carrying its "index" as soon as it finishes, then "done".
+    """
+    payload = request.get_json(force=True, silent=True)
+    items = payload.get("items") if isinstance(payload, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Missing 'items' list"}), 400
+    if len(items) > _BATCH_MAX_ITEMS:
+        return jsonify({"error": f"At most {_BATCH_MAX_ITEMS} items per batch"}), 400
+
+    # every item costs one of the client's batch items (413 beyond the item burst)
+    limited = rate_limit_response(request, items=len(items))
+    if limited is not None:
+        return limited
+
+    calls, invalid = [], {}
+    for index, item in enumerate(items):
+        if isinstance(item, str):
+            item = {"prompt": item}
+        prompt = item.get("prompt") if isinstance(item, dict) else None
+        if not isinstance(prompt, str) or not prompt.strip():
+            invalid[index] = "Missing 'prompt' field"
+            continue
+        calls.append((index, one_shot_input(prompt, item.get("tone"))))
+
+    use_cache = not (payload.get("no_cache") or bypass_requested(request))
+    tool_calls = [(ONE_SHOT_TOOL, text) for _, text in calls]
+    watch = client_watch(request)
+
+    if wants_stream(request, payload):
+        events = stream_tools_batch(tool_calls, use_cache=use_cache, cancel_if=watch)
+        return sse_response(_as_batch_events(events, calls, invalid), watch)
+
+    try:
+        outcomes = query_tools_batch(tool_calls, use_cache=use_cache, cancel_if=watch)
+    except RequestCancelled as e:
+        return jsonify({"error": str(e)}), 499
+
+    results = [{"error": invalid[i]} if i in invalid else None for i in range(len(items))]
+    for (index, _), outcome in zip(calls, outcomes):
+        if "text" in outcome:
+            outcome = {"optimized_prompt": outcome.pop("text"), **outcome}
+        results[index] = outcome
+    return jsonify({"results": results})
+
+
+def _as_batch_events(events, calls, invalid):
+    # map positions in the upstream call list back to positions in "items"
+    for index, error in invalid.items():
+        yield {"event": "item", "index": index, "error": error}
+    for event in events:
+        item = {"event": "item", "index": calls[event["index"]][0]}
+        if "text" in event:
+            item["optimized_prompt"] = event["text"]
+            if event.get("degraded"):
+                item["degraded"] = True
+        else:
+            item["error"] = event["error"]
+        yield item
+    yield {"event": "done"}
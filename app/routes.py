@@ -1,5 +1,14 @@
-from flask import Blueprint, render_template, request, session
-from .agno_agent import query_agent
+from flask import Blueprint, jsonify, redirect, render_template, request, session, url_for
+from .agno_agent import (
+    EIGHT_QUESTIONS_TOOL, FIVE_QUESTIONS_TOOL, ONE_SHOT_TOOL,
+    one_shot_input, query_tool, query_tool_async, stream_tool,
+)
+from .assets import cached_page
+from .cache import bypass_requested
+from .disconnect import client_watch
+from .jobs import DONE, ERROR, JobQueueFull, get_job_queue
+from .mcp_pool import RequestCancelled
+from .streaming import sse_response
 import re
 
 main_bp = Blueprint('main', __name__)
@@ -25,13 +34,32 @@ INTERACTIVE_PLACEHOLDERS = [
 # ────────────────────────────────────────────────────────────────────────────────
 
 @main_bp.route('/')
+@cached_page
 def index():
     return render_template('index.html')
 
 @main_bp.route('/privacy')
+@cached_page
 def privacy():
     return render_template('privacy.html')
 
+def _read_quick_form(form):
+    """
+    Returns (user_input, raw_tone, custom_tone, prompt_styling) from the Quick form.
+    """
+    user_input  = form.get('user_input', '').strip()
+    raw_tone    = form.get('tone', 'Standard')
+    custom_tone = form.get('custom_tone', '').strip()
+
+    # decide what to actually send to the agent
+    if raw_tone == 'Custom':
+        prompt_styling = custom_tone or 'Standard'
+    else:
+        prompt_styling = raw_tone
+
+    return user_input, raw_tone, custom_tone, prompt_styling
+
+
 @main_bp.route('/quick', methods=['GET', 'POST'])
 def quick():
     user_input     = None
@@ -39,26 +67,23 @@ def quick():
     custom_tone    = ''
     prompt_styling = None
     response       = None
+    degraded       = False
 
     if request.method == 'POST':
         # grab what the user typed and their tone selection
-        user_input  = request.form.get('user_input', '').strip()
-        raw_tone    = request.form.get('tone', 'Standard')
-        custom_tone = request.form.get('custom_tone', '').strip()
-
-        # decide what to actually send to the agent
-        if raw_tone == 'Custom':
-            prompt_styling = custom_tone or 'Standard'
-        else:
-            prompt_styling = raw_tone
+        user_input, raw_tone, custom_tone, prompt_styling = _read_quick_form(request.form)
 
         if user_input:
             try:
-                response = query_agent(
-                    f"Call the prompt_optimizer_mcp_server_one_shot_optimization "
-                    f"tool to optimize the following initial prompt idea and writing tone: "
-                    f"'{user_input} [Please consider a {prompt_styling} writing tone to optimize the given prompt]'"
+                response = query_tool(
+                    ONE_SHOT_TOOL,
+                    one_shot_input(user_input, prompt_styling),
+                    use_cache=not bypass_requested(request),
+                    cancel_if=client_watch(request)
                 )
+                degraded = getattr(response, 'degraded', False)
+            except RequestCancelled:
+                return '', 499  # nobody is left to render the page for
             except Exception as e:
                 response = f"Error: {e}"
 
@@ -66,12 +91,33 @@ def quick():
         'quick.html',
         user_input=user_input,
         response=response,
+        degraded=degraded,
         selected_tone=raw_tone,
         custom_tone=custom_tone,
         prompt_styling=prompt_styling
     )
 
 
+@main_bp.route('/quick/stream', methods=['POST'])
+def quick_stream():
+    """
+    Same form as /quick, answered as an SSE stream of status/progress events
+    ending in a "result" or "error" event; quick.html uses it to fill the
+    result area progressively.
+    """
+    user_input, _, _, prompt_styling = _read_quick_form(request.form)
+    if not user_input:
+        return sse_response([{"event": "error", "error": "Missing prompt"}])
+
+    watch = client_watch(request)
+    return sse_response(stream_tool(
+        ONE_SHOT_TOOL,
+        one_shot_input(user_input, prompt_styling),
+        use_cache=not bypass_requested(request),
+        cancel_if=watch
+    ), watch)
+
+
 @main_bp.route('/interactive', methods=['GET'])
 def interactive():
     return render_template('interactive_step1.html', questions=INTERACTIVE_QUESTIONS, placeholders=INTERACTIVE_PLACEHOLDERS)
@@ -79,42 +125,100 @@ def interactive():
 
 @main_bp.route('/interactive', methods=['POST'])
 def interactive_submit():
-    questions = INTERACTIVE_QUESTIONS
-    answers   = [request.form.get(f"q{i}", "").strip() for i in range(1, 6)]
-    qas       = [{"q": questions[i], "a": answers[i]} for i in range(5)]
+    answers = [request.form.get(f"q{i}", "").strip() for i in range(1, len(INTERACTIVE_QUESTIONS) + 1)]
 
-    session['interactive_qas'] = qas
+    # only the answers: the questions are looked up by index in INTERACTIVE_QUESTIONS
+    session['interactive_answers'] = answers
+    qas = _interactive_qas(answers)
 
-    prompt_lines = [
-        "Call the tool named prompt_optimizer_mcp_server_five_questions_analysis_and_followup_generation "
-        "to analyse the following 5 questions and answers and generate 3 follow-up questions:"
-    ]
-    for pair in qas:
-        prompt_lines.append(f"Question: {pair['q']}\nAnswer: {pair['a']}")
+    prompt_lines = [f"Question: {pair['q']}\nAnswer: {pair['a']}" for pair in qas]
 
-    raw_followups = query_agent("\n\n".join(prompt_lines))
-    followups     = parse_numbered_list(raw_followups, count=3)
+    job_id = _submit_tool_job("followups", FIVE_QUESTIONS_TOOL, "\n\n".join(prompt_lines))
+    if job_id is None:
+        return _busy_response()
+    return redirect(url_for('main.interactive_followups', job_id=job_id), code=303)
 
-    return render_template('interactive_step2.html', followups=followups)
+
+@main_bp.route('/interactive/followups/<job_id>', methods=['GET'])
+def interactive_followups(job_id):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return redirect(url_for('main.interactive'))
+    if job['status'] != DONE:
+        return render_template('interactive_step2.html', job=job, followups=[])
+
+    followups = parse_numbered_list(job['result'], count=3)
+    return render_template('interactive_step2.html', followups=followups, degraded=bool(job.get('degraded')))
 
 
 @main_bp.route('/interactive/followup', methods=['POST'])
 def interactive_followup():
-    qas = session.get('interactive_qas', [])
+    qas = _interactive_qas(session.get('interactive_answers', []))
 
     follow_qs = request.form.getlist('follow_q')
     follow_as = request.form.getlist('follow_a')
-    followups = [{"q": follow_qs[i], "a": follow_as[i]} for i in range(len(follow_qs))]
+    # a form with mismatched lists (hand-edited or truncated) pairs what it can
+    followups = [{"q": q, "a": a} for q, a in zip(follow_qs, follow_as)]
+
+    prompt_lines = [f"Question: {pair['q']}\nAnswer: {pair['a']}" for pair in qas + followups]
+
+    job_id = _submit_tool_job("analysis", EIGHT_QUESTIONS_TOOL, "\n\n".join(prompt_lines))
+    if job_id is None:
+        return _busy_response()
+    return redirect(url_for('main.interactive_result', job_id=job_id), code=303)
+
+
+@main_bp.route('/interactive/result/<job_id>', methods=['GET'])
+def interactive_result(job_id):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return redirect(url_for('main.interactive'))
+    if job['status'] != DONE:
+        return render_template('interactive_result.html', job=job)
+
+    return render_template('interactive_result.html', analysis=job['result'], degraded=bool(job.get('degraded')))
+
+
+@main_bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """
+    Returns JSON: { "id", "status": "queued|running|done|error", "result"?, "degraded"?, "error"? }
+    Polled by the interactive pages while a job runs.
+    """
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+
+    body = {"id": job['id'], "status": job['status']}
+    if job['status'] == DONE:
+        body["result"] = job['result']
+        body["degraded"] = bool(job.get('degraded'))
+    elif job['status'] == ERROR:
+        body["error"] = job['error']
+    return jsonify(body)
+
+
+def _interactive_qas(answers):
+    """
+    Pairs each stored answer with its question from INTERACTIVE_QUESTIONS.
+    """
+    return [{"q": question, "a": answer} for question, answer in zip(INTERACTIVE_QUESTIONS, answers)]
+
+
+def _submit_tool_job(kind, tool_name, text):
+    """
+    Queue one upstream tool call as a background job; returns its id, or None
+    when this worker's job queue is full.
+    """
+    use_cache = not bypass_requested(request)
+    try:
+        return get_job_queue().submit(kind, text, lambda: query_tool_async(tool_name, text, use_cache))
+    except JobQueueFull:
+        return None
 
-    prompt_lines = [
-        "Call the tool named prompt_optimizer_mcp_server_eight_questions_analysis_and_prompt_generation "
-        "to analyse the 8 given questions and generate a final prompt:"
-    ]
-    for pair in qas + followups:
-        prompt_lines.append(f"Question: {pair['q']}\nAnswer: {pair['a']}")
 
-    analysis = query_agent("\n\n".join(prompt_lines))
-    return render_template('interactive_result.html', analysis=analysis)
+def _busy_response():
+    return "The server is busy right now, please try again in a few seconds.", 503, {"Retry-After": "5"}
 
 
 def parse_numbered_list(text, count):
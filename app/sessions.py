@@ -0,0 +1,234 @@
+import os
+import re
+import time
+import sqlite3
+import secrets
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SecureCookieSession, SessionInterface
+
+from . import storage
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Server-side sessions (all optional, read from the environment)
+_SERVER_SESSIONS_ENV  = "SERVER_SESSIONS"        # "0" keeps Flask's signed-cookie sessions
+_SESSION_STORE_ENV    = "SESSION_STORE_PATH"     # SQLite file shared by workers ("" keeps sessions in memory)
+_SESSION_TTL_ENV      = "SESSION_TTL_SECONDS"    # idle time after which a session is forgotten
+_SESSION_SIZE_ENV     = "SESSION_MEMORY_SIZE"    # sessions kept by the in-memory store (least recently used go first)
+
+_DEFAULT_STORE_PATH  = os.path.join(tempfile.gettempdir(), "prompt-optimizer-sessions.sqlite3")
+_DEFAULT_TTL         = 2 * 3600
+_DEFAULT_SIZE        = 10000
+_MMAP_BYTES          = 64 * 1024 * 1024
+_PURGE_EVERY_SECONDS = 60
+_SESSION_ID          = re.compile(r"^[A-Za-z0-9_-]{22}$")  # secrets.token_urlsafe(16)
+
+# blueprints (or endpoints) whose views never use the session: no store lookup for them
+_SESSIONLESS = {"static", "assets", "ops", "proxy", "debug"}
+# ────────────────────────────────────────────────────────────────────────────────
+
+_serializer = TaggedJSONSerializer()
+
+
+class ServerSideSession(SecureCookieSession):
+    """
+    Session data kept on the server; the cookie only carries `sid`.
+    """
+
+    def __init__(self, initial=None, sid: Optional[str] = None, expires: float = 0.0):
+        super().__init__(initial)
+        self.sid     = sid
+        self.expires = expires
+
+
+class _MemorySessionStore:
+    """
+    Sessions in an LRU dict; only visible to the process that created them.
+    """
+
+    def __init__(self, size: int = _DEFAULT_SIZE):
+        self.size      = max(1, size)
+        self._sessions = OrderedDict()
+        self._lock     = threading.Lock()
+
+    def get(self, sid: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            item = self._sessions.get(sid)
+            if item is None:
+                return None
+            if item[1] < time.time():
+                del self._sessions[sid]
+                return None
+            self._sessions.move_to_end(sid)
+            return item
+
+    def set(self, sid: str, data: str, expires: float) -> None:
+        with self._lock:
+            self._sessions[sid] = (data, expires)
+            self._sessions.move_to_end(sid)
+            while len(self._sessions) > self.size:
+                self._sessions.popitem(last=False)
+
+    def delete(self, sid: str) -> None:
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def purge(self, now: float) -> None:
+        with self._lock:
+            for sid in [s for s, (_, expires) in self._sessions.items() if expires < now]:
+                del self._sessions[sid]
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class _SQLiteSessionStore:
+    """
+    Sessions in a memory-mapped SQLite file, so every gunicorn worker sees them.
+    """
+
+    def __init__(self, path: str):
+        self.path  = path
+        self._conn = None
+        self._pid  = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            conn = storage.connect(self.path, timeout=2.0)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA mmap_size={_MMAP_BYTES}")
+            conn.execute("CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data TEXT, expires REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get(self, sid: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT data, expires FROM sessions WHERE id = ? AND expires >= ?", (sid, time.time())
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set(self, sid: str, data: str, expires: float) -> None:
+        with self._lock:
+            self._connection().execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)", (sid, data, expires))
+
+    def delete(self, sid: str) -> None:
+        with self._lock:
+            self._connection().execute("DELETE FROM sessions WHERE id = ?", (sid,))
+
+    def purge(self, now: float) -> None:
+        with self._lock:
+            self._connection().execute("DELETE FROM sessions WHERE expires < ?", (now,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Flask session interface that keeps session data in `store` and gives the
+    browser only a random 128-bit id. An idle session expires after `ttl`
+    seconds; reading it again in the second half of that window writes it back
+    with a fresh expiry. Requests that leave the session unchanged write
+    nothing and set no cookie.
+    """
+
+    def __init__(self, store, ttl: float = _DEFAULT_TTL):
+        self.store       = store
+        self.ttl         = ttl
+        self._last_purge = 0.0
+        self.counts      = {"loaded": 0, "missing": 0, "created": 0, "saved": 0, "refreshed": 0, "deleted": 0}
+
+    def open_session(self, app, request) -> ServerSideSession:
+        if (request.blueprint or request.endpoint) in _SESSIONLESS:
+            return ServerSideSession()
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and _SESSION_ID.match(sid):
+            item = self.store.get(sid)
+            if item is not None:
+                self.counts["loaded"] += 1
+                return ServerSideSession(_serializer.loads(item[0]), sid=sid, expires=item[1])
+            self.counts["missing"] += 1
+        return ServerSideSession()
+
+    def save_session(self, app, session: ServerSideSession, response) -> None:
+        name   = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path   = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        if not session:
+            if session.sid is not None and session.modified:
+                self.store.delete(session.sid)
+                self.counts["deleted"] += 1
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app), httponly=self.get_cookie_httponly(app))
+            return
+
+        now = time.time()
+        fresh = session.sid is None
+        if fresh:
+            session.sid = secrets.token_urlsafe(16)
+            self.counts["created"] += 1
+        if session.modified or fresh:
+            self.counts["saved"] += 1
+        elif session.accessed and session.expires - now < self.ttl / 2:
+            self.counts["refreshed"] += 1
+        else:
+            return
+        self.store.set(session.sid, _serializer.dumps(dict(session)), now + self.ttl)
+        self._maybe_purge(now)
+
+        if fresh or session.permanent:
+            response.set_cookie(
+                name, session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+                secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app),
+            )
+
+    def _maybe_purge(self, now: float) -> None:
+        if now - self._last_purge > _PURGE_EVERY_SECONDS:
+            self._last_purge = now
+            self.store.purge(now)
+
+    def stats(self) -> dict:
+        return {**self.counts, "backend": type(self.store).__name__.strip("_"), "sessions": len(self.store),
+                "ttl": self.ttl}
+
+
+_interface: Optional[ServerSideSessionInterface] = None
+
+
+def get_session_interface() -> Optional[ServerSideSessionInterface]:
+    """
+    Return the process-wide session interface, or None when SERVER_SESSIONS=0.
+    """
+    global _interface
+    if os.getenv(_SERVER_SESSIONS_ENV, "1") == "0":
+        return None
+    if _interface is None:
+        path = os.getenv(_SESSION_STORE_ENV, _DEFAULT_STORE_PATH)
+        _interface = ServerSideSessionInterface(
+            _SQLiteSessionStore(path) if path else _MemorySessionStore(int(os.getenv(_SESSION_SIZE_ENV, _DEFAULT_SIZE))),
+            ttl=float(os.getenv(_SESSION_TTL_ENV, _DEFAULT_TTL)),
+        )
+    return _interface
+
+
+def init_app(app) -> None:
+    """
+    Switch `app` to server-side sessions unless they are turned off.
+    """
+    interface = get_session_interface()
+    if interface is not None:
+        app.session_interface = interface
@@ -0,0 +1,52 @@
+import asyncio
+from typing import Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: the first caller for a key runs the
+    upstream call and every caller that arrives while it is in flight awaits the
+    same task, receiving the same result or the same exception. The shared call
+    is cancelled only when every caller waiting on it has been cancelled.
+
+    Not thread-safe by design: it lives on the worker's background event loop.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self.counts = {"leaders": 0, "coalesced": 0, "abandoned": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.counts["leaders"] += 1
+        else:
+            self.counts["coalesced"] += 1
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            # shield: one waiter giving up must not cancel the call for the others
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1 and not task.done():
+                # the last interested caller left: stop the upstream work, and
+                # let the next caller for this key start afresh
+                self.counts["abandoned"] += 1
+                self._forget(key, task)
+                task.cancel()
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    def in_flight(self) -> int:
+        return len(self._calls)
@@ -0,0 +1,152 @@
+(function () {
+  const CORE_I18N = {
+    en: {
+      "brand": "Prompt Optimizer",
+      "nav.home": "Home",
+      "nav.quick": "Quick",
+      "nav.interactive": "Interactive",
+      "footer.privacy": "Privacy Policy",
+      "footer.github": "GitHub Repo"
+    },
+    pt: {
+      "brand": "Otimizador de Prompt",
+      "nav.home": "Início",
+      "nav.quick": "Rápido",
+      "nav.interactive": "Interativo",
+      "footer.privacy": "Política de Privacidade",
+      "footer.github": "Repositório no GitHub"
+    }
+  };
+
+  // --- LANGUAGE DETECTION ---
+  function readLangFromURL() {
+    try {
+      const sp = new URLSearchParams(window.location.search);
+      const q = (sp.get('lang') || '').toLowerCase();
+      if (q === 'pt' || q === 'en') return q;
+      // also allow hash like #lang=pt
+      const m = (window.location.hash || '').match(/lang=(pt|en)/i);
+      if (m) return m[1].toLowerCase();
+    } catch (_) {}
+    return null;
+  }
+
+  function getBrowserLang() {
+    const list = Array.isArray(navigator.languages) ? navigator.languages : [];
+    const cand = list.length ? list : [(navigator.language || '')];
+    for (const lang of cand) {
+      if ((lang || '').toLowerCase().startsWith('pt')) return 'pt';
+    }
+    for (const lang of cand) {
+      if ((lang || '').toLowerCase().startsWith('en')) return 'en';
+    }
+    return null;
+  }
+
+  // **Minimal change here: URL wins, then saved, then browser, then EN**
+  function getLang() {
+    const fromURL = readLangFromURL();
+    if (fromURL) {
+      localStorage.setItem('lang', fromURL);
+      return fromURL;
+    }
+
+    const saved = localStorage.getItem('lang');
+    if (saved === 'pt' || saved === 'en') return saved;
+
+    const fromBrowser = getBrowserLang();
+    if (fromBrowser) return fromBrowser;
+
+    return 'en';
+  }
+  // --- END LANGUAGE DETECTION ---
+
+  function currentDict(lang) {
+    const page = (window.appI18n && window.appI18n[lang]) ? window.appI18n[lang] : {};
+    return Object.assign({}, CORE_I18N[lang] || CORE_I18N.en, page);
+  }
+
+  // Capture default EN texts/placeholders BEFORE we translate
+  function captureDefaults() {
+    document.querySelectorAll('[data-i18n]').forEach(function (el) {
+      if (!el.hasAttribute('data-i18n-default')) {
+        el.setAttribute('data-i18n-default', el.textContent);
+      }
+    });
+    document.querySelectorAll('[data-i18n-placeholder]').forEach(function (el) {
+      if (!el.hasAttribute('data-i18n-placeholder-default')) {
+        el.setAttribute('data-i18n-placeholder-default', el.getAttribute('placeholder') || '');
+      }
+    });
+    document.querySelectorAll('[data-i18n-title]').forEach(function (el) {
+      if (!el.hasAttribute('data-i18n-title-default')) {
+        el.setAttribute('data-i18n-title-default', el.getAttribute('title') || '');
+      }
+    });
+  }
+
+  function applyI18n(lang) {
+    const dict = currentDict(lang);
+    document.documentElement.setAttribute('lang', lang === 'pt' ? 'pt-BR' : 'en');
+
+    // Text nodes
+    document.querySelectorAll('[data-i18n]').forEach(function (el) {
+      const key = el.getAttribute('data-i18n');
+      const val = dict[key];
+      if (val != null) {
+        el.textContent = val;
+      } else {
+        const def = el.getAttribute('data-i18n-default');
+        if (def != null) el.textContent = def;
+      }
+    });
+
+    // Placeholders
+    document.querySelectorAll('[data-i18n-placeholder]').forEach(function (el) {
+      const key = el.getAttribute('data-i18n-placeholder');
+      const val = dict[key];
+      if (val != null) {
+        el.setAttribute('placeholder', val);
+      } else {
+        const def = el.getAttribute('data-i18n-placeholder-default');
+        if (def != null) el.setAttribute('placeholder', def);
+      }
+    });
+
+    // Titles/tooltips
+    document.querySelectorAll('[data-i18n-title]').forEach(function (el) {
+      const key = el.getAttribute('data-i18n-title');
+      const val = dict[key];
+      if (val != null) {
+        el.setAttribute('title', val);
+      } else {
+        const def = el.getAttribute('data-i18n-title-default');
+        if (def != null) el.setAttribute('title', def);
+      }
+    });
+  }
+
+  // Expose API
+  window.setLang = function (lang) {
+    if (lang !== 'pt' && lang !== 'en') return;
+    localStorage.setItem('lang', lang);
+    applyI18n(lang);
+  };
+
+  document.addEventListener('DOMContentLoaded', function () {
+    // IMPORTANT: capture defaults before the first translation
+    captureDefaults();
+    const lang = getLang();
+    applyI18n(lang);
+
+    // Wire up toggle buttons
+    const btnPT = document.getElementById('lang-pt');
+    const btnEN = document.getElementById('lang-en');
+    if (btnPT) btnPT.addEventListener('click', function () { window.setLang('pt'); });
+    if (btnEN) btnEN.addEventListener('click', function () { window.setLang('en'); });
+
+    // Footer year (no inline script, so pages work under a strict CSP)
+    const year = document.getElementById('footer-year');
+    if (year) year.textContent = new Date().getFullYear();
+  });
+})();
@@ -0,0 +1,24 @@
+// Page-level PT-BR dictionary (merged by the base script)
+window.appI18n = window.appI18n || {};
+window.appI18n.pt = Object.assign(window.appI18n.pt || {}, {
+  /* Title */
+  "index.title.part1": "Bem-vindo ao ",
+  "index.title.brand": "Otimizador de Prompt",
+  "index.title.part2": " Web App!",
+
+  /* Lead paragraph */
+  "index.lead.part1": "Selecione um modo abaixo; o app vai ajudar você a criar prompts melhores e ",
+  "index.lead.strong": "otimizar",
+  "index.lead.part2": " sua experiência com o ChatGPT, Claude, Gemini ou qualquer outro sistema de IA baseado na web:",
+
+  /* Buttons */
+  "index.quick_btn": "Modo rápido",
+  "index.interactive_btn": "Modo interativo",
+
+  /* Chrome extension CTA */
+  "index.badge": "NOVO!!",
+  "index.cta.here": "Clique aqui",
+  "index.cta.tail.start": " para baixar e testar a versão beta da ",
+  "index.cta.tail.bold": "extensão do Google Chrome do Prompt Optimizer",
+  "index.cta.tail.end": " e otimizar seus prompts diretamente nos sites oficiais do ChatGPT, Claude ou Gemini."
+});
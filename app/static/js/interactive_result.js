@@ -0,0 +1,62 @@
+// Page-level PT-BR dictionary
+window.appI18n = window.appI18n || {};
+window.appI18n.pt = Object.assign(window.appI18n.pt || {}, {
+  "result.title": "Prompt Otimizado (Interativo):",
+  "result.copy": "Copiar",
+  "result.copied": "Copiado!",
+  "job.pending": "Trabalhando nisso… esta página será atualizada automaticamente.",
+  "job.error": "Erro:",
+  "job.restart": "Começar de novo",
+  "degraded.notice": "O serviço de otimização está indisponível no momento, então este resultado foi gerado a partir de um modelo local mais simples. Tente novamente daqui a pouco para obter um prompt totalmente otimizado.",
+
+  /* Feedback line (split in 3 parts to keep underline on HERE) */
+  "feedback.lead": "💬 Tem um minutinho? ",
+  "feedback.here": "CLIQUE AQUI",
+  "feedback.tail": " e compartilhe seu feedback sobre o aplicativo Prompt Optimizer — prometo que não vai levar nem um minuto 😄"
+});
+
+function pageLang() {
+  return document.documentElement.getAttribute('lang') === 'pt-BR' ? 'pt' : 'en';
+}
+function t(key, fallback) {
+  const dict = (window.appI18n && window.appI18n[pageLang()]) || {};
+  return dict[key] || fallback;
+}
+
+// Language-specific feedback URLs
+const FEEDBACK_LINKS = {
+  en: "https://forms.office.com/e/vM7W04GBxg",
+  pt: "https://forms.office.com/e/sMT70qnPpU"  // <-- Portuguese form
+};
+
+function setFeedbackHref(lang) {
+  const a = document.getElementById('feedbackLink');
+  if (a) a.href = FEEDBACK_LINKS[lang] || FEEDBACK_LINKS.en;
+}
+
+// Copy button logic with i18n labels
+document.addEventListener('DOMContentLoaded', function() {
+  // Set initial link based on current language
+  setFeedbackHref(pageLang());
+
+  // Patch base.html's setLang so changing PT/EN also updates the link
+  const originalSetLang = window.setLang;
+  window.setLang = function(lang) {
+    if (typeof originalSetLang === 'function') originalSetLang(lang);
+    setFeedbackHref(lang);
+  };
+
+  const copyBtn = document.getElementById('copyBtn');
+  const interactivePrompt = document.getElementById('interactivePrompt');
+  if (copyBtn && interactivePrompt) {
+    copyBtn.addEventListener('click', function() {
+      const text = interactivePrompt.innerText;
+      navigator.clipboard.writeText(text)
+        .then(() => {
+          copyBtn.textContent = t('result.copied', 'Copied!');
+          setTimeout(() => { copyBtn.textContent = t('result.copy', 'Copy'); }, 2000);
+        })
+        .catch(err => { console.error('Copy failed', err); });
+    });
+  }
+});
@@ -0,0 +1,39 @@
+// Page-level PT-BR dictionary (merged by the base script)
+window.appI18n = window.appI18n || {};
+window.appI18n.pt = Object.assign(window.appI18n.pt || {}, {
+  "interactive.title": "Otimização de Prompt Interativa",
+
+  "interactive.q1": "1. Qual problema ou desafio está levando você a buscar ajuda de uma IA como o ChatGPT agora?",
+  "interactive.q2": "2. Que papel ou especialidade a IA deve adotar ao responder?",
+  "interactive.q3": "3. Em qual formato ou estilo você quer a resposta?",
+  "interactive.q4": "4. Há restrições, limitações ou algo específico em que devemos focar?",
+  "interactive.q5": "5. Quer acrescentar mais alguma informação sobre sua demanda?",
+
+  "interactive.p1": "Ex.: “Ajude-me a planejar uma viagem à Itália”, “Quero aprender sobre aviões”, “Preciso estruturar meu relatório trimestral”",
+  "interactive.p2": "Ex.: Consultor especialista, redator criativo, analista técnico, professor de história",
+  "interactive.p3": "Ex.: Relatório formal, explicação casual, passo a passo, conteúdo nerd, plano de ação em tópicos (sinta-se livre para combinar formato e estilo)",
+  "interactive.p4": "Ex.: “Só referencie artigos científicos”, “Não mencione política ou religião”, “Limite a 200 palavras”",
+  "interactive.p5": "Qualquer outro detalhe; quanto mais contexto, melhor será o prompt gerado",
+
+  "interactive.next": "Avançar",
+  "interactive.loading": "Carregando…"
+});
+
+// Small helper to fetch translated strings on this page
+function pageLang() {
+  return document.documentElement.getAttribute('lang') === 'pt-BR' ? 'pt' : 'en';
+}
+function t(key, fallback) {
+  const dict = (window.appI18n && window.appI18n[pageLang()]) || {};
+  return dict[key] || fallback;
+}
+
+// Loading animation with i18n text
+document.querySelector('form').addEventListener('submit', function () {
+  const btn = document.getElementById('sendBtn');
+  const spinner = btn.querySelector('.spinner-border');
+  const label   = btn.querySelector('.btn-label');
+  btn.disabled = true;
+  label.textContent = t('interactive.loading', 'Loading…');
+  spinner.classList.remove('d-none');
+});
@@ -0,0 +1,32 @@
+// Page-level PT-BR dictionary (merged/applied by base.html script)
+window.appI18n = window.appI18n || {};
+window.appI18n.pt = Object.assign(window.appI18n.pt || {}, {
+  "interactive2.title": "Otimização de Prompt Interativa",
+  "interactive2.subtitle": "Por favor, responda às perguntas de acompanhamento:",
+  "interactive2.answer_placeholder": "Digite sua resposta aqui",
+  "interactive2.submit": "Enviar",
+  "interactive2.loading": "Carregando…",
+  "job.pending": "Trabalhando nisso… esta página será atualizada automaticamente.",
+  "job.error": "Erro:",
+  "job.restart": "Começar de novo",
+  "degraded.notice": "O serviço de otimização está indisponível no momento, então este resultado foi gerado a partir de um modelo local mais simples. Tente novamente daqui a pouco para obter um prompt totalmente otimizado."
+});
+
+function pageLang() {
+  return document.documentElement.getAttribute('lang') === 'pt-BR' ? 'pt' : 'en';
+}
+function t(key, fallback) {
+  const dict = (window.appI18n && window.appI18n[pageLang()]) || {};
+  return dict[key] || fallback;
+}
+
+// Loading animation with i18n text
+const followupForm = document.querySelector('form');
+if (followupForm) followupForm.addEventListener('submit', function () {
+  const btn = document.getElementById('sendBtn');
+  const spinner = btn.querySelector('.spinner-border');
+  const label = btn.querySelector('.btn-label');
+  btn.disabled = true;
+  label.textContent = t('interactive2.loading', 'Loading…');
+  spinner.classList.remove('d-none');
+});
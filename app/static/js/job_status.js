@@ -0,0 +1,15 @@
+// Polls the background job shown by _job_status.html and reloads once it settles
+(function () {
+  const box = document.getElementById('jobStatus');
+  if (!box || !box.dataset.statusUrl) return;
+  function poll() {
+    fetch(box.dataset.statusUrl, { headers: { 'Accept': 'application/json' } })
+      .then(r => r.ok ? r.json() : { status: 'error' })
+      .then(job => {
+        if (job.status === 'done' || job.status === 'error') window.location.reload();
+        else setTimeout(poll, 1500);
+      })
+      .catch(() => setTimeout(poll, 3000));
+  }
+  setTimeout(poll, 1000);
+})();
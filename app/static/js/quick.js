@@ -0,0 +1,166 @@
+// Page-level PT-BR dictionary (merged by the base script)
+window.appI18n = window.appI18n || {};
+window.appI18n.pt = Object.assign(window.appI18n.pt || {}, {
+  "quick.title": "Otimização de Prompt Rápida",
+  "quick.placeholder": "Digite sua ideia inicial de prompt. Ex.: “Quem foi a Princesa Diana?”, “O que é a internet?”, “O que é Bitcoin?”",
+  "quick.select_tone": "Selecione o tom:",
+  "quick.tone.standard": "Padrão",
+  "quick.tone.technical": "Técnico",
+  "quick.tone.informal": "Informal",
+  "quick.tone.custom": "Quero definir um tom personalizado",
+  "quick.custom_placeholder": "Ex.: “Shakespeare clássico”, “Descritivo”, “Persuasivo”, “Criativo” etc.",
+  "quick.send": "Enviar",
+  "quick.optimized_title": "Prompt Otimizado:",
+  "quick.copy": "Copiar",
+  "quick.copied": "Copiado!",
+  "quick.loading": "Carregando…",
+  "quick.stage.queued": "Na fila…",
+  "quick.stage.connecting": "Conectando ao otimizador…",
+  "quick.stage.calling_tool": "Otimizando seu prompt…",
+  "quick.stage.cache_hit": "Resultado encontrado no cache…",
+  "quick.stage.near_duplicate": "Reaproveitando o resultado de um prompt quase idêntico…",
+  "quick.stage.degraded": "Otimizador indisponível, usando o modelo local…",
+  "degraded.notice": "O serviço de otimização está indisponível no momento, então este resultado foi gerado a partir de um modelo local mais simples. Tente novamente daqui a pouco para obter um prompt totalmente otimizado.",
+
+  /* Feedback line (split in 3 parts to keep underline on HERE) */
+  "feedback.lead": "💬 Tem um minutinho? ",
+  "feedback.here": "CLIQUE AQUI",
+  "feedback.tail": " e compartilhe seu feedback sobre o aplicativo Prompt Optimizer — prometo que não vai levar nem um minuto 😄"
+});
+
+function pageLang() {
+  return document.documentElement.getAttribute('lang') === 'pt-BR' ? 'pt' : 'en';
+}
+function t(key, fallback) {
+  const dict = (window.appI18n && window.appI18n[pageLang()]) || {};
+  return dict[key] || fallback;
+}
+
+// Language-specific feedback URLs
+const FEEDBACK_LINKS = {
+  en: "https://forms.office.com/e/vM7W04GBxg",
+  pt: "https://forms.office.com/e/sMT70qnPpU"  // <-- Portuguese form URL
+};
+function setFeedbackHref(lang) {
+  const a = document.getElementById('feedbackLink');
+  if (a) a.href = FEEDBACK_LINKS[lang] || FEEDBACK_LINKS.en;
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+  const toneSelect = document.getElementById('toneSelect');
+  const customContainer = document.getElementById('customToneContainer');
+  const customInput = document.getElementById('customToneInput');
+
+  // Set initial feedback link based on current language
+  setFeedbackHref(pageLang());
+
+  // Patch base.html's setLang so PT/EN toggle also updates the link
+  const originalSetLang = window.setLang;
+  window.setLang = function(lang) {
+    if (typeof originalSetLang === 'function') originalSetLang(lang);
+    setFeedbackHref(lang);
+  };
+
+  // Show/hide custom-tone box
+  if (toneSelect) {
+    toneSelect.addEventListener('change', function() {
+      if (toneSelect.value === 'Custom') {
+        customContainer.style.display = 'block';
+        customInput.required = true;
+      } else {
+        customContainer.style.display = 'none';
+        customInput.required = false;
+        customInput.value = '';
+      }
+    });
+  }
+
+  // Copy button logic (localized)
+  const copyBtn = document.getElementById('copyBtn');
+  const optimizedPrompt = document.getElementById('optimizedPrompt');
+  if (copyBtn && optimizedPrompt) {
+    copyBtn.addEventListener('click', function() {
+      const text = optimizedPrompt.innerText;
+      navigator.clipboard.writeText(text)
+        .then(() => {
+          copyBtn.textContent = t('quick.copied', 'Copied!');
+          setTimeout(() => { copyBtn.textContent = t('quick.copy', 'Copy'); }, 2000);
+        })
+        .catch(err => { console.error('Copy failed', err); });
+    });
+  }
+});
+
+const STAGE_TEXT = {
+  queued: 'Queued…',
+  connecting: 'Connecting to the optimizer…',
+  calling_tool: 'Optimizing your prompt…',
+  cache_hit: 'Found a cached result…',
+  near_duplicate: 'Reusing the result of a near-identical prompt…',
+  degraded: 'Optimizer unavailable, using the local template…'
+};
+
+function setLoading(loading) {
+  const btn = document.getElementById('sendBtn');
+  const spinner = btn.querySelector('.spinner-border');
+  const label   = btn.querySelector('.btn-label');
+  btn.disabled = loading;
+  label.textContent = loading ? t('quick.loading', 'Loading…') : t('quick.send', 'Send');
+  spinner.classList.toggle('d-none', !loading);
+}
+
+// Apply one SSE event from /quick/stream to the result area
+function applyStreamEvent(name, data) {
+  const status = document.getElementById('streamStatus');
+  const output = document.getElementById('optimizedPrompt');
+  if (name === 'status') {
+    status.textContent = t('quick.stage.' + data.stage, STAGE_TEXT[data.stage] || data.stage);
+    status.classList.remove('d-none');
+  } else if (name === 'progress' && data.message) {
+    status.textContent = data.message;
+    status.classList.remove('d-none');
+  } else if (name === 'result' || name === 'error') {
+    output.textContent = name === 'result' ? data.text : 'Error: ' + data.error;
+    status.classList.add('d-none');
+    document.getElementById('degradedNotice').classList.toggle('d-none', !data.degraded);
+  }
+}
+
+// Stream the result in place; any failure falls back to a normal form post
+async function streamQuick(form) {
+  const resp = await fetch(form.dataset.streamUrl, { method: 'POST', body: new FormData(form) });
+  if (!resp.ok || !resp.body) throw new Error('stream unavailable');
+
+  document.getElementById('optimizedPrompt').textContent = '';
+  document.getElementById('degradedNotice').classList.add('d-none');
+  document.getElementById('resultArea').classList.remove('d-none');
+
+  const reader = resp.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let cut;
+    while ((cut = buffer.indexOf('\n\n')) !== -1) {
+      const frame = buffer.slice(0, cut);
+      buffer = buffer.slice(cut + 2);
+      const name = (frame.match(/^event: (.*)$/m) || [])[1];
+      const data = (frame.match(/^data: (.*)$/m) || [])[1];
+      if (name && data) applyStreamEvent(name, JSON.parse(data));
+    }
+  }
+}
+
+// Loading animation with i18n text
+document.querySelector('form').addEventListener('submit', function(ev) {
+  const form = ev.target;
+  setLoading(true);
+  if (!window.fetch || !window.ReadableStream || !form.dataset.streamUrl) return;
+
+  ev.preventDefault();
+  streamQuick(form)
+    .then(() => setLoading(false))
+    .catch(() => form.submit());
+});
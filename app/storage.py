@@ -0,0 +1,26 @@
+import os
+import stat
+import sqlite3
+
+# ────────────────────────────────────────────────────────────────────────────────
+# SQLite files shared by the workers (result cache, jobs, sessions, rate limits).
+# They hold prompt text and client addresses, so only the app's account may read them.
+_FILE_MODE = 0o600
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+def connect(path: str, timeout: float) -> sqlite3.Connection:
+    """
+    Open `path` in WAL mode in autocommit, creating it owner-only first (SQLite
+    gives its -wal and -shm files the same mode). An existing file that others
+    can read is tightened when it's ours.
+    """
+    os.close(os.open(path, os.O_RDWR | os.O_CREAT, _FILE_MODE))
+    try:
+        if stat.S_IMODE(os.stat(path).st_mode) & 0o077:
+            os.chmod(path, _FILE_MODE)
+    except OSError:
+        pass  # someone else's file: SQLite still decides whether we may use it
+    conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
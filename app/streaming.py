@@ -0,0 +1,46 @@
+import json
+from typing import Iterable, Optional
+from flask import Response
+from .disconnect import ClientWatch
+from .mcp_pool import RequestCancelled
+
+
+def wants_stream(req, payload=None) -> bool:
+    """
+    True when the client asked for a streamed response, via
+    `Accept: text/event-stream`, `?stream=1` or `"stream": true` in the JSON body.
+    """
+    if "text/event-stream" in req.headers.get("Accept", ""):
+        return True
+    if req.args.get("stream", "").lower() in ("1", "true", "yes"):
+        return True
+    return bool(payload and payload.get("stream"))
+
+
+def sse_response(events: Iterable[dict], watch: Optional[ClientWatch] = None) -> Response:
+    """
+    Wrap an iterable of event dicts as a Server-Sent Events response, one
+    `event:`/`data:` frame per item, flushed as soon as it is produced.
+
+    A stream cut short by the client (the server closes it after a failed
+    write, or `events` raises RequestCancelled) is recorded on `watch`.
+    """
+    def frames():
+        try:
+            for event in events:
+                yield f"event: {event['event']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        except RequestCancelled:
+            pass  # `watch` already saw the disconnect
+        except GeneratorExit:
+            if watch is not None:
+                watch.mark()
+            raise
+        finally:
+            if hasattr(events, "close"):
+                events.close()  # cancels the upstream call if it is still running
+
+    return Response(
+        frames(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import tempfile
+from typing import Dict, Optional
+
+from . import metrics
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Tool schema cache tuning (all optional, read from the environment)
+_SCHEMA_PATH_ENV  = "MCP_SCHEMA_PATH"   # JSON snapshot shared by workers and restarts ("" keeps it in memory)
+_SCHEMA_TTL_ENV   = "MCP_SCHEMA_TTL"    # seconds before a snapshot is refreshed in the background
+
+_DEFAULT_PATH     = os.path.join(tempfile.gettempdir(), "prompt-optimizer-mcp-tools.json")
+_DEFAULT_TTL      = 3600
+_SNAPSHOT_FORMAT  = 2                   # bump when the file layout changes (2: one snapshot per server)
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+def _digest(tools: list) -> str:
+    raw = json.dumps(tools, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class ToolSchemaCache:
+    """
+    Each MCP server's tool list, fetched once and reused by every new session
+    on that server.
+
+    A snapshot records the server URL, the version the server reported at
+    handshake and a digest of the tool definitions. Snapshots are kept per
+    server in memory and, unless disabled, in one JSON file so other workers
+    and the next deploy start from them. A snapshot older than the TTL is
+    still served while one background refresh per server replaces it; a server
+    reporting a different version is re-listed before use. Servers never
+    invalidate each other's snapshots.
+    """
+
+    def __init__(self, path: str, ttl: float):
+        self.path       = path
+        self.ttl        = ttl
+        self._snapshots: Dict[str, dict] = {}
+        self._refreshes: Dict[str, asyncio.Future] = {}
+        self.counts     = {"hits": 0, "fetches": 0, "disk_loads": 0, "refreshes": 0,
+                           "version_changes": 0, "errors": 0}
+
+    def _read(self) -> Dict[str, dict]:
+        if not self.path:
+            return {}
+        try:
+            with open(self.path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(stored, dict) or stored.get("format") != _SNAPSHOT_FORMAT:
+            return {}
+        return stored.get("servers") or {}
+
+    def _load(self, server: str) -> Optional[dict]:
+        snapshot = self._read().get(server)
+        if snapshot is not None:
+            self.counts["disk_loads"] += 1
+        return snapshot
+
+    def _save(self, snapshot: dict) -> None:
+        if not self.path:
+            return
+        # merge into what's on disk: other workers may have written other servers meanwhile
+        servers = self._read()
+        servers[snapshot["server"]] = snapshot
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump({"format": _SNAPSHOT_FORMAT, "servers": servers}, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            self.counts["errors"] += 1
+
+    def current(self, server: str, server_version: Optional[str]) -> Optional[dict]:
+        """
+        The snapshot to use for a session on `server`, or None if it has to be
+        listed first (nothing cached for that server, or a new server version).
+        """
+        snapshot = self._snapshots.get(server)
+        if snapshot is None or self.is_stale(snapshot):
+            # another worker may already have a fresher one on disk
+            snapshot = self._load(server) or snapshot
+            if snapshot is not None:
+                self._snapshots[server] = snapshot
+        if snapshot is None:
+            return None
+        if server_version and snapshot.get("server_version") not in (None, server_version):
+            self.counts["version_changes"] += 1
+            del self._snapshots[server]
+            return None
+        self.counts["hits"] += 1
+        return snapshot
+
+    def is_stale(self, snapshot: dict) -> bool:
+        return time.time() - snapshot["fetched"] > self.ttl
+
+    async def fetch(self, session, server: str, server_version: Optional[str]) -> dict:
+        """
+        List the tools over `session` and make that `server`'s current snapshot.
+        """
+        with metrics.stage("mcp_list_tools"):
+            listed = await session.list_tools()
+        tools = [tool.model_dump(mode="json", exclude_none=True) for tool in listed.tools]
+
+        previous = self._snapshots.get(server)
+        snapshot = {
+            "server": server,
+            "server_version": server_version or (previous or {}).get("server_version"),
+            "version": _digest(tools),
+            "fetched": time.time(),
+            "tools": tools,
+        }
+        if previous is not None and previous["version"] != snapshot["version"]:
+            self.counts["version_changes"] += 1
+        self.counts["fetches"] += 1
+        self._snapshots[server] = snapshot
+        self._save(snapshot)
+        return snapshot
+
+    def refresh_in_background(self, session, server: str, server_version: Optional[str]) -> None:
+        """
+        Re-list `server`'s tools over `session` without holding up the caller;
+        at most one refresh per server runs at a time. Must be called on the
+        background loop.
+        """
+        running = self._refreshes.get(server)
+        if running is not None and not running.done():
+            return
+        self.counts["refreshes"] += 1
+
+        async def refresh() -> None:
+            try:
+                await self.fetch(session, server, server_version)
+            except Exception:
+                self.counts["errors"] += 1  # keep serving the old snapshot; retried on the next session
+
+        self._refreshes[server] = asyncio.ensure_future(refresh())
+
+    def stats(self) -> dict:
+        now = time.time()
+        return {
+            **self.counts,
+            "ttl": self.ttl,
+            "servers": {
+                server: {
+                    "version": snapshot["version"],
+                    "server_version": snapshot.get("server_version"),
+                    "tools": [tool["name"] for tool in snapshot["tools"]],
+                    "age_seconds": round(now - snapshot["fetched"], 1),
+                }
+                for server, snapshot in self._snapshots.items()
+            },
+        }
+
+
+_schemas: Optional[ToolSchemaCache] = None
+
+
+def get_tool_schemas() -> ToolSchemaCache:
+    """
+    Return the process-wide tool schema cache.
+    """
+    global _schemas
+    if _schemas is None:
+        _schemas = ToolSchemaCache(
+            path=os.getenv(_SCHEMA_PATH_ENV, _DEFAULT_PATH),
+            ttl=float(os.getenv(_SCHEMA_TTL_ENV, _DEFAULT_TTL)),
+        )
+    return _schemas
@@ -0,0 +1,450 @@
+import os
+import re
+import json
+import time
+import heapq
+import queue
+import atexit
+import asyncio
+import secrets
+import tempfile
+import itertools
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Request tracing (all optional, read from the environment)
+_TRACING_ENV       = "TRACING_ENABLED"          # "0" records no traces at all
+_BUFFER_ENV        = "TRACE_BUFFER_SIZE"        # most recent traces kept per worker for /debug/traces
+_SLOWEST_ENV       = "TRACE_SLOWEST"            # slowest traces kept per worker, on top of the recent ones
+_EXPORT_PATH_ENV   = "TRACE_EXPORT_PATH"        # JSON-lines file in OTLP/JSON shape ("" exports nothing)
+_EXPORT_MAX_ENV    = "TRACE_EXPORT_MAX_BYTES"   # the file is rotated to <path>.1 beyond this size
+
+_DEFAULT_BUFFER      = 200
+_DEFAULT_SLOWEST     = 20
+_DEFAULT_EXPORT_PATH = os.path.join(tempfile.gettempdir(), "prompt-optimizer-traces.jsonl")
+_DEFAULT_EXPORT_MAX  = 50 * 1024 * 1024
+_MAX_SPANS           = 500    # per trace; a runaway batch doesn't grow one without bound
+_SERVICE_NAME        = "prompt-optimizer-web-app"
+_TRACEPARENT         = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+_SPAN_KINDS          = {"internal": 1, "server": 2, "client": 3}
+
+# blueprints (or endpoints) whose requests aren't traced
+_UNTRACED = {"static", "assets", "ops", "debug"}
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+class Span:
+    """
+    One timed operation within a trace. Attributes are plain str/int/float/bool.
+    """
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], kind: str = "internal",
+                 attributes: Optional[dict] = None):
+        self.trace      = trace
+        self.span_id    = secrets.token_hex(8)
+        self.parent_id  = parent_id
+        self.name       = name
+        self.kind       = kind
+        self.start_ns   = time.time_ns()
+        self.end_ns     = None
+        self.attributes = dict(attributes or {})
+        self.error      = None
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+
+class Trace:
+    """
+    The spans recorded for one request (or background job), root first.
+    """
+
+    def __init__(self, trace_id: str, name: str, remote_parent: Optional[str] = None, kind: str = "server"):
+        self.trace_id = trace_id
+        self.dropped  = 0
+        self.root     = Span(self, name, remote_parent, kind)
+        self.spans    = [self.root]
+
+    def add(self, span: Span) -> None:
+        if len(self.spans) < _MAX_SPANS:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+
+    @property
+    def duration_ms(self) -> float:
+        return self.root.duration_ms
+
+    def summary(self) -> dict:
+        start = self.root.start_ns / 1e9
+        return {"trace_id": self.trace_id, "name": self.root.name, "start": start,
+                "started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(start)),
+                "duration_ms": round(self.duration_ms, 1), "spans": len(self.spans),
+                "status": self.root.attributes.get("http.status_code"),
+                "error": self.root.error or next((s.error for s in self.spans if s.error), None)}
+
+    def waterfall(self) -> List[dict]:
+        """
+        Spans in start order, each with its depth and offset/width as a share
+        of the whole trace (for the /debug/traces view).
+        """
+        start, total = self.root.start_ns, max(1, (self.root.end_ns or time.time_ns()) - self.root.start_ns)
+        depth = {self.root.parent_id: -1}
+        rows = []
+        for span in sorted(self.spans, key=lambda s: s.start_ns):
+            depth[span.span_id] = depth.get(span.parent_id, 0) + 1
+            rows.append({"name": span.name, "kind": span.kind, "depth": depth[span.span_id],
+                         "offset_ms": round((span.start_ns - start) / 1e6, 1),
+                         "duration_ms": round(span.duration_ms, 1),
+                         "left": round(100 * (span.start_ns - start) / total, 2),
+                         "width": max(0.2, round(100 * ((span.end_ns or time.time_ns()) - span.start_ns) / total, 2)),
+                         "attributes": span.attributes, "error": span.error})
+        return rows
+
+    def to_otlp(self) -> dict:
+        """
+        The trace as one OTLP/JSON ExportTraceServiceRequest.
+        """
+        spans = []
+        for span in self.spans:
+            spans.append({
+                "traceId": self.trace_id, "spanId": span.span_id, "parentSpanId": span.parent_id or "",
+                "name": span.name, "kind": _SPAN_KINDS.get(span.kind, 1),
+                "startTimeUnixNano": str(span.start_ns), "endTimeUnixNano": str(span.end_ns or span.start_ns),
+                "attributes": _otlp_attributes(span.attributes),
+                "status": {"code": 2, "message": span.error} if span.error else {"code": 0},
+            })
+        resource = {"service.name": _SERVICE_NAME, "process.pid": os.getpid()}
+        if self.dropped:
+            resource["trace.dropped_spans"] = self.dropped
+        return {"resourceSpans": [{"resource": {"attributes": _otlp_attributes(resource)},
+                                   "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}]}]}
+
+
+def _otlp_attributes(attributes: dict) -> List[dict]:
+    encoded = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            encoded.append({"key": key, "value": {"boolValue": value}})
+        elif isinstance(value, int):
+            encoded.append({"key": key, "value": {"intValue": str(value)}})
+        elif isinstance(value, float):
+            encoded.append({"key": key, "value": {"doubleValue": value}})
+        else:
+            encoded.append({"key": key, "value": {"stringValue": str(value)}})
+    return encoded
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# The span in progress; asyncio tasks inherit it from whoever created them
+_current: ContextVar[Optional[Span]] = ContextVar("trace_span", default=None)
+
+
+def enabled() -> bool:
+    return os.getenv(_TRACING_ENV, "1") != "0"
+
+
+def current() -> Optional[Span]:
+    return _current.get()
+
+
+def traceparent(span: Optional[Span] = None) -> Optional[str]:
+    """
+    W3C traceparent header value for `span` (default: the current one).
+    """
+    span = span or _current.get()
+    return None if span is None else f"00-{span.trace.trace_id}-{span.span_id}-01"
+
+
+def start_trace(name: str, parent: Optional[str] = None, kind: str = "server", **attributes) -> Optional[Span]:
+    """
+    Begin a new trace and make its root span current. `parent` is an incoming
+    traceparent header, whose trace id is then continued. None when tracing
+    is off.
+    """
+    if not enabled():
+        return None
+    match = _TRACEPARENT.match(parent or "")
+    trace = Trace(match.group(1) if match else secrets.token_hex(16), name,
+                  match.group(2) if match else None, kind)
+    trace.root.set(**attributes)
+    _current.set(trace.root)
+    return trace.root
+
+
+def finish_trace(root: Optional[Span]) -> None:
+    """
+    End the trace begun by start_trace() and hand it to the buffer and exporter.
+    """
+    if root is None or root.end_ns is not None:
+        return
+    root.end()
+    get_store().add(root.trace)
+
+
+def _describe(error: BaseException) -> str:
+    if isinstance(error, asyncio.CancelledError):
+        return "cancelled"
+    return f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes):
+    """
+    Record a child of the current span for the duration of the block (a no-op
+    outside a trace). Yields the span, or None.
+    """
+    parent = _current.get()
+    if parent is None or parent.trace.root.end_ns is not None:
+        # no trace, or a background task outliving the request that started it
+        yield None
+        return
+    child = Span(parent.trace, name, parent.span_id, kind, attributes)
+    parent.trace.add(child)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = _describe(e)
+        raise
+    finally:
+        child.end()
+        _current.reset(token)
+
+
+def annotate(**attributes) -> None:
+    """
+    Add attributes to the current span, if any.
+    """
+    current_span = _current.get()
+    if current_span is not None:
+        current_span.set(**attributes)
+
+
+def fail(error: BaseException) -> None:
+    """
+    Mark the current span as failed without leaving it.
+    """
+    current_span = _current.get()
+    if current_span is not None:
+        current_span.error = _describe(error)
+
+
+async def carry(coro, parent: Optional[Span]):
+    """
+    Await `coro` with `parent` as the current span. run_coroutine_threadsafe
+    already runs it in a copy of the submitting thread's context (the copy is
+    made by call_soon_threadsafe), so this only pins the span captured at
+    submission instead of relying on that detail.
+    """
+    if parent is not None:
+        _current.set(parent)
+    return await coro
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Finished traces: in memory for /debug/traces, and on disk for other tools
+
+class TraceStore:
+    """
+    The last `size` traces plus the `slowest` slowest seen since the worker
+    started, so a rare 40-second request stays visible after the ring has
+    moved on. Finished traces are also queued for the exporter.
+    """
+
+    def __init__(self, size: int = _DEFAULT_BUFFER, slowest: int = _DEFAULT_SLOWEST,
+                 exporter: Optional["_Exporter"] = None):
+        self.slowest   = max(0, slowest)
+        self.exporter  = exporter
+        self._recent   = deque(maxlen=max(1, size))
+        self._slow     = []   # min-heap of (duration, seq, trace)
+        self._seq      = itertools.count()
+        self._lock     = threading.Lock()
+        self.counts    = {"recorded": 0, "exported": 0}
+
+    def add(self, trace: Trace) -> None:
+        with self._lock:
+            self._recent.append(trace)
+            self.counts["recorded"] += 1
+            if self.slowest:
+                item = (trace.duration_ms, next(self._seq), trace)
+                if len(self._slow) < self.slowest:
+                    heapq.heappush(self._slow, item)
+                elif item[0] > self._slow[0][0]:
+                    heapq.heapreplace(self._slow, item)
+        if self.exporter is not None:
+            self.exporter.put(trace)
+            self.counts["exported"] += 1
+
+    def recent(self) -> List[Trace]:
+        with self._lock:
+            return list(reversed(self._recent))
+
+    def slowest_traces(self) -> List[Trace]:
+        with self._lock:
+            return [trace for _, _, trace in sorted(self._slow, reverse=True)]
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        with self._lock:
+            for trace in itertools.chain(reversed(self._recent), (t for _, _, t in self._slow)):
+                if trace.trace_id == trace_id:
+                    return trace
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.counts, "buffered": len(self._recent), "slowest_kept": len(self._slow),
+                    "export_path": self.exporter.path if self.exporter else None}
+
+
+class _Exporter:
+    """
+    Appends finished traces to a JSON-lines file from a background thread,
+    one OTLP/JSON ExportTraceServiceRequest per line. Every worker appends to
+    the same file; a line is written with a single O_APPEND write, so lines
+    from different workers never interleave.
+    """
+
+    def __init__(self, path: str, max_bytes: int = _DEFAULT_EXPORT_MAX):
+        self.path      = path
+        self.max_bytes = max_bytes
+        self._queue    = queue.SimpleQueue()
+        self._thread   = None
+        self._pid      = None
+
+    def put(self, trace: Trace) -> None:
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._write_forever, name="trace-export", daemon=True)
+            self._thread.start()
+            atexit.register(self._queue.put, None)
+        self._queue.put(trace)
+
+    def _write_forever(self) -> None:
+        while True:
+            trace = self._queue.get()
+            if trace is None:
+                return
+            try:
+                self._write((json.dumps(trace.to_otlp(), separators=(",", ":"), default=str) + "\n").encode("utf-8"))
+            except OSError:
+                pass  # a full disk mustn't take the worker down; the in-memory buffer still has it
+
+    def _write(self, line: bytes) -> None:
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, line)
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        if size > self.max_bytes:
+            try:
+                os.replace(self.path, self.path + ".1")
+            except OSError:
+                pass
+
+
+_store: Optional[TraceStore] = None
+
+
+def get_store() -> TraceStore:
+    """
+    Return this process's trace buffer.
+    """
+    global _store
+    if _store is None:
+        path = os.getenv(_EXPORT_PATH_ENV, _DEFAULT_EXPORT_PATH)
+        _store = TraceStore(
+            size=int(os.getenv(_BUFFER_ENV, _DEFAULT_BUFFER)),
+            slowest=int(os.getenv(_SLOWEST_ENV, _DEFAULT_SLOWEST)),
+            exporter=_Exporter(path, int(os.getenv(_EXPORT_MAX_ENV, _DEFAULT_EXPORT_MAX))) if path else None,
+        )
+    return _store
+
+
+def http_client(**kwargs):
+    """
+    httpx.AsyncClient whose requests are recorded as client spans, with their
+    payload sizes, and carry the traceparent header upstream.
+    """
+    import httpx
+
+    class _TracedTransport(httpx.AsyncBaseTransport):
+        def __init__(self, inner: httpx.AsyncBaseTransport):
+            self._inner = inner
+
+        async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+            with span(f"{request.method} {request.url.host}{request.url.path}", kind="client",
+                      **{"http.request_bytes": int(request.headers.get("content-length", 0))}) as current_span:
+                header = traceparent()
+                if header is not None:
+                    request.headers["traceparent"] = header
+                response = await self._inner.handle_async_request(request)
+                if current_span is not None:
+                    current_span.set(**{"http.status_code": response.status_code,
+                                        "http.response_bytes": int(response.headers.get("content-length", 0))})
+                return response
+
+        async def aclose(self) -> None:
+            await self._inner.aclose()
+
+    limits = kwargs.pop("limits", None) or httpx.Limits(max_connections=100, max_keepalive_connections=20)
+    return httpx.AsyncClient(transport=_TracedTransport(httpx.AsyncHTTPTransport(limits=limits)), **kwargs)
+
+
+def init_app(app) -> None:
+    """
+    Give every page and API request a trace: the root span starts before the
+    view and ends once the response has been sent (so streamed responses are
+    covered to their last event). The trace id comes back in X-Trace-Id.
+    """
+    from flask import g, request
+
+    if not enabled():
+        return
+
+    @app.before_request
+    def _start_trace():
+        if (request.blueprint or request.endpoint) in _UNTRACED:
+            return
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        g._trace_root = start_trace(
+            f"{request.method} {route}", request.headers.get("traceparent"),
+            **{"http.method": request.method, "http.route": route,
+               "http.request_bytes": request.content_length or 0},
+        )
+
+    @app.after_request
+    def _end_trace(response):
+        root = g.pop("_trace_root", None)
+        if root is None:
+            return response
+        root.set(**{"http.status_code": response.status_code})
+        if not response.is_streamed:
+            root.set(**{"http.response_bytes": response.calculate_content_length() or 0})
+        response.headers["X-Trace-Id"] = root.trace.trace_id
+        response.call_on_close(lambda: finish_trace(root))
+        return response
+
+    @app.teardown_request
+    def _record_error(exc: Optional[BaseException]):
+        root = g.pop("_trace_root", None)  # still here: after_request never ran
+        if root is not None:
+            if exc is not None:
+                root.error = _describe(exc)
+            finish_trace(root)
+        _current.set(None)
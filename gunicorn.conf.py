@@ -0,0 +1,102 @@
+"""
+Production gunicorn settings, picked up automatically by `gunicorn run:app`.
+
+Upstream work (MCP + Groq) runs on each worker's background event loop, but a
+request still holds one of the worker's `threads` until its answer is ready:
+a synchronous view, an SSE stream or a batch each park a thread on a future.
+So the real ceiling is `workers * threads` open requests (256 by default),
+not thousands. What keeps slow upstreams from starving `/`, `/privacy` and
+static files is admission control (app/admission.py): per worker at most
+UPSTREAM_MAX_CONCURRENCY calls run and UPSTREAM_MAX_QUEUE wait, the rest get
+a fast 503. With the defaults (16 + 64) that caps the threads parked on
+upstream calls at 80 of 128, but only for requests that own a call: followers
+coalesced onto another request's call and SSE streams still writing hold
+threads outside that count, so pages are likely, not guaranteed, to find one
+free. Interactive steps run as background jobs and hold no thread while they
+wait. Serving far more concurrent pending requests would need an
+async worker or an ASGI entry point, which this app doesn't have.
+"""
+import os
+
+bind         = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+workers      = int(os.environ.get("WEB_CONCURRENCY", 2))
+worker_class = "gthread"
+threads      = int(os.environ.get("GUNICORN_THREADS", 128))
+
+# gthread heartbeats independently of requests, so this only reaps hung workers;
+# keep it above MCP_READ_TIMEOUT / UPSTREAM_TIMEOUT (300s by default)
+timeout          = int(os.environ.get("GUNICORN_TIMEOUT", 330))
+graceful_timeout = 30
+keepalive        = 5
+
+# recycle workers now and then to cap slow leaks, staggered so they don't restart together
+max_requests        = int(os.environ.get("GUNICORN_MAX_REQUESTS", 5000))
+max_requests_jitter = 500
+
+accesslog = "-"
+errorlog  = "-"
+
+# The app itself imports the agent stack (agno, groq, mcp) lazily; by default the
+# master imports it once up front so forked and recycled workers inherit it
+# copy-on-write instead of paying ~1s on their first upstream call
+_PRELOAD_AGENT_STACK = os.environ.get("PRELOAD_AGENT_STACK", "1") == "1"
+
+# Each worker connects to the MCP server and loads tool schemas before taking traffic
+_WARMUP_SESSIONS = int(os.environ.get("MCP_WARMUP_SESSIONS", 1))    # "0" skips warm-up
+_WARMUP_TIMEOUT  = float(os.environ.get("MCP_WARMUP_TIMEOUT", 10))  # seconds before serving anyway
+
+
+def on_starting(server):
+    # drop per-worker metric snapshots left over from a previous run
+    from app.metrics import registry
+    registry.reset_directory()
+
+    if _PRELOAD_AGENT_STACK:
+        from app.agno_agent import preload
+        preload()
+
+
+def when_ready(server):
+    # a worker whose threads can all be parked on upstream calls has none left for pages
+    upstream = int(os.environ.get("UPSTREAM_MAX_CONCURRENCY", 16)) + int(os.environ.get("UPSTREAM_MAX_QUEUE", 64))
+    server.log.info("Capacity: %d workers x %d threads = %d open requests; up to %d per worker wait on the upstream",
+                    workers, threads, workers * threads, upstream)
+    if upstream >= threads:
+        server.log.warning("UPSTREAM_MAX_CONCURRENCY + UPSTREAM_MAX_QUEUE (%d) >= GUNICORN_THREADS (%d): "
+                           "slow upstream calls can take every thread and starve the pages", upstream, threads)
+
+
+def post_worker_init(worker):
+    if _WARMUP_SESSIONS <= 0:
+        return
+    from app.agno_agent import warm_up
+    try:
+        warm_up(_WARMUP_SESSIONS, timeout=_WARMUP_TIMEOUT)
+    except Exception as e:
+        # never block startup on the upstream; the first request will connect instead
+        worker.log.warning("MCP warm-up did not finish: %s", e or type(e).__name__)
+
+
+def worker_exit(server, worker):
+    # close pooled MCP sessions cleanly instead of dropping the SSE connections
+    from app import mcp_pool
+    try:
+        mcp_pool.shutdown(timeout=5)
+    except Exception:
+        pass
+
+    # last snapshot, so child_exit folds in everything this worker counted
+    from app.metrics import registry
+    try:
+        registry.flush()
+    except OSError:
+        pass
+
+
+def child_exit(server, worker):
+    # fold the exited worker's counters into the aggregate file and drop its own
+    from app.metrics import registry
+    try:
+        registry.retire(worker.pid)
+    except OSError:
+        pass
@@ -4,4 +4,10 @@ from app import create_app
 app = create_app()
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=int(os.environ.get('PORT', 8000)))
+    # development server only; production runs `gunicorn run:app` (see gunicorn.conf.py)
+    app.run(
+        debug=os.environ.get('FLASK_DEBUG', '1') == '1',
+        threaded=True,
+        host='0.0.0.0',
+        port=int(os.environ.get('PORT', 8000))
+    )
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for Groq's OpenAI-compatible chat completions endpoint.
+
+Point the app at it with GROQ_BASE_URL=http://127.0.0.1:8766 (any GROQ_API_KEY).
+Behaves like a well-mannered tool-calling model: the first turn calls the
+requested (or first) tool with the user's message as its only string argument,
+and the turn after the tool result echoes that result back.
+
+    python tests/bench/fake_groq_server.py --port 8766 --latency 0.3 --jitter 0.1
+"""
+import json
+import time
+import random
+import asyncio
+import argparse
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+def _tokens(messages) -> int:
+    # rough enough for benchmarking: ~4 characters per token
+    return max(1, sum(len(json.dumps(m)) for m in messages) // 4)
+
+
+def _pick_tool(body: dict):
+    tools = body.get("tools") or []
+    choice = body.get("tool_choice")
+    if isinstance(choice, dict):
+        wanted = choice.get("function", {}).get("name")
+        tools = [t for t in tools if t["function"]["name"] == wanted] or tools
+    return tools[0]["function"] if tools else None
+
+
+def build_app(latency: float, jitter: float) -> Starlette:
+    async def completions(request: Request) -> JSONResponse:
+        body = await request.json()
+        messages = body.get("messages", [])
+        await asyncio.sleep(max(0.0, random.gauss(latency, jitter)))
+
+        tool = _pick_tool(body)
+        last = messages[-1] if messages else {}
+        message = {"role": "assistant", "content": None}
+        finish_reason = "stop"
+
+        if last.get("role") == "tool" or tool is None or body.get("tool_choice") == "none":
+            message["content"] = last.get("content") or ""
+        else:
+            properties = tool.get("parameters", {}).get("properties", {}) or {"input": {}}
+            argument = next(iter(properties))
+            message["tool_calls"] = [{
+                "id": f"call_{random.getrandbits(32):08x}",
+                "type": "function",
+                "function": {"name": tool["name"], "arguments": json.dumps({argument: last.get("content") or ""})},
+            }]
+            finish_reason = "tool_calls"
+
+        prompt_tokens = _tokens(messages) + _tokens(body.get("tools") or [])
+        completion_tokens = _tokens([message])
+        return JSONResponse({
+            "id": f"chatcmpl-{random.getrandbits(48):012x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+    return Starlette(routes=[Route("/openai/v1/chat/completions", completions, methods=["POST"])])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.3, help="mean inference latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="std-dev of the inference latency in seconds")
+    args = parser.parse_args()
+
+    # workers=1 explicitly: uvicorn would otherwise honour WEB_CONCURRENCY meant for gunicorn
+    uvicorn.run(build_app(args.latency, args.jitter), host="127.0.0.1", port=args.port, workers=1, log_level="warning")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Hugging Face prompt-optimizer MCP server.
+
+Exposes the three prompt-optimizer tools over SSE (at /sse) with a configurable
+latency and jitter, and returns deterministic canned answers, so benchmarks can
+run offline:
+
+    python tests/bench/fake_mcp_server.py --port 8765 --latency 0.8 --jitter 0.2
+"""
+import random
+import asyncio
+import argparse
+
+from mcp.server.fastmcp import FastMCP
+
+
+def build_server(port: int, latency: float, jitter: float) -> FastMCP:
+    server = FastMCP("fake-prompt-optimizer", host="127.0.0.1", port=port, log_level="WARNING")
+
+    async def simulate_work() -> None:
+        await asyncio.sleep(max(0.0, random.gauss(latency, jitter)))
+
+    @server.tool()
+    async def prompt_optimizer_mcp_server_one_shot_optimization(initial_prompt: str) -> str:
+        """Optimize a single initial prompt in one shot."""
+        await simulate_work()
+        return (
+            "You are an expert assistant. Task: " + initial_prompt.strip() +
+            "\nRespond with a clear, structured answer and state any assumptions."
+        )
+
+    @server.tool()
+    async def prompt_optimizer_mcp_server_five_questions_analysis_and_followup_generation(questions_and_answers: str) -> str:
+        """Analyse five questions and answers and generate three follow-up questions."""
+        await simulate_work()
+        return (
+            "1. Who is the intended audience for the answer?\n"
+            "2. How long should the response be?\n"
+            "3. Are there examples of the result you like?"
+        )
+
+    @server.tool()
+    async def prompt_optimizer_mcp_server_eight_questions_analysis_and_prompt_generation(questions_and_answers: str) -> str:
+        """Analyse eight questions and answers and generate a final prompt."""
+        await simulate_work()
+        answered = questions_and_answers.count("Answer:")
+        return f"Act as the expert described below. Use all {answered} answers to shape the response.\n" + questions_and_answers[:400]
+
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="mean tool latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="std-dev of the tool latency in seconds")
+    args = parser.parse_args()
+
+    build_server(args.port, args.latency, args.jitter).run(transport="sse")
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Offline load test for the web app.
+
+Drives /optimize, /quick and the interactive flow at fixed concurrency levels
+and reports throughput and p50/p95/p99 latency per scenario. With --spawn it
+starts the fake MCP and Groq servers plus a gunicorn instance wired to them,
+so nothing leaves the machine:
+
+    python tests/bench/load_test.py --spawn --concurrency 1 8 32
+    python tests/bench/load_test.py --spawn --dispatch agent --json bench.json
+    python tests/bench/load_test.py --spawn --dispatch agent --tool-scoping off   # whole toolkit per run
+    python tests/bench/load_test.py --spawn --mcp-replicas 3   # balance across three MCP servers
+    python tests/bench/load_test.py --spawn --baseline bench.json   # exit 1 on p95 regression
+    python tests/bench/load_test.py --target http://localhost:8000 --scenarios optimize
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import argparse
+import tempfile
+import subprocess
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# the app only serves /metrics with a token; --spawn hands this one to gunicorn
+OPS_TOKEN = os.environ.get("OPS_TOKEN") or uuid.uuid4().hex
+
+PROMPTS = [
+    "Explain how vaccines train the immune system",
+    "Write a cover letter for a junior data analyst role",
+    "Plan a 5-day trip to Lisbon on a budget",
+    "Summarize the causes of the French Revolution",
+]
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# HTTP helpers (stdlib only)
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+def _opener():
+    return urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()), _NoRedirect())
+
+
+def _send(opener, url, data=None, json_body=None, timeout=330, headers=None):
+    headers = dict(headers or {})
+    if json_body is not None:
+        data = json.dumps(json_body).encode()
+        headers["Content-Type"] = "application/json"
+    elif data is not None:
+        data = urllib.parse.urlencode(data, doseq=True).encode()
+    request = urllib.request.Request(url, data=data, headers=headers)
+    try:
+        with opener.open(request, timeout=timeout) as resp:
+            return resp.status, dict(resp.headers), resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), e.read()
+
+
+def _wait_for_job(opener, base, location, deadline):
+    job_id = location.rstrip("/").rsplit("/", 1)[1]
+    while time.monotonic() < deadline:
+        status, _, body = _send(opener, f"{base}/jobs/{job_id}")
+        if status != 200:
+            raise RuntimeError(f"job poll returned {status}")
+        job = json.loads(body)
+        if job["status"] == "done":
+            return job["result"]
+        if job["status"] == "error":
+            raise RuntimeError(job.get("error", "job failed"))
+        time.sleep(0.1)
+    raise TimeoutError("job did not finish in time")
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Scenarios: each performs one complete user interaction and raises on failure
+def scenario_optimize(base, prompt):
+    status, _, body = _send(_opener(), f"{base}/optimize", json_body={"prompt": prompt})
+    if status != 200 or "optimized_prompt" not in json.loads(body):
+        raise RuntimeError(f"/optimize returned {status}")
+
+
+def scenario_quick(base, prompt):
+    status, _, body = _send(_opener(), f"{base}/quick", data={"user_input": prompt, "tone": "Technical"})
+    if status != 200 or b">Error: " in body:
+        raise RuntimeError(f"/quick returned {status}")
+
+
+def scenario_interactive(base, prompt):
+    opener = _opener()
+    deadline = time.monotonic() + 330
+    answers = {f"q{i}": f"{prompt} (answer {i})" for i in range(1, 6)}
+    status, headers, _ = _send(opener, f"{base}/interactive", data=answers)
+    if status != 303:
+        raise RuntimeError(f"/interactive returned {status}")
+    raw = _wait_for_job(opener, base, headers["Location"], deadline)
+
+    questions = [line.split(".", 1)[1].strip() for line in raw.splitlines() if line[:1].isdigit()][:3]
+    status, headers, _ = _send(opener, f"{base}/interactive/followup", data={
+        "follow_q": questions, "follow_a": [f"{prompt} (follow-up {i})" for i in range(len(questions))],
+    })
+    if status != 303:
+        raise RuntimeError(f"/interactive/followup returned {status}")
+    _wait_for_job(opener, base, headers["Location"], deadline)
+
+
+SCENARIOS = {
+    "optimize": scenario_optimize,
+    "quick": scenario_quick,
+    "interactive": scenario_interactive,
+}
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Measurement
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_level(base, name, concurrency, total, repeat_ratio):
+    run_id = uuid.uuid4().hex[:8]
+    repeated = int(total * repeat_ratio)
+
+    def one(i):
+        prompt = PROMPTS[i % len(PROMPTS)]
+        if i >= repeated:
+            prompt = f"{prompt} [{run_id}-{i}]"  # unique, defeats the result cache
+        started = time.perf_counter()
+        try:
+            SCENARIOS[name](base, prompt)
+            return time.perf_counter() - started, None
+        except Exception as e:
+            return time.perf_counter() - started, f"{type(e).__name__}: {e}"
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(t for t, err in outcomes if err is None)
+    errors = [err for _, err in outcomes if err is not None]
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+def print_table(rows):
+    header = f"{'scenario':<12} {'conc':>5} {'reqs':>6} {'errs':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(f"{r['scenario']:<12} {r['concurrency']:>5} {r['requests']:>6} {r['errors']:>5} "
+              f"{r['throughput_rps']:>8} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9}")
+        if r["first_error"]:
+            print(f"    first error: {r['first_error']}")
+
+
+def scrape_agent_metrics(base):
+    """
+    Per-tool LLM tokens and model time from /metrics (agent dispatch only).
+    """
+    status, _, body = _send(_opener(), f"{base}/metrics", headers={"Authorization": f"Bearer {OPS_TOKEN}"})
+    per_tool = {}
+    if status != 200:
+        return per_tool
+    for line in body.decode().splitlines():
+        if line.startswith("agent_tokens_total{"):
+            labels, value = line[len("agent_tokens_total{"):].rsplit("} ", 1)
+            fields = dict(part.split("=", 1) for part in labels.split(","))
+            tool = fields["tool"].strip('"')
+            per_tool.setdefault(tool, {})[f"{fields['direction'].strip(chr(34))}_tokens"] = float(value)
+        elif line.startswith(("agent_inference_duration_seconds_sum{", "agent_inference_duration_seconds_count{")):
+            name, rest = line.split("{", 1)
+            labels, value = rest.rsplit("} ", 1)
+            tool = labels.split("=", 1)[1].strip('"')
+            per_tool.setdefault(tool, {})["runs" if name.endswith("_count") else "inference_seconds"] = float(value)
+
+    for tool, row in per_tool.items():
+        runs = row.get("runs") or 0
+        if runs:
+            row["input_tokens_per_run"] = round(row.get("input_tokens", 0) / runs, 1)
+            row["output_tokens_per_run"] = round(row.get("output_tokens", 0) / runs, 1)
+            row["inference_ms_per_run"] = round(row.get("inference_seconds", 0) / runs * 1000, 1)
+    return per_tool
+
+
+def compare_to_baseline(rows, baseline_path, max_regression):
+    with open(baseline_path) as f:
+        baseline = {(r["scenario"], r["concurrency"]): r for r in json.load(f)["results"]}
+
+    regressions = []
+    for r in rows:
+        before = baseline.get((r["scenario"], r["concurrency"]))
+        if before and before["p95_ms"] and r["p95_ms"] > before["p95_ms"] * (1 + max_regression):
+            regressions.append(f"{r['scenario']} @ {r['concurrency']}: p95 {before['p95_ms']} ms -> {r['p95_ms']} ms")
+    return regressions
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Local stack (fake upstreams + gunicorn)
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_port(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise TimeoutError(f"nothing listening on port {port}")
+
+
+def spawn_stack(args, procs):
+    """
+    Start the fake upstreams and gunicorn; every process started is appended to
+    `procs` so the caller can stop them even if startup fails halfway.
+    """
+    mcp_ports = [_free_port() for _ in range(max(1, getattr(args, "mcp_replicas", 1)))]
+    groq_port, app_port = _free_port(), _free_port()
+    state_dir = tempfile.mkdtemp(prefix="prompt-optimizer-bench-")
+    env = {
+        **os.environ,
+        "MCP_SSE_URLS": ",".join(f"http://127.0.0.1:{port}/sse" for port in mcp_ports),
+        "GROQ_BASE_URL": f"http://127.0.0.1:{groq_port}",
+        "GROQ_API_KEY": os.environ.get("GROQ_API_KEY", "bench-fake-key"),
+        "AGENT_DISPATCH_MODE": args.dispatch,
+        "AGENT_TOOL_SCOPING": "1" if args.tool_scoping == "on" else "0",
+        "RESULT_CACHE_PATH": os.path.join(state_dir, "cache.sqlite3"),
+        "JOB_STORE_PATH": os.path.join(state_dir, "jobs.sqlite3"),
+        "MCP_SCHEMA_PATH": os.path.join(state_dir, "mcp-tools.json"),
+        "METRICS_DIR": os.path.join(state_dir, "metrics"),
+        "OPS_TOKEN": OPS_TOKEN,
+        "WEB_CONCURRENCY": str(args.workers),
+        # every simulated user shares 127.0.0.1, so per-client rate limiting would only measure itself
+        "RATE_LIMIT_PER_MINUTE": "0",
+    }
+    for mcp_port in mcp_ports:
+        procs.append(subprocess.Popen([sys.executable, os.path.join(BENCH_DIR, "fake_mcp_server.py"), "--port", str(mcp_port),
+                                       "--latency", str(args.mcp_latency), "--jitter", str(args.mcp_jitter)], env=env))
+    procs.append(subprocess.Popen([sys.executable, os.path.join(BENCH_DIR, "fake_groq_server.py"), "--port", str(groq_port),
+                                   "--latency", str(args.groq_latency), "--jitter", str(args.groq_jitter)], env=env))
+    for mcp_port in mcp_ports:
+        _wait_for_port(mcp_port)
+    _wait_for_port(groq_port)
+    procs.append(subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "run:app", "--bind", f"127.0.0.1:{app_port}", "--access-logfile", "/dev/null"],
+        cwd=REPO_ROOT, env=env,
+    ))
+    _wait_for_port(app_port)
+    return f"http://127.0.0.1:{app_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", help="base URL of a running app (instead of --spawn)")
+    parser.add_argument("--spawn", action="store_true", help="start fake upstreams and gunicorn locally")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=0, help="requests per level (default: 4 x concurrency, min 20)")
+    parser.add_argument("--repeat-ratio", type=float, default=0.0, help="share of requests reusing a common prompt")
+    parser.add_argument("--dispatch", choices=["direct", "agent"], default="direct")
+    parser.add_argument("--tool-scoping", choices=["on", "off"], default="on",
+                        help="agent dispatch: send only the requested tool's schema (on) or the whole toolkit (off)")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--mcp-replicas", type=int, default=1, help="fake MCP servers to balance across")
+    parser.add_argument("--mcp-latency", type=float, default=0.5)
+    parser.add_argument("--mcp-jitter", type=float, default=0.1)
+    parser.add_argument("--groq-latency", type=float, default=0.3)
+    parser.add_argument("--groq-jitter", type=float, default=0.1)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="compare p95 against a previous --json file")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="allowed p95 growth vs baseline")
+    args = parser.parse_args()
+
+    if not args.spawn and not args.target:
+        parser.error("pass --spawn or --target URL")
+
+    procs = []
+    base = args.target.rstrip("/") if args.target else None
+    try:
+        if args.spawn:
+            base = spawn_stack(args, procs)
+
+        rows = []
+        for name in args.scenarios:
+            for concurrency in args.concurrency:
+                total = args.requests or max(20, concurrency * 4)
+                rows.append(run_level(base, name, concurrency, total, args.repeat_ratio))
+                print(f"{name} @ {concurrency}: {rows[-1]['throughput_rps']} rps, p95 {rows[-1]['p95_ms']} ms", flush=True)
+        print()
+        print_table(rows)
+
+        agent = scrape_agent_metrics(base) if args.dispatch == "agent" else {}
+        for tool, row in sorted(agent.items()):
+            if row.get("runs"):
+                print(f"{tool}: {row['input_tokens_per_run']} in / {row['output_tokens_per_run']} out tokens, "
+                      f"{row['inference_ms_per_run']} ms model time per run")
+    finally:
+        for proc in reversed(procs):
+            proc.terminate()
+        for proc in procs:
+            proc.wait(timeout=10)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": vars(args), "results": rows, "agent": agent}, f, indent=2)
+
+    if args.baseline:
+        regressions = compare_to_baseline(rows, args.baseline, args.max_regression)
+        for line in regressions:
+            print("REGRESSION:", line)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the web app.
+
+Times, in fresh interpreters, how long `import app` + `create_app()` takes, the
+first `/` request after it, and the agent-stack import that is deferred until
+the first upstream call. With --gunicorn it also boots gunicorn against the
+fake upstreams, with and without PRELOAD_AGENT_STACK, and times boot-to-first-`/`
+(including the default MCP warm-up of gunicorn's post_worker_init hook) and the
+first `/optimize` of a fresh worker:
+
+    python tests/bench/startup.py
+    python tests/bench/startup.py --runs 10 --budget-ms 500
+    python tests/bench/startup.py --gunicorn --json startup.json
+    python tests/bench/startup.py --baseline startup.json   # exit 1 on regression
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+import urllib.request
+
+from load_test import REPO_ROOT, spawn_stack
+
+# Runs in a fresh interpreter and prints one JSON line of timings in seconds
+_PROBE = r"""
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+flask_app = app.create_app()
+created = time.perf_counter()
+status = flask_app.test_client().get("/").status_code
+first_request = time.perf_counter()
+from app.agno_agent import preload
+preload()
+agent_stack = time.perf_counter()
+print(json.dumps({
+    "import_app": imported - started,
+    "create_app": created - started,
+    "first_request": first_request - created,
+    "agent_stack": agent_stack - first_request,
+    "status": status,
+}))
+"""
+
+
+def probe_in_process(runs):
+    # the default configuration: create_app() itself never warms up the upstream
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _PROBE], cwd=REPO_ROOT, check=True,
+                             capture_output=True, text=True).stdout
+        sample = json.loads(out.strip().splitlines()[-1])
+        if sample.pop("status") != 200:
+            raise RuntimeError("GET / did not return 200")
+        samples.append(sample)
+    return {name: round(statistics.median(s[name] for s in samples) * 1000, 1) for name in samples[0]}
+
+
+def probe_gunicorn(args, preload):
+    os.environ["PRELOAD_AGENT_STACK"] = "1" if preload else "0"
+    procs = []
+    try:
+        started = time.perf_counter()
+        base = spawn_stack(args, procs)
+        with urllib.request.urlopen(f"{base}/", timeout=60) as resp:
+            resp.read()
+        boot = time.perf_counter() - started
+
+        # the first upstream call of a worker pays for anything it did not inherit
+        request = urllib.request.Request(f"{base}/optimize", data=json.dumps({"prompt": "cold start"}).encode(),
+                                         headers={"Content-Type": "application/json"})
+        started = time.perf_counter()
+        with urllib.request.urlopen(request, timeout=60) as resp:
+            resp.read()
+        first_optimize = time.perf_counter() - started
+    finally:
+        for proc in reversed(procs):
+            proc.terminate()
+        for proc in procs:
+            proc.wait(timeout=10)
+    return {"boot_to_first_request": round(boot * 1000, 1), "first_optimize": round(first_optimize * 1000, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to take the median over")
+    parser.add_argument("--budget-ms", type=float, default=0, help="fail if create_app takes longer than this")
+    parser.add_argument("--gunicorn", action="store_true", help="also time gunicorn boot with and without preload")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="compare against a previous --json file")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="allowed growth vs baseline")
+    args = parser.parse_args()
+
+    results = {"in_process": probe_in_process(args.runs)}
+    if args.gunicorn:
+        # settings spawn_stack expects from load_test's command line
+        args.dispatch, args.mcp_latency, args.mcp_jitter, args.groq_latency, args.groq_jitter = "direct", 0.05, 0.0, 0.05, 0.0
+        args.tool_scoping = "on"
+        results["gunicorn_lazy"] = probe_gunicorn(args, preload=False)
+        results["gunicorn_preload"] = probe_gunicorn(args, preload=True)
+
+    for section, timings in results.items():
+        print(section)
+        for name, ms in timings.items():
+            print(f"    {name:<24} {ms:>9} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"runs": args.runs, "results": results}, f, indent=2)
+
+    failures = []
+    create_ms = results["in_process"]["create_app"]
+    if args.budget_ms and create_ms > args.budget_ms:
+        failures.append(f"create_app took {create_ms} ms, budget is {args.budget_ms} ms")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        for section, timings in results.items():
+            for name, ms in timings.items():
+                before = baseline.get(section, {}).get(name)
+                if before and ms > before * (1 + args.max_regression):
+                    failures.append(f"{section}.{name}: {before} ms -> {ms} ms")
+    for line in failures:
+        print("REGRESSION:", line)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+from flask import Flask
+
+from app import admission
+from app.admission import ConcurrencyLimiter, Overloaded, RateLimiter
+
+
+def test_limiter_times_out_queued_calls():
+    limiter = ConcurrencyLimiter(limit=1, max_queue=4, queue_timeout=0.05)
+
+    async def main():
+        await limiter.acquire()
+        with pytest.raises(Overloaded) as refused:
+            await limiter.acquire()
+        return refused.value
+
+    assert asyncio.run(main()).reason == "queue_timeout"
+    assert limiter.counts["queue_timeout"] == 1
+    assert limiter.stats()["queue_depth"] == 0
+
+
+def test_limiter_refuses_when_queue_is_full():
+    limiter = ConcurrencyLimiter(limit=1, max_queue=1, queue_timeout=1)
+
+    async def main():
+        await limiter.acquire()
+        waiting = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as refused:
+            await limiter.acquire()
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        return refused.value
+
+    assert asyncio.run(main()).reason == "queue_full"
+
+
+def test_limiter_hands_slots_to_waiters_in_order():
+    limiter = ConcurrencyLimiter(limit=1, max_queue=4, queue_timeout=1)
+    order = []
+
+    async def worker(name):
+        await limiter.acquire()
+        order.append(name)
+        await asyncio.sleep(0.01)
+        limiter.release()
+
+    async def main():
+        await asyncio.gather(*(worker(n) for n in "abc"))
+
+    asyncio.run(main())
+    assert order == ["a", "b", "c"]
+    assert limiter.stats()["active"] == 0
+
+
+def test_limiter_passes_on_a_slot_handed_to_a_cancelled_waiter():
+    limiter = ConcurrencyLimiter(limit=1, max_queue=4, queue_timeout=1)
+
+    async def main():
+        await limiter.acquire()
+        first  = asyncio.ensure_future(limiter.acquire())
+        second = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        limiter.release()      # hands the slot to `first`...
+        first.cancel()         # ...which is cancelled before it resumes
+        await asyncio.gather(first, return_exceptions=True)
+        await asyncio.wait_for(second, 1)
+
+    asyncio.run(main())
+    assert limiter.stats()["active"] == 1
+
+
+def test_rate_limiter_charges_the_full_cost():
+    limiter = RateLimiter(per_minute=60, burst=10, path="")
+    assert limiter.hit("client", cost=10) == (True, 0.0)
+    allowed, retry_after = limiter.hit("client", cost=1)
+    assert not allowed and 0 < retry_after <= 1
+    assert limiter.hit("other", cost=1)[0]   # buckets are per client
+
+
+def test_rate_limiter_refills_at_the_configured_rate():
+    limiter = RateLimiter(per_minute=60, burst=5, path="")
+    limiter.hit("client", cost=5)
+    allowed, retry_after = limiter.hit("client", cost=3)
+    assert not allowed and 2 < retry_after <= 3
+
+
+def _rate_limits(monkeypatch, **env):
+    for name, value in {"RATE_LIMIT_PER_MINUTE": "30", "RATE_LIMIT_BURST": "10", "RATE_LIMIT_PATH": "", **env}.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setattr(admission, "_rate_limiter", None)
+    monkeypatch.setattr(admission, "_batch_limiter", None)
+
+
+def test_batches_have_their_own_item_budget(monkeypatch):
+    _rate_limits(monkeypatch)
+
+    with Flask(__name__).test_request_context("/optimize/batch", method="POST"):
+        from flask import request
+        # a default-sized batch fits, however small the request burst
+        assert admission.rate_limit_response(request, items=50) is None
+        assert admission.rate_limit_response(request) is None
+        body, status, headers = admission.rate_limit_response(request, items=1)
+        assert status == 429 and "Retry-After" in headers
+
+
+def test_batch_larger_than_the_item_burst_is_refused_with_413(monkeypatch):
+    _rate_limits(monkeypatch, RATE_LIMIT_BATCH_BURST="20")
+
+    with Flask(__name__).test_request_context("/optimize/batch", method="POST"):
+        from flask import request
+        body, status = admission.rate_limit_response(request, items=21)
+        assert status == 413
+        assert admission.rate_limit_response(request, items=20) is None
+
+
+def test_rotating_extension_ids_still_pay_the_ip_bucket(monkeypatch):
+    _rate_limits(monkeypatch, RATE_LIMIT_BURST="2", RATE_LIMIT_IP_FACTOR="3")
+    app = Flask(__name__)
+
+    def hit(extension):
+        with app.test_request_context("/optimize", method="POST", headers={"X-Extension-Id": extension},
+                                      environ_base={"REMOTE_ADDR": "203.0.113.7"}):
+            from flask import request
+            return admission.rate_limit_response(request)
+
+    assert hit("same") is None and hit("same") is None
+    assert hit("same")[1] == 429                  # the extension's own bucket
+    assert all(hit(f"fresh-{n}") is None for n in range(4))
+    assert hit("fresh-4")[1] == 429               # the IP's bucket: 3 x 2, shared by every id
@@ -0,0 +1,65 @@
+from app.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def _open_breaker(threshold=2):
+    breaker = CircuitBreaker("test_tool", threshold=threshold, open_seconds=0)
+    for _ in range(threshold):
+        breaker.record(breaker.allow(), success=False)
+    return breaker
+
+
+def test_opens_after_threshold_consecutive_failures():
+    breaker = CircuitBreaker("test_tool", threshold=3, open_seconds=60)
+    for _ in range(2):
+        breaker.record(breaker.allow(), success=False)
+    breaker.record(breaker.allow(), success=True)   # a success resets the streak
+    for _ in range(2):
+        breaker.record(breaker.allow(), success=False)
+    assert breaker.state == CLOSED
+
+    breaker.record(breaker.allow(), success=False)
+    assert breaker.state == OPEN
+    assert breaker.allow() is None
+    assert breaker.counts["rejected"] == 1
+
+
+def test_half_open_lets_exactly_one_probe_through():
+    breaker = _open_breaker()
+    probe = breaker.allow()
+    assert breaker.state == HALF_OPEN and probe.probe
+    assert breaker.allow() is None
+
+    breaker.record(probe, success=True)
+    assert breaker.state == CLOSED
+    assert breaker.allow() is not None
+
+
+def test_failed_probe_reopens():
+    breaker = _open_breaker()
+    probe = breaker.allow()
+    breaker.open_seconds = 60
+    breaker.record(probe, success=False)
+    assert breaker.state == OPEN
+    assert breaker.allow() is None
+
+
+def test_late_call_from_before_opening_does_not_close_or_free_the_probe():
+    breaker = CircuitBreaker("test_tool", threshold=1, open_seconds=0)
+    late = breaker.allow()                          # admitted while closed, still running
+    breaker.record(breaker.allow(), success=False)  # opens the circuit
+    probe = breaker.allow()
+    assert breaker.state == HALF_OPEN
+
+    breaker.record(late, success=True)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() is None                  # the probe slot is still taken
+
+    breaker.record(probe, success=True)
+    assert breaker.state == CLOSED
+
+
+def test_released_probe_frees_the_slot_without_a_verdict():
+    breaker = _open_breaker()
+    breaker.release(breaker.allow())
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow().probe
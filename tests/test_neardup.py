@@ -0,0 +1,56 @@
+from app.neardup import NearDuplicateIndex, jaccard, normalize, shingles
+
+PROMPT = "Write a detailed cover letter for a junior data analyst position at a retail company"
+
+
+def test_trivial_rewording_reuses_the_result():
+    index = NearDuplicateIndex(threshold=0.8)
+    index.add("scope", PROMPT, "optimized")
+
+    assert index.lookup("scope", PROMPT) == ("optimized", 1.0)
+    result, similarity = index.lookup("scope", "  write a DETAILED cover letter for a junior data-analyst position at a retail company!")
+    assert result == "optimized" and similarity >= 0.8
+
+
+def test_different_prompt_or_scope_misses():
+    index = NearDuplicateIndex(threshold=0.9)
+    index.add("scope", PROMPT, "optimized")
+
+    assert index.lookup("scope", "Plan a five day trip to Lisbon on a budget with museums") is None
+    assert index.lookup("other scope", PROMPT) is None
+
+
+def test_expired_entries_are_not_served():
+    index = NearDuplicateIndex(ttl=-1)
+    index.add("scope", PROMPT, "optimized")
+    assert index.lookup("scope", PROMPT) is None
+
+
+def test_close_prompt_just_below_the_threshold_misses():
+    # one changed word, but it changes the request: ~0.86 similar
+    senior = "Write a detailed cover letter for a senior data analyst position at a retail company"
+    similarity = jaccard(shingles(normalize(PROMPT)), shingles(normalize(senior)))
+    assert 0.85 < similarity < 0.9
+
+    index = NearDuplicateIndex(threshold=0.9)
+    index.add("scope", PROMPT, "optimized")
+    assert index.lookup("scope", senior) is None
+    # it was a candidate, and its similarity is recorded as the best miss
+    assert index.counts["misses"] == 1 and index.counts["candidates"] >= 1
+    assert sum(index.miss_similarity.counts) == 1
+
+    lenient = NearDuplicateIndex(threshold=0.85)
+    lenient.add("scope", PROMPT, "optimized")
+    assert lenient.lookup("scope", senior) == ("optimized", similarity)
+
+
+def test_least_recently_used_entry_is_evicted():
+    index = NearDuplicateIndex(size=2)
+    index.add("scope", "first prompt about gardening in spring", "one")
+    index.add("scope", "second prompt about baking sourdough bread", "two")
+    index.lookup("scope", "first prompt about gardening in spring")
+    index.add("scope", "third prompt about learning the violin", "three")
+
+    assert index.lookup("scope", "second prompt about baking sourdough bread") is None
+    assert index.lookup("scope", "first prompt about gardening in spring") == ("one", 1.0)
+    assert index.counts["evictions"] == 1
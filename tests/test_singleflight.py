@@ -0,0 +1,87 @@
+import asyncio
+
+from app.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flights, calls = SingleFlight(), []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*(flights.do("key", fetch) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["result"] * 5
+    assert len(calls) == 1
+    assert flights.counts["leaders"] == 1 and flights.counts["coalesced"] == 4
+    assert flights.in_flight() == 0
+
+
+def test_call_survives_until_the_last_waiter_cancels():
+    flights, cancelled = SingleFlight(), []
+
+    async def main():
+        gate = asyncio.Event()
+
+        async def fetch():
+            gate.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+
+        first  = asyncio.ensure_future(flights.do("key", fetch))
+        second = asyncio.ensure_future(flights.do("key", fetch))
+        await gate.wait()
+
+        first.cancel()
+        await asyncio.sleep(0)
+        assert not cancelled and flights.in_flight() == 1   # `second` still wants the result
+
+        second.cancel()
+        await asyncio.gather(first, second, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert cancelled == [1]
+        assert flights.in_flight() == 0 and flights.counts["abandoned"] == 1
+
+    asyncio.run(main())
+
+
+def test_next_caller_starts_afresh_after_abandonment():
+    flights, runs = SingleFlight(), []
+
+    async def main():
+        async def slow():
+            runs.append("slow")
+            await asyncio.sleep(10)
+
+        async def quick():
+            runs.append("quick")
+            return "fresh"
+
+        waiter = asyncio.ensure_future(flights.do("key", slow))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        return await flights.do("key", quick)
+
+    assert asyncio.run(main()) == "fresh"
+    assert runs == ["slow", "quick"]
+
+
+def test_exception_reaches_every_waiter():
+    flights = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def main():
+        return await asyncio.gather(*(flights.do("key", fetch) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)